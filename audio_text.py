@@ -0,0 +1,63 @@
+import os
+import sqlite3
+from urllib.request import pathname2url
+
+from lazy_import import lazy
+
+pd = lazy("pandas")
+
+# ===================== 语音转文字 =====================
+# MemoTrace 把语音转写存在 app/data/Audio2Text.db：Audio2Text(ID, msgSvrId UNIQUE, Text)。
+# 读 CSV 时每块把语音消息的 id 批量写进临时表，一条 JOIN 取回这一块的全部转写（走 msgSvrId 上的唯一索引），
+# 不逐条查询。有转写的语音以转写内容作为 StrContent 留在消息表里（Type 仍为 34），
+# 之后的分词、关键词、字数统计与文本消息一视同仁。
+
+VOICE_TYPE = "34"
+DB_NAME = "Audio2Text.db"
+
+
+class VoiceTranscripts:
+    def __init__(self, path, id_column):
+        self.path = path
+        self.id_column = id_column
+        self.voices = 0
+        self.matched = 0
+        self.missing_column = False
+        # 只读打开，不会因为 MemoTrace 同时在用而改动或锁住它；临时表在独立的 temp 库里
+        self.conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True)
+        self.conn.execute("CREATE TEMP TABLE wanted (id INTEGER PRIMARY KEY)")
+
+    def lookup(self, ids):
+        """语音消息 id 的 Series → 同索引的转写文本 Series（只含有转写的行）"""
+        ids = ids.dropna().astype(str).str.strip()
+        ids = ids[ids.str.fullmatch(r"-?\d+")]  # 64 位 id 不经过 float，避免丢精度
+        if ids.empty: return pd.Series([], dtype=object)
+        keys = ids.astype("int64")
+        with self.conn:
+            self.conn.execute("DELETE FROM wanted")
+            self.conn.executemany("INSERT OR IGNORE INTO wanted VALUES (?)", ((int(k),) for k in keys.unique()))
+        # CROSS JOIN 固定由临时表驱动：转写库再大，也只按这一块的 id 逐个查唯一索引
+        rows = self.conn.execute(
+            "SELECT a.msgSvrId, a.Text FROM wanted w CROSS JOIN Audio2Text a ON a.msgSvrId = w.id "
+            "WHERE a.Text IS NOT NULL AND a.Text != ''").fetchall()
+        return keys.map(dict(rows)).dropna()
+
+    def attach(self, chunk):
+        """把一块原始数据里语音消息的 StrContent 换成转写，返回有转写的行的索引"""
+        if self.id_column not in chunk.columns:
+            self.missing_column = True
+            return chunk.index[:0]
+        voice = chunk["Type"] == VOICE_TYPE
+        self.voices += int(voice.sum())
+        text = self.lookup(chunk.loc[voice, self.id_column])
+        chunk.loc[text.index, "StrContent"] = text
+        self.matched += len(text)
+        return text.index
+
+    def summary(self):
+        if self.missing_column:
+            return f"🎙️ CSV 中没有 {self.id_column} 列，无法关联语音转写，已跳过"
+        return f"🎙️ 语音转写: {self.voices:,} 条语音中 {self.matched:,} 条有转写，已计入文本"
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,150 @@
+import argparse
+import contextlib
+import gc
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+import step1_analyze as step1
+import step2_render as step2
+from memory_budget import CSV_EXPANSION, MemoryBudget, parse_size
+from wechat_analysis import STAGE_NAMES, render_html_stage
+
+# ===================== 批量生成 =====================
+# 多个账号的导出一次跑完：主进程先把 jieba 词典、绘图库、字体、词云引擎加载好，
+# 再 fork 出进程池，子进程直接共享这些只读内存（写时复制），不再各自加载。
+# 账号按文件大小从大到小派发，大账号先跑，避免最后只剩一个大账号在单核上跑。
+# 每个账号一个输出目录：Final_Report.html + report_data.zip + run.log；
+# 账号专属的流水线状态在 .cache/accounts/<账号>/，图表等按内容寻址的缓存各账号共用。
+
+REPORT_NAME = os.path.basename(step2.RENDER_CONFIG["OUTPUT_PATH"])
+# 每个进程除数据外的内存开销（pandas / matplotlib 等，jieba 词典与父进程共享不计在内）
+WORKER_BASE_MB = 150
+
+
+def find_exports(paths):
+    """目录里的 *.csv 各算一个账号（子目录里的 messages.csv 以子目录名为账号名），也可以直接给 CSV 文件"""
+    found = []
+    for path in paths:
+        if os.path.isfile(path):
+            found.append(path)
+            continue
+        for entry in sorted(os.listdir(path)):
+            full = os.path.join(path, entry)
+            if os.path.isdir(full) and os.path.isfile(os.path.join(full, "messages.csv")):
+                found.append(os.path.join(full, "messages.csv"))
+            elif entry.lower().endswith(".csv") and os.path.isfile(full):
+                found.append(full)
+
+    accounts = {}
+    for csv_path in found:
+        stem = os.path.splitext(os.path.basename(csv_path))[0]
+        name = os.path.basename(os.path.dirname(os.path.abspath(csv_path))) if stem == "messages" else stem
+        base, n = name, 2
+        while name in accounts:
+            name, n = f"{base}-{n}", n + 1
+        accounts[name] = csv_path
+    return accounts
+
+
+def run_account(job):
+    """在子进程里跑完一个账号的整条流水线；输出写进该账号的 run.log"""
+    name, csv_path, out_dir, asset_mode, force, budget_mb = job
+    os.makedirs(out_dir, exist_ok=True)
+    work_dir = os.path.join(step1.CONFIG["CACHE_DIR"], "accounts", name)
+    t0 = time.perf_counter()
+    result = {"account": name, "csv": csv_path, "html": os.path.join(out_dir, REPORT_NAME)}
+
+    with open(os.path.join(out_dir, "run.log"), "w", encoding="utf-8") as log, contextlib.redirect_stdout(log):
+        try:
+            if budget_mb: step1.set_memory_budget(budget_mb)
+            step1.use_account(csv_path, os.path.join(out_dir, "report_data.zip"), work_dir)
+            step2.RENDER_CONFIG["OUTPUT_PATH"] = result["html"]
+            pipe = step1.make_pipeline([render_html_stage(asset_mode)])
+            pipe.run(force=force)
+            step1.print_run_summary()
+            result["error"] = None
+        except (Exception, SystemExit) as e:  # run_ingest 遇到空数据会 sys.exit
+            traceback.print_exc(file=log)
+            result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - t0
+    return result
+
+
+def plan_workers(accounts, jobs, budget):
+    """并行进程数：不超过账号数与 CPU 数；设了内存预算时再按最大的导出估算每个进程要多少内存"""
+    workers = min(len(accounts), jobs or os.cpu_count() or 1)
+    if budget is not None and accounts:
+        biggest = max(os.path.getsize(p) for p in accounts.values())
+        per_worker_mb = WORKER_BASE_MB + biggest * CSV_EXPANSION / 1024 / 1024
+        workers = min(workers, budget.max_workers(per_worker_mb))
+    return max(1, workers)
+
+
+def run_batch(accounts, out_root, jobs=None, asset_mode="inline", force=(), budget_mb=None):
+    budget = MemoryBudget(budget_mb) if budget_mb else None
+    workers = plan_workers(accounts, jobs, budget)
+    # 按导出大小从大到小派发（最长任务优先），让各核尽量同时结束
+    order = sorted(accounts, key=lambda n: -os.path.getsize(accounts[n]))
+    per_worker_budget = budget_mb / workers if budget_mb else None
+    tasks = [(name, accounts[name], os.path.join(out_root, name), asset_mode, list(force), per_worker_budget)
+             for name in order]
+
+    print("🔥 预热：加载 jieba 词典、绘图库与字体 ...")
+    step1.warm_up()
+
+    can_fork = "fork" in multiprocessing.get_all_start_methods() and sys.platform != "darwin"
+    if workers == 1 or not can_fork:
+        if workers > 1: print("ℹ️ 当前平台不支持 fork，改为逐个账号运行")
+        print(f"🚀 {len(tasks)} 个账号，逐个运行")
+        results = (run_account(t) for t in tasks)
+        yield from _report(results, len(tasks))
+        return
+
+    print(f"🚀 {len(tasks)} 个账号，{workers} 个进程并行")
+    # 预热好的对象移出 GC 追踪，避免子进程里的垃圾回收把共享页面逐个写脏
+    gc.freeze()
+    with multiprocessing.get_context("fork").Pool(workers) as pool:
+        yield from _report(pool.imap_unordered(run_account, tasks), len(tasks))
+
+
+def _report(results, total):
+    for i, r in enumerate(results, 1):
+        if r["error"]:
+            print(f"   ❌ [{i}/{total}] {r['account']} 失败（{r['seconds']:.1f}s）: {r['error']}")
+        else:
+            print(f"   ✅ [{i}/{total}] {r['account']} 完成（{r['seconds']:.1f}s）→ {r['html']}")
+        yield r
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="为多个微信账号的导出批量生成年度报告")
+    parser.add_argument("exports", nargs="+", help="导出目录（其中每个 CSV / 含 messages.csv 的子目录算一个账号）或 CSV 文件")
+    parser.add_argument("--out", default="reports", help="输出根目录，每个账号一个子目录")
+    parser.add_argument("--jobs", "-j", type=int, help="并行进程数（默认 CPU 核数）")
+    parser.add_argument("--force", action="append", default=[], choices=STAGE_NAMES + ["all"],
+                        help="强制重跑某个阶段（可重复；all 表示全部重跑）")
+    parser.add_argument("--assets", action="store_true", help="图片输出到各账号的 assets/ 并懒加载")
+    parser.add_argument("--memory-budget", type=parse_size, metavar="SIZE", help="整批的内存上限，平分给各进程")
+    parser.add_argument("--no-cache", action="store_true", help="不使用图表缓存，全部重绘")
+    args = parser.parse_args(argv)
+    step1.CHART_CACHE.enabled = not args.no_cache  # 在 fork 之前设置，各进程继承
+
+    accounts = find_exports(args.exports)
+    if not accounts:
+        print("❌ 没有找到任何导出的 CSV")
+        return 1
+
+    asset_mode = "external" if args.assets else step2.RENDER_CONFIG["ASSET_MODE"]
+    t0 = time.perf_counter()
+    results = list(run_batch(accounts, args.out, args.jobs, asset_mode, args.force, args.memory_budget))
+    failed = [r for r in results if r["error"]]
+    print(f"\n{'⚠️' if failed else '✅'} 批量完成：成功 {len(results) - len(failed)} / {len(results)}，"
+          f"总用时 {time.perf_counter() - t0:.1f}s（各账号日志见 {args.out}/<账号>/run.log）")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
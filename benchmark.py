@@ -0,0 +1,200 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import step1_analyze as step1
+import step2_render as step2
+import synth_messages
+from conversation import conversation_stats
+from instrument import peak_rss_mb
+from report_store import ReportWriter, open_report
+
+# ===================== 基准测试 =====================
+# 用 synth_messages 生成的合成数据，在不同规模下计时 step1 / step2 的关键函数。
+# 每次结果追加到 results.jsonl，并和同一台机器、同一规模的上一次结果对比，变慢超过阈值就标红。
+# 计时时关闭图表缓存和词云排版缓存，测的是真正的计算量。
+# 流水线状态、ingest 小表、词频落盘都放在 .cache/bench/state/ 下，不会覆盖真实数据的缓存。
+# --engine 选择读入 / 分组的后端（各后端结果是否一致由 fixtures/check_engines.py 核对）。
+
+BENCH_DIR = os.path.join(step1.CONFIG["CACHE_DIR"], "bench")
+DEFAULT_SCALES = "100k,1M"
+REGRESSION_THRESHOLD = 0.15
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=step1.HERE, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def measure(name, fn, repeat=1, rows=None):
+    """运行 fn repeat 次，取墙钟最短的一次；step1 的进度输出被吞掉"""
+    best = None
+    for _ in range(repeat):
+        t0, c0 = time.perf_counter(), time.process_time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = fn()
+        wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+        if best is None or wall < best["wall"]:
+            best = {"bench": name, "wall": wall, "cpu": cpu, "result": result}
+    best["peak_rss_mb"] = peak_rss_mb()
+    if rows: best["rows_per_s"] = rows / best["wall"] if best["wall"] > 0 else None
+    return best
+
+
+def synth_csv(rows, seed, years):
+    """生成（或复用）一份 rows 条的合成数据"""
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    csv_path = os.path.join(BENCH_DIR, f"messages-{rows}-s{seed}-{'_'.join(map(str, years))}.csv")
+    if not os.path.exists(csv_path):
+        synth_messages.generate(csv_path, rows, seed, years)
+    return csv_path
+
+
+def bench_scale(rows, seed, years, repeat):
+    """生成（或复用）一份 rows 条的合成数据，依次计时各环节，返回结果列表"""
+    csv_path = synth_csv(rows, seed, years)
+    step1.CONFIG["CSV_PATH"] = csv_path
+    step1.CONFIG["REPORT_PATH"] = os.path.join(BENCH_DIR, f"report-{rows}.zip")
+    step1.CHART_CACHE.enabled = False
+    engine = step1.get_wordcloud_engine()
+    engine.cache_dir = None
+
+    results = []
+    def run(name, fn, n=None, times=repeat):
+        r = measure(name, fn, times, n)
+        print(f"   {name:<28} {r['wall']:8.2f}s" + (f"  ({r['rows_per_s']:,.0f} 行/秒)" if r.get("rows_per_s") else ""))
+        results.append(r)
+        return r["result"]
+
+    print(f"\n📏 {rows:,} 行 ({csv_path})")
+    df = step1.year_frame(run("load_data", step1.load_data, rows))
+    raw = df.drop(columns="ChatType")
+    run("apply_strict_classification", lambda: step1.apply_strict_classification(raw.copy()), len(df))
+    del raw
+
+    # jieba 词典与词云字体只在进程里加载一次，不计入各环节耗时
+    with contextlib.redirect_stdout(io.StringIO()):
+        step1.warm_jieba()
+        engine.render({"预热": 1})
+    tokens = run("tokenize_messages", lambda: step1.tokenize_messages(df), len(df), times=1)
+    aggregates = run("compute_aggregates", lambda: step1.compute_aggregates(df), len(df))
+    run("conversation_stats", lambda: conversation_stats(df, step1.CONFIG["SESSION_GAP_MIN"]), len(df))
+
+    freqs = step1.keyword_counts(tokens, df)
+    def wordcloud():
+        engine._layouts.clear()
+        return step1.draw_wordcloud(freqs)
+    run("draw_wordcloud", wordcloud)
+
+    df_p = df[df["ChatType"] == "Private"]
+    def private_profiles():
+        engine._layouts.clear()
+        store = ReportWriter(os.path.join(BENCH_DIR, "profiles.zip"))
+        try:
+            return step1.analyze_subset(df_p, store, tokens, 10, is_group=False)
+        finally:
+            store.abort()
+    run("analyze_subset(private,10)", private_profiles, len(df_p))
+
+    engine._layouts.clear()
+    run("render_charts", lambda: step1.render_charts(df, aggregates, tokens), len(df), times=1)
+
+    def render_html():
+        report = open_report(step1.CONFIG["REPORT_PATH"])
+        try:
+            with open(os.devnull, "w", encoding="utf-8") as out:
+                step2.render_report(report, out)
+        finally:
+            report.close()
+    run("step2_render", render_html)
+
+    for r in results:
+        del r["result"]
+        r["rows"] = rows
+    return results
+
+
+def load_history(path):
+    if not os.path.exists(path): return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(results, history, threshold):
+    """和同一台机器、同一规模、同一环节的上一次结果比较，返回变慢的条目"""
+    last = {}
+    for h in history:
+        last[(h.get("host"), h.get("engine", "pandas"), h["rows"], h["bench"])] = h
+    regressions = []
+    print("\n📊 与上次结果对比:")
+    for r in results:
+        prev = last.get((r["host"], r["engine"], r["rows"], r["bench"]))
+        if prev is None:
+            print(f"   {r['bench']:<28} {r['rows']:>11,} 行 {r['wall']:8.2f}s   （首次记录）")
+            continue
+        change = r["wall"] / prev["wall"] - 1 if prev["wall"] > 0 else 0.0
+        flag = "⚠️ 变慢" if change > threshold else ("🚀 变快" if change < -threshold else "")
+        print(f"   {r['bench']:<28} {r['rows']:>11,} 行 {r['wall']:8.2f}s  vs {prev['wall']:8.2f}s "
+              f"({prev.get('commit') or '?'})  {change:+6.1%} {flag}")
+        if change > threshold: regressions.append(r)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="在合成数据上对 step1 / step2 做基准测试")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="规模，逗号分隔，如 100k,1M,10M")
+    parser.add_argument("--seed", type=int, default=2025)
+    parser.add_argument("--years", default=str(step1.CONFIG["TARGET_YEAR"]), help="合成数据覆盖的年份，逗号分隔")
+    parser.add_argument("--repeat", type=int, default=1, help="除分词与整体绘图外，每个环节重复几次取最快")
+    parser.add_argument("--results", default=os.path.join(BENCH_DIR, "results.jsonl"))
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="变慢超过该比例视为退化")
+    parser.add_argument("--fail-on-regression", action="store_true", help="出现退化时以非零状态退出")
+    parser.add_argument("--engine", choices=list(step1.engines.ENGINES), default="pandas", help="读入与分组统计的后端")
+    args = parser.parse_args(argv)
+
+    years = [int(y) for y in args.years.split(",")]
+    step1.use_work_dir(os.path.join(BENCH_DIR, "state"))
+
+    step1.set_engine(args.engine)
+    meta = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "seed": args.seed,
+        "years": years,
+        "engine": args.engine,
+    }
+
+    results = []
+    for scale in args.scales.split(","):
+        for r in bench_scale(synth_messages.parse_rows(scale), args.seed, years, args.repeat):
+            results.append({**meta, **r})
+
+    history = load_history(args.results)
+    regressions = compare(results, history, args.threshold)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+    with open(args.results, "a", encoding="utf-8") as f:
+        for r in results:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    print(f"\n💾 结果已追加到 {args.results}")
+
+    if regressions and args.fail_on_regression:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import hashlib
+import os
+
+from lazy_import import lazy
+
+# 只有真正要算缓存键时才需要 numpy / pandas
+np = lazy("numpy")
+pd = lazy("pandas")
+
+# ===================== 图表渲染缓存 =====================
+# 以 (图表类型, 输入聚合数据, 相关配置, 渲染器版本) 的哈希为键，
+# 把编码好的 PNG 存在磁盘上；按最近使用时间 (mtime) 做 LRU 淘汰。
+
+def _feed(h, obj):
+    """把聚合数据递归喂给哈希函数，保证同样的输入得到同样的键"""
+    if isinstance(obj, pd.Series):
+        _feed(h, obj.index.to_numpy())
+        _feed(h, obj.to_numpy())
+    elif isinstance(obj, pd.DataFrame):
+        _feed(h, list(obj.columns))
+        _feed(h, obj.index.to_numpy())
+        for col in obj.columns: _feed(h, obj[col].to_numpy())
+    elif isinstance(obj, str):
+        h.update(b"S")
+        h.update(obj.encode("utf-8", "surrogatepass"))
+    elif isinstance(obj, np.ndarray):
+        if obj.dtype == object:
+            h.update(b"O")
+            h.update("\x00".join(map(str, obj.ravel())).encode("utf-8", "surrogatepass"))
+        else:
+            h.update(obj.dtype.str.encode())
+            h.update(str(obj.shape).encode())
+            h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        h.update(b"{")
+        for k in sorted(obj, key=str):
+            _feed(h, k)
+            _feed(h, obj[k])
+        h.update(b"}")
+    elif isinstance(obj, (list, tuple)):
+        h.update(b"[")
+        for item in obj: _feed(h, item)
+        h.update(b"]")
+    else:
+        h.update(repr(obj).encode("utf-8", "surrogatepass"))
+    h.update(b";")
+
+
+class ChartCache:
+    def __init__(self, cache_dir, max_bytes, enabled=True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+
+    def key(self, kind, payload, style, version):
+        h = hashlib.sha256()
+        _feed(h, [kind, version, style, payload])
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".png")
+
+    def get(self, key):
+        """命中返回 PNG 字节（空图表返回 b""），未命中返回 None"""
+        if not self.enabled: return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        os.utime(path)  # 刷新最近使用时间
+        return data
+
+    def put(self, key, data):
+        if not self.enabled: return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"  # 批量模式下多个进程可能同时写同一张图
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        if self._size is None: self._size = self._disk_usage()
+        else: self._size += len(data)
+        if self._size > self.max_bytes: self.evict()
+
+    def fetch(self, key, render):
+        """读缓存，未命中时调用 render() 绘制并写回；render 返回 None 表示该图表为空"""
+        data = self.get(key)
+        if data is not None:
+            self.hits += 1
+            return data or None
+
+        self.misses += 1
+        data = render()
+        self.put(key, data or b"")
+        return data
+
+    def _entries(self):
+        if not os.path.isdir(self.cache_dir): return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".png"): continue
+            st = os.stat(os.path.join(self.cache_dir, name))
+            entries.append((st.st_mtime, st.st_size, name))
+        return entries
+
+    def _disk_usage(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """按最近使用时间从旧到新删除，直到总大小回到上限以内"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_bytes: break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+        self._size = total
+
+    def summary(self):
+        usage = self._disk_usage() if self.enabled else 0
+        return f"📦 图表缓存: 命中 {self.hits} | 重绘 {self.misses} | 占用 {usage / 1024 / 1024:.1f} MB"
@@ -0,0 +1,96 @@
+from lazy_import import lazy
+
+np = lazy("numpy")
+pd = lazy("pandas")
+
+# ===================== 会话与回复速度 =====================
+# 整张消息表按 (聊天对象, 时间) 只排序一次，再用数组运算同时算出所有联系人的：
+# 相邻消息间隔、收发方向切换（= 一次回复）、会话边界（同一聊天里间隔超过 gap_minutes 就算新会话）、
+# 每段会话由谁先开口，以及连续聊天天数的最长纪录。全程不按联系人循环。
+
+SESSION_GAP_MIN = 60
+CONTACT_KEYS = ["ChatType", "NickName"]
+
+
+def _first_per_group(group, order):
+    """order 已按 group 排好序，返回每组第一个元素在 order 中的位置"""
+    g = group[order]
+    return order[np.r_[True, g[1:] != g[:-1]]] if len(g) else order
+
+
+def conversation_stats(df, gap_minutes=SESSION_GAP_MIN):
+    """按 (ChatType, NickName) 统计会话指标，返回 (每个聊天一行的 DataFrame, 单聊整体指标)
+
+    回复时间均为秒：我回复对方的中位数 my_reply_median、对方回复我的中位数 their_reply_median。
+    """
+    groups = df.groupby(CONTACT_KEYS, sort=True)
+    index = groups.size().index
+    contact = groups.ngroup().to_numpy()
+    ts = df["dt"].to_numpy().astype("datetime64[s]").astype(np.int64)
+    me = df["IsSender"].to_numpy() == 1
+    private = (df["ChatType"] == "Private").to_numpy()
+
+    order = np.lexsort((ts, contact))
+    contact, ts, me, private = contact[order], ts[order], me[order], private[order]
+    n, k = len(ts), len(index)
+
+    # 相邻两条消息：是否同一聊天、间隔多久、发送方是否切换
+    gap = np.zeros(n, dtype=np.int64)
+    gap[1:] = np.diff(ts)
+    new_session = np.ones(n, dtype=bool)
+    new_session[1:] = (contact[1:] != contact[:-1]) | (gap[1:] > gap_minutes * 60)
+    switched = np.zeros(n, dtype=bool)
+    switched[1:] = me[1:] != me[:-1]
+    reply = switched & ~new_session
+    my_reply, their_reply = reply & me, reply & ~me
+
+    table = pd.DataFrame({
+        "sessions": np.bincount(contact, weights=new_session, minlength=k).astype(int),
+        "started_by_me": np.bincount(contact, weights=new_session & me, minlength=k).astype(int),
+        "my_replies": np.bincount(contact, weights=my_reply, minlength=k).astype(int),
+        "their_replies": np.bincount(contact, weights=their_reply, minlength=k).astype(int),
+    }, index=index)
+    table["my_reply_median"] = pd.Series(gap[my_reply]).groupby(contact[my_reply]).median().reindex(range(k)).to_numpy()
+    table["their_reply_median"] = (pd.Series(gap[their_reply]).groupby(contact[their_reply]).median()
+                                   .reindex(range(k)).to_numpy())
+
+    # 连续聊天天数：去重后的 (聊天, 日) 按日期相邻切段，每个聊天取最长的一段（并列取最早）
+    day = ts // 86400
+    pairs = np.unique(contact.astype(np.int64) << 32 | (day - (day.min() if n else 0)))
+    pair_contact, pair_day = pairs >> 32, pairs & 0xFFFFFFFF
+    new_run = np.ones(len(pairs), dtype=bool)
+    new_run[1:] = (pair_contact[1:] != pair_contact[:-1]) | (np.diff(pair_day) != 1)
+    run_len = np.bincount(np.cumsum(new_run) - 1)
+    run_contact, run_start = pair_contact[new_run], pair_day[new_run] + (day.min() if n else 0)
+    best = _first_per_group(run_contact, np.lexsort((run_start, -run_len, run_contact)))
+    streak = np.zeros(k, dtype=int)
+    streak_start = np.full(k, np.datetime64("NaT"), dtype="datetime64[D]")
+    streak[run_contact[best]] = run_len[best]
+    streak_start[run_contact[best]] = run_start[best].astype("datetime64[D]")
+    table["longest_streak"] = streak
+    table["streak_start"] = streak_start
+
+    # 单聊整体：所有回复放在一起取中位数，而不是各联系人中位数的中位数
+    mine, theirs = gap[my_reply & private], gap[their_reply & private]
+    sessions = int((new_session & private).sum())
+    overall = {
+        "my_reply_median": float(np.median(mine)) if len(mine) else None,
+        "their_reply_median": float(np.median(theirs)) if len(theirs) else None,
+        "sessions": sessions,
+        "started_by_me_pct": round((new_session & private & me).sum() / sessions * 100, 1) if sessions else None,
+    }
+    return table, overall
+
+
+def contact_summary(row):
+    """某个聊天的会话指标，转成可写入 manifest 的 dict"""
+    def seconds(v):
+        return None if pd.isna(v) else float(v)
+    return {
+        "sessions": int(row["sessions"]),
+        "started_by_me_pct": round(row["started_by_me"] / row["sessions"] * 100, 1) if row["sessions"] else None,
+        "my_reply_median": seconds(row["my_reply_median"]),
+        "their_reply_median": seconds(row["their_reply_median"]),
+        "longest_streak": int(row["longest_streak"]),
+        "streak_start": None if pd.isna(row["streak_start"]) else str(row["streak_start"])[:10],
+    }
@@ -0,0 +1,122 @@
+import importlib
+
+from lazy_import import lazy, timed_import
+import media_stats
+from audio_text import VOICE_TYPE
+
+pd = lazy("pandas")
+
+# ===================== 数据帧引擎 =====================
+# 读入 CSV 与几处大表分组统计（发言人汇总、逐年计数立方体、全局指标）的计算后端：
+#   pandas —— 默认，分块读取，与原来的实现相同；
+#   polars —— 可选（pip install polars pyarrow）：惰性扫描 CSV，Type / 非文本计数的过滤下推到扫描里，
+#             只物化文本消息那几行；解析与分组多线程执行。
+# 无论哪个后端，交给后续阶段的都是同样的 pandas 对象（DataFrame / 带 MultiIndex 的 Series），
+# 用 python fixtures/check_engines.py 可以在一份小的合成数据上核对两者的结果是否一致。
+
+# pandas.read_csv 默认当作缺失值的字符串；polars 扫描时用同一份，内容恰好是 "NA"、"null" 的消息两边处理一致
+PANDAS_NA_VALUES = ["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+                    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"]
+ROW_INDEX = "__row"
+
+
+class PandasEngine:
+    name = "pandas"
+
+    def read_messages(self, path, chunk_rows, encoding, voice=None, after_chunk=None):
+        """分块读取 CSV，每块读完立即只留下时间有效的文本消息（以及有转写的语音），内存里不会出现整张原始表；
+        非文本消息只在块内计数、文本里的表情顺带计数，返回 (消息表, 非文本计数, 表情计数)"""
+        parts, media, emoji = [], [], []
+        for chunk in pd.read_csv(path, encoding=encoding, on_bad_lines="skip", dtype=str, chunksize=chunk_rows):
+            if "Type" in chunk.columns:
+                media.append(media_stats.count_media(chunk))
+                keep = chunk["Type"] == "1"
+                if voice is not None: keep.loc[voice.attach(chunk)] = True
+                chunk = chunk[keep]
+            chunk = chunk.assign(dt=pd.to_datetime(chunk["StrTime"], errors="coerce")).dropna(subset=["dt"])
+            emoji.append(media_stats.count_emoji(chunk))
+            parts.append(chunk)
+            del chunk
+            if after_chunk: after_chunk()
+        return pd.concat(parts), media_stats.combine(media, "Kind"), media_stats.combine(emoji, "Emoji")
+
+    def group_sizes(self, df, keys):
+        """每组的行数（按键排序，与 df.groupby(keys).size() 相同）"""
+        return df.groupby(keys).size()
+
+    def group_cube(self, df, keys):
+        """每组的条数与字数：df 需有 Chars 列，返回 msgs / chars 两列"""
+        return df.groupby(keys).agg(msgs=("Chars", "size"), chars=("Chars", "sum"))
+
+
+class PolarsEngine(PandasEngine):
+    name = "polars"
+
+    def __init__(self):
+        self.pl = timed_import("polars")
+        importlib.import_module("pyarrow")  # polars ↔ pandas 互转需要
+
+    def read_messages(self, path, chunk_rows, encoding, voice=None, after_chunk=None):
+        if encoding.replace("-", "").lower() != "utf8":
+            # polars 只能读 UTF-8，其他编码（GBK 导出）交给 pandas 分块读取
+            return super().read_messages(path, chunk_rows, encoding, voice, after_chunk)
+        pl = self.pl
+        scan = pl.scan_csv(path, infer_schema=False, null_values=PANDAS_NA_VALUES,
+                           truncate_ragged_lines=True).with_row_index(ROW_INDEX)
+        columns = scan.collect_schema().names()
+
+        plans, text = [], scan
+        if "Type" in columns:
+            keep = pl.col("Type") == "1"
+            if voice is not None and voice.id_column in columns: keep = keep | (pl.col("Type") == VOICE_TYPE)
+            text = scan.filter(keep)
+            plans.append(scan.filter(pl.col("Type").is_in(list(media_stats.MEDIA_TYPES)))
+                         .select(Year=pl.col("StrTime").str.slice(0, 4).cast(pl.Int64, strict=False),
+                                 NickName=pl.col("NickName"), IsSender=pl.col("IsSender"),
+                                 Kind=pl.col("Type").replace_strict(media_stats.MEDIA_TYPES))
+                         .drop_nulls().group_by(media_stats.KEYS + ["Kind"]).len())
+        plans.insert(0, text.with_columns(dt=pl.col("StrTime").str.to_datetime(strict=False)))
+        try:
+            # 文本与非文本计数共用一次扫描，多线程执行
+            frames = pl.collect_all(plans)
+        except pl.exceptions.ComputeError as e:
+            raise UnicodeDecodeError("utf-8", b"", 0, 1, str(e))
+
+        df = frames[0].to_pandas()
+        df.index = pd.Index(df.pop(ROW_INDEX).astype("int64").to_numpy())
+        if voice is not None and "Type" in df.columns:
+            keep = df["Type"] == "1"
+            keep.loc[voice.attach(df)] = True
+            df = df[keep]
+        df = df.dropna(subset=["dt"])
+
+        media = []
+        if len(frames) > 1:
+            media.append(frames[1].to_pandas().set_index(media_stats.KEYS + ["Kind"])["len"].rename("n"))
+        emoji = [media_stats.count_emoji(df)]
+        return df, media_stats.combine(media, "Kind"), media_stats.combine(emoji, "Emoji")
+
+    def group_sizes(self, df, keys):
+        pl = self.pl
+        out = (pl.from_pandas(df[keys]).drop_nulls().group_by(keys).len().sort(keys)
+               .to_pandas().set_index(keys)["len"].astype("int64"))
+        out.name = None
+        return out
+
+    def group_cube(self, df, keys):
+        pl = self.pl
+        return (pl.from_pandas(df[keys + ["Chars"]]).drop_nulls(keys).group_by(keys)
+                .agg(msgs=pl.len().cast(pl.Int64), chars=pl.col("Chars").sum()).sort(keys)
+                .to_pandas().set_index(keys))
+
+
+ENGINES = {"pandas": PandasEngine, "polars": PolarsEngine}
+
+
+def get_engine(name):
+    """按名字创建后端；可选依赖缺失时给出安装提示"""
+    if name not in ENGINES: raise ValueError(f"未知引擎: {name}（可选 {', '.join(ENGINES)}）")
+    try:
+        return ENGINES[name]()
+    except ImportError as e:
+        raise RuntimeError(f"{name} 引擎需要额外依赖: pip install polars pyarrow（{e}）") from e
@@ -0,0 +1,109 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import step1_analyze as step1
+import synth_messages
+
+# ===================== 引擎一致性核对 =====================
+# 在一份几千行的合成数据上（固定种子，每次逐字节相同）分别用各后端跑读入、全局统计与逐年快照，
+# 逐项与 pandas 的结果比较。所有中间文件都在临时目录里，结束即删除，不碰真实数据的缓存。
+#   python fixtures/check_engines.py
+# 退出状态：0 一致；1 有不一致；77 有后端缺少可选依赖、没能核对（不当作通过）
+
+ROWS = 3000
+SEED = 2025
+YEARS = (2024, 2025)
+SKIPPED = 77  # 与 automake / meson 的「跳过」约定相同
+
+
+def engine_outputs(name):
+    """用指定后端跑一遍读入、全局统计与逐年快照，返回可比较的结果"""
+    step1.set_engine(name)
+    year = step1.CONFIG["TARGET_YEAR"]
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = step1.load_data()
+        ydf = step1.year_frame(df)
+        aggregates = step1.compute_aggregates(ydf, step1.load_members(year), step1.load_media(year))
+        # 快照只核对计数立方体与分类，词频用按空白切分代替分词，省掉 jieba
+        snapshots = step1.build_year_snapshots(df, df["StrContent"].str.split())
+    media = step1.load_side_table(step1.MEDIA_PATH)
+    return {
+        "messages": df,
+        "members": step1.load_members(),
+        "media": media["media"],
+        "emoji": media["emoji"],
+        "metrics": aggregates["metrics"],
+        "active_groups": aggregates["active_group_names"],
+        "conversations": aggregates["conversations"],
+        "snapshots": snapshots,
+    }
+
+
+def same(a, b):
+    """pandas 对象只比较取值（字符串 / 时间列的具体 dtype 随后端不同），其余用 =="""
+    try:
+        if isinstance(a, pd.DataFrame):
+            pd.testing.assert_frame_equal(a, b, check_dtype=False, check_index_type=False)
+        elif isinstance(a, pd.Series):
+            pd.testing.assert_series_equal(a, b, check_dtype=False, check_index_type=False)
+        elif isinstance(a, dict) and isinstance(b, dict) and a.keys() == b.keys():
+            return all(same(a[k], b[k]) for k in a)
+        else:
+            return a == b
+    except AssertionError:
+        return False
+    return True
+
+
+def check_engines(work):
+    """在 work 目录下生成合成数据并对比各后端与 pandas 的结果，返回 (不一致的项目数, 跳过的后端)"""
+    csv_path = os.path.join(work, "messages.csv")
+    synth_messages.generate(csv_path, ROWS, SEED, YEARS, verbose=False)
+    step1.CONFIG["CSV_PATH"] = csv_path
+    step1.CONFIG["TARGET_YEAR"] = YEARS[-1]
+    step1.use_work_dir(work)
+
+    print(f"🔍 {ROWS:,} 行合成数据（种子 {SEED}）：核对各引擎的结果")
+    expected = engine_outputs("pandas")
+    mismatches, skipped = 0, []
+    for name in step1.engines.ENGINES:
+        if name == "pandas": continue
+        try:
+            t0 = time.perf_counter()
+            actual = engine_outputs(name)
+        except RuntimeError as e:
+            print(f"   ⏭️ {name}: 跳过，{e}")
+            skipped.append(name)
+            continue
+        print(f"   {name} ({time.perf_counter() - t0:.2f}s):")
+        for key, value in expected.items():
+            ok = same(value, actual[key])
+            mismatches += not ok
+            print(f"      {'✅' if ok else '❌'} {key}")
+    step1.set_engine("pandas")
+    return mismatches, skipped
+
+
+def main():
+    with tempfile.TemporaryDirectory(prefix="engine-check-") as work:
+        mismatches, skipped = check_engines(work)
+    if mismatches:
+        print(f"\n❌ {mismatches} 项不一致")
+        return 1
+    if skipped:
+        print(f"\n⏭️ 未核对: {', '.join(skipped)}（缺少可选依赖），不能视为一致")
+        return SKIPPED
+    print("\n✅ 各引擎结果一致")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
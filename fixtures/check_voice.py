@@ -0,0 +1,86 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import engines
+from audio_text import VoiceTranscripts
+
+# ===================== 语音转写关联核对 =====================
+# 用同目录的 Audio2Text.db 核对读入时语音消息与转写的关联（每 3 行一块，关联跨块进行）：
+#   python fixtures/check_voice.py
+# 退出状态：0 一致；1 有不一致。缺少可选依赖的后端会列出来，不计入结果。
+
+VOICE_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Audio2Text.db")
+
+# (Type, MsgSvrID, StrContent, 期望留下的内容)；fixture 里 2^53 与 2^53+1 各有一条转写，id 经过 float 就会取错
+VOICE_CASES = [
+    ("1", "7331695013257396842", "你好", "你好"),                        # 文本消息：id 命中也不替换
+    ("34", "7331695013257396842", "", "今天晚上一起吃饭吧"),              # 大于 2^53 的 id
+    ("34", "-5123456789012345678", "", "好的收到"),                      # 负 id
+    ("34", "9007199254740993", "", "精度没有丢"),                        # 2^53+1
+    ("34", "1234567890123", "", None),                                 # 空转写
+    ("34", "2222", "", None),                                          # 转写为 NULL
+    ("34", "5555", "", None),                                          # 库里没有
+    ("34", "", "", None),                                              # 缺 id
+    ("34", "abc", "", None),                                           # id 不是整数
+    ("3", "7331695013257396842", "", None),                            # 图片
+]
+
+
+def check_voice(work, db_path=VOICE_FIXTURE):
+    """在 work 目录下写出测试 CSV，核对各后端读入时的转写关联，返回 (不一致的项目数, 跳过的后端)"""
+    print(f"🎙️ 核对语音转写关联: {db_path}")
+    frame = pd.DataFrame([{"MsgSvrID": mid, "Type": t, "IsSender": "0", "NickName": "张三",
+                           "StrTime": f"2025-01-01 10:00:{i:02d}", "StrContent": text}
+                          for i, (t, mid, text, _) in enumerate(VOICE_CASES)])
+    expected = {i: want for i, (_, _, _, want) in enumerate(VOICE_CASES) if want is not None}
+    voices = sum(t == "34" for t, _, _, _ in VOICE_CASES)
+    csv_path, bare_path = os.path.join(work, "messages.csv"), os.path.join(work, "no_id.csv")
+    frame.to_csv(csv_path, index=False, encoding="utf-8")
+    frame.drop(columns="MsgSvrID").to_csv(bare_path, index=False, encoding="utf-8")
+
+    mismatches, skipped = 0, []
+    def report(name, ok):
+        nonlocal mismatches
+        mismatches += not ok
+        print(f"   {'✅' if ok else '❌'} {name}")
+
+    for name in engines.ENGINES:
+        try:
+            engine = engines.get_engine(name)
+        except RuntimeError as e:
+            print(f"   ⏭️ {name}: 跳过，{e}")
+            skipped.append(name)
+            continue
+        voice = VoiceTranscripts(db_path, "MsgSvrID")
+        try:
+            df, media, _ = engine.read_messages(csv_path, 3, "utf-8", voice)
+        finally:
+            voice.close()
+        report(f"{name}: 留下的行与内容", df["StrContent"].to_dict() == expected)
+        report(f"{name}: 语音 {voices} 条、转写 3 条", (voice.voices, voice.matched) == (voices, 3))
+        report(f"{name}: 语音仍计入非文本消息", int(media.xs("voice", level="Kind").sum()) == voices)
+
+        voice = VoiceTranscripts(db_path, "MsgSvrID")
+        try:
+            df, _, _ = engine.read_messages(bare_path, 3, "utf-8", voice)
+        finally:
+            voice.close()
+        report(f"{name}: 没有 id 列时只留文本并提示", voice.missing_column and df["StrContent"].tolist() == ["你好"])
+    return mismatches, skipped
+
+
+def main():
+    with tempfile.TemporaryDirectory(prefix="voice-check-") as work:
+        mismatches, skipped = check_voice(work)
+    if skipped: print(f"\n⏭️ 未核对: {', '.join(skipped)}（缺少可选依赖）")
+    print(f"{'❌ ' + str(mismatches) + ' 项不一致' if mismatches else '✅ 语音转写关联正确'}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
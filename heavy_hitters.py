@@ -0,0 +1,56 @@
+import heapq
+from collections import Counter
+
+# ===================== 高频词草图 (Space-Saving) =====================
+# 词云只用得到最高频的几十个词，却要为整段语料建一张完整的词频表；大群的词表可能有几十万个词。
+# Space-Saving 只保留 capacity 个候选词：每个词的估计次数只会偏大、不会偏小，
+# 偏大的量不超过 error_bound()（≤ 总词数 / capacity）；词表小于 capacity 时结果是精确的。
+# 按块喂入（每块先精确计数再合并），不同块、不同进程的草图也能互相合并，保证不变。
+
+
+class SpaceSaving:
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self.counts = {}   # 词 → 估计次数
+        self.errors = {}   # 词 → 估计次数最多偏大多少
+        self.total = 0
+
+    def __len__(self):
+        return len(self.counts)
+
+    def error_bound(self):
+        """没被记住的词，真实次数不超过它；被记住的词，估计值偏大也不超过它"""
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+
+    # ---------- 写入 ----------
+    def update(self, words):
+        """喂入一块词（任意可迭代对象），块内先精确计数"""
+        exact = Counter(words)
+        self._merge(exact, {}, 0, sum(exact.values()))
+        return self
+
+    def merge(self, other):
+        """合并另一份草图（另一块数据 / 另一个进程的结果）"""
+        self._merge(other.counts, other.errors, other.error_bound(), other.total)
+        return self
+
+    def _merge(self, counts, errors, floor, total):
+        # 一方没记住的词，按该方的下界补齐：合并后的误差仍不超过 总词数 / capacity
+        mine = self.error_bound()
+        merged, merged_err = {}, {}
+        for w in self.counts.keys() | counts.keys():
+            merged[w] = self.counts.get(w, mine) + counts.get(w, floor)
+            merged_err[w] = self.errors.get(w, mine) + errors.get(w, floor)
+        if len(merged) > self.capacity:
+            keep = heapq.nlargest(self.capacity, merged, key=lambda w: (merged[w], w))
+            merged = {w: merged[w] for w in keep}
+            merged_err = {w: merged_err[w] for w in keep}
+        self.counts, self.errors = merged, merged_err
+        self.total += total
+
+    # ---------- 读取 ----------
+    def top(self, n=None):
+        """按估计次数从高到低的 Counter（同频按词排序）"""
+        items = sorted(self.counts.items(), key=lambda kv: (-kv[1], kv[0]))
+        return Counter(dict(items[:n] if n else items))
+
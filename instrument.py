@@ -0,0 +1,174 @@
+import cProfile
+import functools
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ===================== 运行剖析 =====================
+# 每个阶段 / 每次 draw_* / 每个画像都是一个 span：
+#   墙钟时间、CPU 时间、峰值内存 (RSS)、处理的行数 / 词数 / 图片数及吞吐
+# 结束后写出 JSON 明细和 Chrome Trace（chrome://tracing 或 https://ui.perfetto.dev 打开）。
+
+THROUGHPUT_KEYS = ("rows", "tokens", "images")
+
+def peak_rss_mb():
+    """进程迄今为止的峰值常驻内存 (MB)；拿不到时返回 None"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 单位是 KB，macOS 是字节
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 1024 / 1024
+    except ImportError:
+        return None
+
+
+def current_rss_mb():
+    """当前常驻内存 (MB)；拿不到时退而返回峰值"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    except ImportError:
+        return peak_rss_mb()
+
+
+class Tracer:
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.spans = []
+        self._stack = []
+        self.profile_target = None
+        self.profile_dir = None
+        self._profiler = None
+        self._profiling = False
+
+    @contextmanager
+    def span(self, name, cat="stage", **args):
+        record = {
+            "name": name,
+            "cat": cat,
+            "args": dict(args),
+            "counters": {},
+            "depth": len(self._stack),
+            "tid": threading.get_ident(),
+        }
+        self._stack.append(record)
+
+        # 同名 span 可能出现多次（如每个画像都会调 draw_wordcloud），累计到同一个 profiler 里
+        profiling = name == self.profile_target and not self._profiling
+        if profiling:
+            if self._profiler is None: self._profiler = cProfile.Profile()
+            self._profiling = True
+            self._profiler.enable()
+
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record["counters"]
+        finally:
+            wall = time.perf_counter() - start
+            cpu = time.process_time() - cpu_start
+            if profiling:
+                self._profiler.disable()
+                self._profiling = False
+            self._stack.pop()
+
+            record["start"] = start - self.t0
+            record["wall"] = wall
+            record["cpu"] = cpu
+            record["peak_rss_mb"] = peak_rss_mb()
+            record["throughput"] = {
+                f"{k}_per_s": record["counters"][k] / wall
+                for k in THROUGHPUT_KEYS if wall > 0 and record["counters"].get(k)
+            }
+            self.spans.append(record)
+
+    def reset(self):
+        """清空已记录的 span（常驻进程每轮重新统计）"""
+        self.t0 = time.perf_counter()
+        self.spans = []
+
+    def count(self, **counters):
+        """给当前所有打开的 span 累加计数（外层阶段自然汇总内层的图片数等）"""
+        for record in self._stack:
+            c = record["counters"]
+            for k, v in counters.items():
+                c[k] = c.get(k, 0) + v
+
+    def traced(self, cat="chart"):
+        """装饰 draw_* 之类的函数：第一个参数是 DataFrame 时记行数，返回非空即记一张图"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*a, **kw):
+                with self.span(fn.__name__, cat=cat):
+                    if a and hasattr(a[0], "columns"):
+                        self.count(rows=len(a[0]))
+                    result = fn(*a, **kw)
+                    if result is not None:
+                        self.count(images=1)
+                    return result
+            return wrapper
+        return decorator
+
+    def dump_profile(self, top=20):
+        """写出 profile_target 的累计 cProfile 结果（snakeviz / pstats 可读），并打印耗时前 top 的函数"""
+        if self._profiler is None:
+            if self.profile_target: print(f"⚠️ 没有名为 {self.profile_target} 的 span 运行过（阶段已是最新？可加 --force）")
+            return None
+        path = None
+        if self.profile_dir:
+            safe = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in self.profile_target)
+            os.makedirs(self.profile_dir, exist_ok=True)
+            path = os.path.join(self.profile_dir, f"{safe}.prof")
+            self._profiler.dump_stats(path)
+        print(f"🔬 [{self.profile_target}] cProfile（按累计耗时）:")
+        pstats.Stats(self._profiler).sort_stats("cumulative").print_stats(top)
+        return path
+
+    # ---------- 输出 ----------
+    def write(self, json_path, chrome_path):
+        os.makedirs(os.path.dirname(os.path.abspath(json_path)), exist_ok=True)
+        spans = sorted(self.spans, key=lambda r: r["start"])
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"spans": spans}, f, ensure_ascii=False, indent=1)
+
+        pid = os.getpid()
+        events = []
+        for r in spans:
+            args = dict(r["args"], **r["counters"])
+            args["cpu_s"] = round(r["cpu"], 4)
+            if r["peak_rss_mb"] is not None: args["peak_rss_mb"] = round(r["peak_rss_mb"], 1)
+            events.append({
+                "name": r["name"], "cat": r["cat"], "ph": "X", "pid": pid, "tid": r["tid"],
+                "ts": round(r["start"] * 1e6), "dur": round(r["wall"] * 1e6), "args": args,
+            })
+        with open(chrome_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+    def summary(self, cat="stage"):
+        lines = []
+        for r in sorted(self.spans, key=lambda r: r["start"]):
+            if r["cat"] != cat: continue
+            rss = f"{r['peak_rss_mb']:.0f}MB" if r["peak_rss_mb"] is not None else "n/a"
+            rates = " ".join(f"{k.replace('_per_s', '')} {v:,.0f}/s" for k, v in r["throughput"].items())
+            lines.append(f"   {r['name']:<14} 墙钟 {r['wall']:7.2f}s  CPU {r['cpu']:7.2f}s  峰值内存 {rss:>7}  {rates}")
+        return "\n".join(lines)
+
+
+TRACER = Tracer()
@@ -0,0 +1,71 @@
+import hashlib
+import io
+import marshal
+import mmap
+import os
+import sys
+import time
+
+from lazy_import import timed_import
+
+# ===================== jieba 预构建词典 =====================
+# jieba 每次启动都要：反序列化前缀词典（~1s）+ import posseg 时逐行解析 dict.txt 词性表（~0.5s）
+# + 逐个 add_word 加载自定义词。这里把三者合并成一个 marshal 文件，之后用 mmap 一次性读回。
+
+DICT_CACHE_VERSION = 1
+
+
+def _cache_key(jieba, user_dicts):
+    h = hashlib.sha256()
+    h.update(f"{DICT_CACHE_VERSION}|{jieba.__version__}|{sys.version_info[:2]}".encode())
+    for path in user_dicts:
+        h.update(path.encode())
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+def _import_posseg_without_tag_table(jieba):
+    """导入 jieba.posseg 但跳过它在导入时对 dict.txt 的逐行解析（词性表随后从缓存填入）"""
+    if "jieba.posseg" in sys.modules:
+        return sys.modules["jieba.posseg"]
+    jieba.dt.get_dict_file = lambda: io.BytesIO()
+    try:
+        return timed_import("jieba.posseg")
+    finally:
+        del jieba.dt.get_dict_file
+
+
+def warm_start(cache_dir, user_dicts=()):
+    """
+    准备好 jieba 与 jieba.posseg（含自定义词），返回 (是否命中缓存, 耗时秒)。
+    命中时不再解析任何词典文本。
+    """
+    t0 = time.perf_counter()
+    jieba = timed_import("jieba")
+    user_dicts = [p for p in user_dicts if p]
+    path = os.path.join(cache_dir, f"jieba-{_cache_key(jieba, user_dicts)}.bin")
+
+    if os.path.exists(path):
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            freq, total, word_tags = marshal.loads(mm)
+        jieba.dt.FREQ, jieba.dt.total = freq, total
+        jieba.dt.initialized = True
+        pseg = _import_posseg_without_tag_table(jieba)
+        pseg.dt.word_tag_tab = word_tags
+        return True, time.perf_counter() - t0
+
+    # 冷启动：按 jieba 原流程构建一次，再整体落盘
+    pseg = timed_import("jieba.posseg")
+    jieba.initialize()
+    for user_dict in user_dicts:
+        if os.path.exists(user_dict):
+            jieba.load_userdict(user_dict)
+    pseg.dt.makesure_userdict_loaded()
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        marshal.dump((jieba.dt.FREQ, jieba.dt.total, pseg.dt.word_tag_tab), f)
+    os.replace(path + ".tmp", path)
+    return False, time.perf_counter() - t0
@@ -0,0 +1,54 @@
+from lazy_import import lazy
+
+np = lazy("numpy")
+pd = lazy("pandas")
+
+# ===================== 关键词倒排索引 =====================
+# 复用分词阶段的逐条词列表，给全年出现次数不低于 min_count 的关键词建倒排表：
+#   每天出现几次（按年内第几天）+ 每个聊天里出现几次（按联系人编号）。
+# 两组编号都是递增的，存成差分（delta）整数数组，嵌进报告后由页面脚本解码，搜索完全在浏览器里完成。
+#
+# 格式：{"year", "days", "min_count", "contacts": [名字...],
+#        "words": {词: [总次数, [日差分...], [日次数...], [联系人差分...], [联系人次数...]]}}
+
+
+def delta_encode(values):
+    """递增整数序列 → 首项 + 相邻差值"""
+    return np.diff(np.asarray(values, dtype=np.int64), prepend=0).tolist()
+
+
+def _postings(counts):
+    """(词, 编号) → 次数 的 Series（已按词、编号排序）拆成每个词的 (编号差分, 次数)"""
+    words = counts.index.get_level_values(0).to_numpy()
+    ids = counts.index.get_level_values(1).to_numpy()
+    values = counts.to_numpy()
+    bounds = np.flatnonzero(np.r_[True, words[1:] != words[:-1], True])
+    return {words[a]: (delta_encode(ids[a:b]), values[a:b].tolist()) for a, b in zip(bounds[:-1], bounds[1:])}
+
+
+def build_keyword_index(df, tokens, year, min_count, label=str):
+    """df 为某一年的消息，tokens 为与之按行对齐的词列表 Series；没有关键词时返回 None"""
+    words = tokens.loc[df.index].explode().dropna()
+    if words.empty: return None
+
+    codes, names = pd.factorize(df["NickName"], sort=True)
+    start = pd.Timestamp(year, 1, 1)
+    table = pd.DataFrame({
+        "word": words.to_numpy(),
+        "day": (df["dt"] - start).dt.days.loc[words.index].to_numpy(),
+        "contact": pd.Series(codes, index=df.index).loc[words.index].to_numpy(),
+    })
+    totals = table["word"].value_counts()
+    totals = totals[totals >= min_count]
+    table = table[table["word"].isin(totals.index)]
+    if table.empty: return None
+
+    by_day = _postings(table.groupby(["word", "day"]).size())
+    by_contact = _postings(table.groupby(["word", "contact"]).size())
+    return {
+        "year": int(year),
+        "days": 366 if pd.Timestamp(year, 12, 31).dayofyear == 366 else 365,
+        "min_count": int(min_count),
+        "contacts": [label(n) for n in names],
+        "words": {w: [int(totals[w]), *by_day[w], *by_contact[w]] for w in totals.index},
+    }
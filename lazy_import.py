@@ -0,0 +1,49 @@
+import importlib
+import time
+
+# ===================== 按需导入 =====================
+# pandas / matplotlib / seaborn / jieba 这些重型依赖只在第一次真正用到时才导入，
+# 导入耗时记录在 IMPORT_TIMES 里，运行结束时打印到汇总中。
+
+IMPORT_TIMES = {}
+
+
+class LazyModule:
+    """第一次访问属性时才 import 对应模块"""
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            module = timed_import(self.__dict__["_name"])
+            self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return f"<lazy module {self.__dict__['_name']!r} ({state})>"
+
+
+def lazy(name):
+    return LazyModule(name)
+
+
+def timed_import(name):
+    t0 = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMES.setdefault(name, time.perf_counter() - t0)
+    return module
+
+
+def import_summary():
+    if not IMPORT_TIMES: return "⏱️ 导入耗时: 未导入任何重型依赖"
+    items = sorted(IMPORT_TIMES.items(), key=lambda kv: -kv[1])
+    total = sum(t for _, t in items)
+    detail = " | ".join(f"{name} {t:.2f}s" for name, t in items)
+    return f"⏱️ 导入耗时 {total:.2f}s: {detail}"
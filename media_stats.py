@@ -0,0 +1,83 @@
+import re
+
+from lazy_import import lazy
+
+pd = lazy("pandas")
+
+# ===================== 非文本消息与表情 =====================
+# 读 CSV 时顺带统计，不需要再扫一遍：
+#   * 图片 / 语音 / 视频 / 表情包 / 链接等非文本消息：每块只取 Type、NickName、IsSender、StrTime 四列计数，
+#     随后整行丢弃，它们的 StrContent 不会进入消息表；
+#   * 文本里的表情：微信表情码（[捂脸]）和 emoji，按 (年份, 聊天, 是否我发, 表情) 计数。
+# 两张表都很小，随 ingest 阶段一起落盘，全局指标和每个画像都从这里取。
+
+# MemoTrace 导出的消息类型
+MEDIA_TYPES = {"3": "image", "34": "voice", "43": "video", "47": "sticker", "49": "link"}
+KEYS = ["Year", "NickName", "IsSender"]
+EMOJI_RE = re.compile(r"\[[\u4e00-\u9fa5A-Za-z]{1,5}\]|[\U0001F000-\U0001FAFF\u2600-\u27bf]")
+TOP_EMOJI = 10
+
+
+def _normalize(table, extra):
+    """与消息表相同的清洗规则（昵称去空白、IsSender 转整数）后重新合计"""
+    table = table.reset_index()
+    table["NickName"] = table["NickName"].fillna("Unknown").str.strip()
+    table["IsSender"] = pd.to_numeric(table["IsSender"], errors="coerce").fillna(0).astype(int)
+    table["Year"] = table["Year"].astype(int)
+    return table.groupby(KEYS + [extra])["n"].sum()
+
+
+def count_media(chunk):
+    """一块原始数据里非文本消息的条数：(Year, NickName, IsSender, Kind) → n"""
+    other = chunk.loc[chunk["Type"].isin(MEDIA_TYPES.keys()), ["Type", "NickName", "IsSender", "StrTime"]]
+    if other.empty: return None
+    year = pd.to_numeric(other["StrTime"].str[:4], errors="coerce")
+    return (other.assign(Year=year, Kind=other["Type"].map(MEDIA_TYPES))
+            .groupby(KEYS + ["Kind"]).size().rename("n"))
+
+
+def count_emoji(texts):
+    """文本消息（已解析出 dt）里的表情：(Year, NickName, IsSender, Emoji) → n"""
+    found = texts["StrContent"].str.findall(EMOJI_RE).explode().dropna()
+    if found.empty: return None
+    rows = texts.loc[found.index]
+    return (pd.DataFrame({"Year": rows["dt"].dt.year, "NickName": rows["NickName"],
+                          "IsSender": rows["IsSender"], "Emoji": found})
+            .groupby(KEYS + ["Emoji"]).size().rename("n"))
+
+
+def combine(parts, extra):
+    """各块的计数合并成一张表"""
+    parts = [p for p in parts if p is not None]
+    if not parts:
+        index = pd.MultiIndex.from_arrays([[]] * (len(KEYS) + 1), names=KEYS + [extra])
+        return pd.Series([], index=index, dtype="int64", name="n")
+    return _normalize(pd.concat(parts).groupby(level=list(range(len(KEYS) + 1))).sum().rename("n"), extra)
+
+
+def year_slice(table, year):
+    if year not in table.index.get_level_values("Year"): return table.iloc[:0].droplevel("Year")
+    return table.xs(year, level="Year")
+
+
+def _top_emoji(emoji):
+    top = emoji.groupby(level="Emoji").sum().sort_values(ascending=False, kind="stable").head(TOP_EMOJI)
+    return [[e, int(n)] for e, n in top.items()]
+
+
+def summarize(media, emoji, name=None):
+    """某一年（或其中某个聊天）的非文本消息条数与常用表情，转成可写入 manifest 的 dict"""
+    if name is not None:
+        names = media.index.get_level_values("NickName")
+        media = media[names == name]
+        emoji = emoji[emoji.index.get_level_values("NickName") == name]
+    by_kind = media.groupby(level="Kind").sum()
+    mine = media[media.index.get_level_values("IsSender") == 1].groupby(level="Kind").sum()
+    my_emoji = emoji[emoji.index.get_level_values("IsSender") == 1]
+    return {
+        "types": {kind: int(by_kind.get(kind, 0)) for kind in MEDIA_TYPES.values()},
+        "sent": {kind: int(mine.get(kind, 0)) for kind in MEDIA_TYPES.values()},
+        "emoji_total": int(emoji.sum()),
+        "top_emoji": _top_emoji(emoji),
+        "my_top_emoji": _top_emoji(my_emoji),
+    }
@@ -0,0 +1,83 @@
+import gc
+import os
+
+from instrument import current_rss_mb, peak_rss_mb
+
+# ===================== 内存预算 =====================
+# --memory-budget 2G：按内存上限决定 CSV 分块大小、词频在内存里最多攒多少再落盘、并行进程数，
+# 运行中内存逼近上限时主动回收、提前落盘，结束时用峰值 RSS 核对是否守住了预算。
+
+# 读进来的 object 字符串列大约是 CSV 原文的这么多倍
+CSV_EXPANSION = 10
+# 逼近上限的告警线
+PRESSURE_RATIO = 0.85
+# jieba 词典 + pandas / matplotlib 本身的常驻内存，与数据量无关，预算低于它无法守住
+FIXED_COST_MB = 300
+
+
+def parse_size(text):
+    """'2G' / '1500M' / '2048'（默认 MB）→ MB"""
+    text = str(text).strip().upper().rstrip("B")
+    units = {"K": 1 / 1024, "M": 1, "G": 1024, "T": 1024 * 1024}
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def csv_bytes_per_row(path, sample_bytes=1 << 20):
+    """读文件开头一段估算每行字节数"""
+    with open(path, "rb") as f:
+        sample = f.read(sample_bytes)
+    lines = sample.count(b"\n")
+    return len(sample) / lines if lines else len(sample) or 1
+
+
+class MemoryBudget:
+    def __init__(self, limit_mb):
+        self.limit_mb = float(limit_mb)
+        self.baseline_mb = current_rss_mb() or 0.0
+        self.events = []
+
+    def headroom_mb(self):
+        return max(0.0, self.limit_mb - (current_rss_mb() or 0.0))
+
+    def share_mb(self, fraction):
+        """把当前剩余空间的 fraction 分给某项工作，至少给 16MB"""
+        return max(16.0, self.headroom_mb() * fraction)
+
+    def csv_chunk_rows(self, path, fraction=0.2, cap=1_000_000):
+        """每块读进来（含字符串对象开销）不超过剩余空间的 fraction"""
+        row_mb = csv_bytes_per_row(path) * CSV_EXPANSION / 1024 / 1024
+        return int(max(5_000, min(cap, self.share_mb(fraction) / row_mb)))
+
+    def spill_entries(self, fraction=0.15, entry_bytes=200):
+        """词频在内存里最多攒多少个 (分组, 词) 条目再落盘"""
+        return int(max(10_000, self.share_mb(fraction) * 1024 * 1024 / entry_bytes))
+
+    def max_workers(self, per_worker_mb, cap=None):
+        """按剩余空间决定最多开几个并行进程（至少 1 个）"""
+        cap = cap or os.cpu_count() or 1
+        return int(max(1, min(cap, self.headroom_mb() // max(per_worker_mb, 1))))
+
+    def under_pressure(self):
+        return (current_rss_mb() or 0.0) > self.limit_mb * PRESSURE_RATIO
+
+    def relieve(self, where):
+        """内存吃紧时回收一次，并记下降级事件"""
+        before = current_rss_mb() or 0.0
+        gc.collect()
+        after = current_rss_mb() or 0.0
+        self.events.append(f"{where}: {before:.0f}MB → {after:.0f}MB")
+        return after
+
+    def summary(self):
+        peak = peak_rss_mb()
+        if peak is None:
+            return f"🧮 内存预算 {self.limit_mb:.0f}MB（本平台无法读取峰值内存）"
+        status = "✅ 未超出" if peak <= self.limit_mb else "⚠️ 超出"
+        line = f"🧮 内存预算 {self.limit_mb:.0f}MB | 峰值 {peak:.0f}MB {status}"
+        if self.events:
+            line += f" | 降级 {len(self.events)} 次: " + "; ".join(self.events[:5])
+        if peak > self.limit_mb and self.limit_mb < FIXED_COST_MB + 100:
+            line += f"\n   （jieba 词典与绘图库常驻约 {FIXED_COST_MB}MB，预算建议不低于 {FIXED_COST_MB + 200}MB）"
+        return line
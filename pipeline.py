@@ -0,0 +1,239 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import time
+from contextlib import nullcontext
+
+# ===================== 流水线 =====================
+# 每个阶段记录「输入指纹」和「输出产物」，像 make 一样：
+#   指纹 = 代码 + 相关配置 + 输入文件内容 + 上游阶段产物的哈希
+#   指纹没变且产物都还在 → 跳过；上游重跑但产物没变 → 下游照样跳过
+# 耗时的阶段可以在运行中途存档（checkpoints()）：崩溃或部分失败后重跑，指纹没变就从存档接着做；
+# 阶段完整完成后存档即删除。
+
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk: break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Stage:
+    """
+    name    —— 阶段名（命令行 --force 用）
+    run     —— run(pipe) -> 结果；结果会被 pickle 到 .cache/pipeline/<name>.pkl
+               （返回 None 表示产物由阶段自己写在 outputs 里）
+    deps    —— 依赖的上游阶段名
+    files   —— 返回输入文件路径列表的函数
+    params  —— 返回相关配置 dict 的函数
+    outputs —— 返回阶段自己写出的文件路径列表的函数
+    code    —— 参与指纹的源码：模块 / 类 / 函数，或文件路径（函数按其源码计算，改别处不会让它失效）
+    variant —— 返回变体标识的函数（如报告年份）：每个变体各自记录状态和产物，切回来时不必重跑
+    """
+
+    def __init__(self, name, run, deps=(), files=None, params=None, outputs=None, code=(), variant=None):
+        self.name = name
+        self.run = run
+        self.deps = list(deps)
+        self.files = files or (lambda: [])
+        self.params = params or (lambda: {})
+        self.outputs = outputs or (lambda: [])
+        self.code = list(code)
+        self.variant = variant
+
+    def key(self):
+        """状态与产物使用的键：没有变体时就是阶段名，否则为 名字@变体"""
+        return self.name if self.variant is None else f"{self.name}@{self.variant()}"
+
+
+class Checkpoints:
+    """一个阶段（某个指纹下）的中途存档：每份存档一个 pickle 文件，原子写入"""
+
+    def __init__(self, directory, fingerprint):
+        self.directory = directory
+        self.restored = 0
+        stamp = os.path.join(directory, "FINGERPRINT")
+        try:
+            with open(stamp, encoding="utf-8") as f:
+                valid = f.read() == fingerprint
+        except OSError:
+            valid = False
+        if not valid:
+            # 输入或代码变了，旧存档作废
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory, exist_ok=True)
+            with open(stamp, "w", encoding="utf-8") as f:
+                f.write(fingerprint)
+
+    def _path(self, name):
+        return os.path.join(self.directory, hashlib.sha256(name.encode("utf-8")).hexdigest()[:24] + ".pkl")
+
+    def get(self, name):
+        """取回存档，没有（或已损坏）时返回 None"""
+        try:
+            with open(self._path(name), "rb") as f:
+                obj = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        self.restored += 1
+        return obj
+
+    def put(self, name, obj):
+        path = self._path(name)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class Pipeline:
+    def __init__(self, stages, state_dir, tracer=None, keep_results=True):
+        self.stages = stages
+        self.tracer = tracer
+        self.keep_results = keep_results
+        self.by_name = {s.name: s for s in stages}
+        self.state_dir = state_dir
+        self.state_path = os.path.join(state_dir, "state.json")
+        self.state = self._load_state()
+        self.results = {}
+        self.report = []
+        self._running = None      # (阶段, 指纹)
+        self._incomplete = None
+
+    # ---------- 状态 ----------
+    def _load_state(self):
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.state_path)
+
+    def artifact_path(self, key):
+        return os.path.join(self.state_dir, f"{key}.pkl")
+
+    # ---------- 指纹 ----------
+    def fingerprint(self, stage):
+        h = hashlib.sha256()
+        for item in stage.code:
+            if isinstance(item, str):
+                h.update(file_digest(item).encode())
+            else:
+                h.update(inspect.getsource(item).encode())
+        h.update(json.dumps(stage.params(), sort_keys=True, ensure_ascii=False, default=str).encode())
+        for path in stage.files():
+            h.update(path.encode())
+            h.update(file_digest(path).encode() if os.path.exists(path) else b"missing")
+        for dep in stage.deps:
+            h.update(self.state.get(self.by_name[dep].key(), {}).get("output_hash", "").encode())
+        return h.hexdigest()
+
+    def _output_files(self, stage):
+        """阶段写出的文件加上返回结果的产物：两者都参与下游指纹（只有其一时就是那一个）"""
+        files = list(stage.outputs())
+        artifact = self.artifact_path(stage.key())
+        if not files or os.path.exists(artifact): files.append(artifact)
+        return files
+
+    def _output_hash(self, stage):
+        h = hashlib.sha256()
+        for path in self._output_files(stage):
+            h.update(file_digest(path).encode())
+        return h.hexdigest()
+
+    def up_to_date(self, stage, fp):
+        record = self.state.get(stage.key())
+        if not record or record.get("fingerprint") != fp: return False
+        if not all(os.path.exists(p) for p in self._output_files(stage)): return False
+        # 阶段自己写出的文件可能被别的变体覆盖（如不同年份写同一个 report_data.zip），要核对内容
+        return not stage.outputs() or record.get("output_hash") == self._output_hash(stage)
+
+    # ---------- 存档 ----------
+    def _checkpoint_dir(self, stage):
+        return os.path.join(self.state_dir, "checkpoints", stage.key())
+
+    def checkpoints(self):
+        """当前运行阶段的存档区"""
+        stage, fp = self._running
+        return Checkpoints(self._checkpoint_dir(stage), fp)
+
+    def mark_incomplete(self, reason):
+        """当前阶段只完成了一部分（产物照常写出、下游照常运行），下次运行时重跑它，并保留存档"""
+        self._incomplete = reason
+
+    # ---------- 运行 ----------
+    def get(self, name):
+        """取上游阶段的结果：本次运行过就用内存里的，否则从产物读回"""
+        if name not in self.results:
+            with open(self.artifact_path(self.by_name[name].key()), "rb") as f:
+                self.results[name] = pickle.load(f)
+        return self.results[name]
+
+    def _release(self, upcoming):
+        """不保留结果时：后面的阶段用不到的结果立即释放（需要时仍可从产物读回）"""
+        needed = {dep for stage in upcoming for dep in stage.deps}
+        for name in list(self.results):
+            if name not in needed: del self.results[name]
+
+    def run(self, force=(), until=None):
+        force = set(force)
+        if "all" in force: force = set(self.by_name)
+        unknown = force - set(self.by_name)
+        if unknown: raise ValueError(f"未知阶段: {', '.join(sorted(unknown))}")
+
+        for i, stage in enumerate(self.stages):
+            fp = self.fingerprint(stage)
+            if stage.name not in force and self.up_to_date(stage, fp):
+                print(f"⏭️  [{stage.key()}] 已是最新，跳过")
+                self.report.append({"stage": stage.name, "skipped": True})
+            else:
+                print(f"▶️  [{stage.key()}] 运行中 ...")
+                t0 = time.perf_counter()
+                self._running, self._incomplete = (stage, fp), None
+                with (self.tracer.span(stage.name, cat="stage") if self.tracer else nullcontext()):
+                    result = stage.run(self)
+                self._running = None
+                if result is not None:
+                    self.results[stage.name] = result
+                    os.makedirs(self.state_dir, exist_ok=True)
+                    path = self.artifact_path(stage.key())
+                    with open(path + ".tmp", "wb") as f:
+                        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    os.replace(path + ".tmp", path)
+                seconds = time.perf_counter() - t0
+
+                self.state[stage.key()] = {
+                    # 部分完成的阶段不记指纹，下次一定重跑
+                    "fingerprint": None if self._incomplete else fp,
+                    "output_hash": self._output_hash(stage),
+                    "outputs": self._output_files(stage),
+                    "seconds": round(seconds, 3),
+                    "finished_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                }
+                if self._incomplete: self.state[stage.key()]["incomplete"] = self._incomplete
+                self._save_state()
+                self.report.append({"stage": stage.name, "skipped": False, "seconds": seconds,
+                                    "incomplete": self._incomplete})
+                if self._incomplete:
+                    print(f"⚠️  [{stage.key()}] 部分完成（{self._incomplete}），用时 {seconds:.1f}s；下次运行只补做未完成的部分")
+                else:
+                    shutil.rmtree(self._checkpoint_dir(stage), ignore_errors=True)
+                    print(f"✅ [{stage.key()}] 完成，用时 {seconds:.1f}s")
+            if not self.keep_results: self._release(self.stages[i + 1:])
+            if stage.name == until: break
+        return self.report
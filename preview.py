@@ -0,0 +1,36 @@
+from lazy_import import lazy
+
+np = lazy("numpy")
+pd = lazy("pandas")
+
+# ===================== 抽样预览 =====================
+# 调配色、标题、排版时不必跑全量。最耗时的是分词，所以预览只对样本分词：
+# 按 (聊天, 年, 月) 分层，每层按行内容的哈希取前 ceil(比例 × 层大小) 条，同一份导出每次抽到的都是同一批消息
+# （与行顺序无关），每个聊天的每个月至少留 1 条，词云仍覆盖所有聊天。小聊天多的导出实际比例会高于给定比例。
+# 条数、字数、会话、回复速度、画像与图表都在全量消息上计算，不做任何放大；
+# 只有关键词索引里的次数按当年「全量 / 样本」放大为估计值。
+
+DEFAULT_FRACTION = 0.05
+STRATA = ["NickName", "Year", "Month"]
+
+
+def stratified_sample(df, fraction):
+    """按 (NickName, Year, Month) 分层的确定性抽样，保持原有行顺序"""
+    h = pd.util.hash_pandas_object(df[["NickName", "StrTime", "StrContent"]], index=False)
+    strata = [df["NickName"], df["Year"], df["dt"].dt.month.rename("Month")]
+    rank = h.groupby(strata, sort=False).rank(method="first")
+    size = h.groupby(strata, sort=False).transform("size")
+    return df[rank <= np.ceil(size * fraction)]
+
+
+def _scale(value, factor):
+    return int(round(value * factor)) if value else value
+
+
+def scale_index(index, factor):
+    """关键词索引里的次数按比例放大（出现过的至少记 1 次）"""
+    for entry in index["words"].values():
+        entry[0] = _scale(entry[0], factor)
+        entry[2] = [max(1, _scale(n, factor)) for n in entry[2]]
+        entry[4] = [max(1, _scale(n, factor)) for n in entry[4]]
+    return index
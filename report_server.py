@@ -0,0 +1,320 @@
+import argparse
+import hashlib
+import html
+import sys
+import threading
+import webbrowser
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+import step1_analyze as step1
+import step2_render as step2
+from memory_budget import parse_size
+from report_store import open_report
+
+# ===================== 本地报告服务 =====================
+# 静态报告只放得下 Top 10 好友 / 群聊的画像；本地服务模式下可以浏览全部联系人：
+# 总览页直接读 report_data.zip，任意联系人的画像在第一次打开时才用流水线缓存的消息表与分词结果现画。
+# 画好的页面和图片放在按字节数淘汰的内存 LRU 里，图表本身还有 .cache/charts/ 兜底，重画很快。
+# 只监听 127.0.0.1，聊天数据不会离开本机。
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+PAGE_CACHE_MB = 16
+IMAGE_CACHE_MB = 256
+KINDS = {"private": "Private", "group": "Group"}
+
+SERVER_CSS = """
+    .server-nav {
+        position: fixed; top: 16px; right: 20px; z-index: 10;
+        display: flex; gap: 10px;
+    }
+    .server-nav a {
+        padding: 8px 16px; border-radius: 20px; background: rgba(34,34,34,0.85);
+        border: 1px solid #444; color: #fff; text-decoration: none; font-size: 0.9rem;
+    }
+    .server-nav a:hover { background: #fff; color: #000; }
+    .contact-search {
+        display: block; margin: 0 auto 30px; width: 100%; max-width: 600px;
+        padding: 12px 18px; border-radius: 24px; border: 1px solid #333;
+        background: #111; color: #fff; font-size: 1rem;
+    }
+    .contact-table { border-collapse: collapse; margin: 0 auto; width: 100%; max-width: 700px; }
+    .contact-table td { padding: 10px 14px; border-bottom: 1px solid #1a1a1a; }
+    .contact-table td.rank { color: #666; width: 60px; }
+    .contact-table td.count { color: var(--accent-blue); text-align: right; white-space: nowrap; }
+    .contact-table a { color: #fff; text-decoration: none; }
+    .contact-table a:hover { color: var(--accent-blue); }
+"""
+
+SEARCH_SCRIPT = """
+<script>
+    const box = document.querySelector('.contact-search');
+    const rows = Array.from(document.querySelectorAll('.contact-table tr'));
+    box.addEventListener('input', () => {
+        const q = box.value.trim().toLowerCase();
+        rows.forEach(r => { r.style.display = r.dataset.name.includes(q) ? '' : 'none'; });
+    });
+</script>
+"""
+
+
+class LRUCache:
+    """按字节数淘汰的 LRU，多线程共用"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None: self.size -= len(old)
+            self._items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes and len(self._items) > 1:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def pop(self, key):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None: self.size -= len(old)
+
+    def summary(self, label):
+        total = self.hits + self.misses
+        rate = f"{self.hits / total:.0%}" if total else "-"
+        return f"{label} {len(self._items)} 项 / {self.size / 1024 / 1024:.1f}MB，命中率 {rate}"
+
+
+class ImageCache:
+    """给 build_profile 当图片容器：按内容哈希放进 LRU，并记下每张图出自哪个页面"""
+
+    def __init__(self, cache, owner):
+        self.cache = cache
+        self.owner = owner
+        self.page = None
+
+    def add_image(self, png):
+        if not png: return None
+        ref = hashlib.sha256(png).hexdigest()[:20] + ".png"
+        self.cache.put(ref, png)
+        self.owner[ref] = self.page
+        return ref
+
+
+def img_tag(url, raw):
+    if not raw: return ""
+    size = step2.png_size(raw)
+    dims = f' width="{size[0]}" height="{size[1]}"' if size else ""
+    return f'<img src="{url}"{dims} loading="lazy" decoding="async">'
+
+
+def contact_url(kind, name):
+    return f"/contact?type={kind}&name={quote(name)}"
+
+
+class ReportServer:
+    def __init__(self, pipe, report, page_mb=PAGE_CACHE_MB, image_mb=IMAGE_CACHE_MB):
+        self.report = report
+        self.df = step1.target_year_frame(pipe)
+        self.tokens = pipe.get("tokenize")
+        self.conversations = pipe.get("aggregate").get("conversations")
+        self.members = step1.load_members(step1.CONFIG["TARGET_YEAR"])
+        self.media = step1.load_media(step1.CONFIG["TARGET_YEAR"])
+        self.year = step2.report_year(report.manifest.get("metrics", {}))
+        self.pages = LRUCache(page_mb * 1024 * 1024)
+        self.images = LRUCache(image_mb * 1024 * 1024)
+        self.image_owner = {}
+        self.store = ImageCache(self.images, self.image_owner)
+        # matplotlib 与词频查询都不是线程安全的，画图串行进行
+        self.render_lock = threading.Lock()
+        self._summary = None
+
+        # 每类联系人按消息数排名
+        self.contacts = {}
+        for kind, chat_type in KINDS.items():
+            counts = self.df[self.df["ChatType"] == chat_type].groupby("NickName").size()
+            self.contacts[kind] = counts.sort_values(ascending=False, kind="stable")
+        self.ranks = {kind: {name: rank for rank, name in enumerate(counts.index, 1)}
+                      for kind, counts in self.contacts.items()}
+
+    def nav(self):
+        return f"""
+<div class="server-nav">
+    <a href="/">📊 总览</a>
+    <a href="/contacts?type=private">👤 全部好友 ({len(self.contacts["private"])})</a>
+    <a href="/contacts?type=group">👥 全部群聊 ({len(self.contacts["group"])})</a>
+</div>
+"""
+
+    def head(self):
+        return step2.render_head(self.year, SERVER_CSS) + self.nav()
+
+    # ---------- 页面 ----------
+    def summary_page(self):
+        """总览即静态报告本身，图片改为从容器按需读取"""
+        if self._summary is None:
+            chunks = step2.iter_report(self.report.manifest,
+                                       lambda ref: img_tag(f"/report/{ref}", self.report.image(ref)),
+                                       self.report.text)
+            first = next(chunks)
+            self._summary = first + f"<style>{SERVER_CSS}</style>" + self.nav() + "".join(chunks)
+        return self._summary
+
+    def contacts_page(self, kind):
+        counts = self.contacts[kind]
+        title = "👤 全部好友" if kind == "private" else "👥 全部群聊"
+        rows = []
+        for rank, (name, n) in enumerate(counts.items(), 1):
+            label = html.escape(step1.clean_text(name))
+            rows.append(f'<tr data-name="{html.escape(str(name).lower())}"><td class="rank">#{rank}</td>'
+                        f'<td><a href="{contact_url(kind, name)}">{label}</a></td>'
+                        f'<td class="count">{n:,} 条</td></tr>')
+        return (self.head() + f"""
+    <section class="section scrollable">
+        <div class="page-title">{title}（{len(counts)}）</div>
+        <input class="contact-search" placeholder="搜索名字…">
+        <table class="contact-table">{"".join(rows)}</table>
+    </section>
+""" + SEARCH_SCRIPT + step2.render_tail())
+
+    def profile_page(self, kind, name):
+        key = f"{kind}/{name}"
+        page = self.pages.get(key)
+        if page is not None: return page
+
+        rank = self.ranks[kind].get(name)
+        if rank is None: return None
+        with self.render_lock:
+            sub = self.df[(self.df["ChatType"] == KINDS[kind]) & (self.df["NickName"] == name)]
+            self.store.page = key
+            conversation = step1.profile_conversation(self.conversations, kind == "group", name)
+            item = step1.build_profile(rank, name, sub, self.store, self.tokens, kind == "group",
+                                       conversation, self.members, self.media)
+
+        card = step2.render_profile_card(item, lambda ref: img_tag(f"/img/{ref}", self.images.get(ref)))
+        page = self.head() + f"""
+    <section class="section scrollable">
+        {card}
+    </section>
+""" + step2.render_tail()
+        self.pages.put(key, page)
+        return page
+
+    # ---------- 图片 ----------
+    def image(self, ref):
+        """图片被挤出 LRU 时，重画它所在的页面（图表缓存命中，很快）"""
+        raw = self.images.get(ref)
+        if raw is None and ref in self.image_owner:
+            kind, name = self.image_owner[ref].split("/", 1)
+            self.pages.pop(self.image_owner[ref])
+            self.profile_page(kind, name)
+            raw = self.images.get(ref)
+        return raw
+
+    def summary(self):
+        return f"🗄️ {self.pages.summary('页面缓存')} | {self.images.summary('图片缓存')}"
+
+
+def make_handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            try:
+                if url.path == "/":
+                    self.send_html(server.summary_page())
+                elif url.path == "/contacts" and query.get("type") in KINDS:
+                    self.send_html(server.contacts_page(query["type"]))
+                elif url.path == "/contact" and query.get("type") in KINDS and "name" in query:
+                    self.send_html(server.profile_page(query["type"], query["name"]))
+                elif url.path.startswith("/report/img/"):
+                    self.send_png(server.report.image(url.path[len("/report/"):]))
+                elif url.path.startswith("/img/"):
+                    self.send_png(server.image(url.path[len("/img/"):]))
+                else:
+                    self.send_error(404)
+            except KeyError:
+                self.send_error(404)
+            except Exception as e:
+                # 按需生成页面时出错（字体缺失、报告容器损坏等）：记下来并回 500，而不是让连接无响应地断开
+                print(f"❌ {url.path} 生成失败: {type(e).__name__}: {e}")
+                self.send_error(500)
+
+        def send_html(self, page):
+            if page is None: return self.send_error(404)
+            self.send_body(page.encode("utf-8"), "text/html; charset=utf-8", "no-cache")
+
+        def send_png(self, raw):
+            if not raw: return self.send_error(404)
+            # 图片按内容哈希命名，内容永远不变
+            self.send_body(raw, "image/png", "max-age=31536000, immutable")
+
+        def send_body(self, body, content_type, cache_control):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", cache_control)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="在本机启动报告服务，按需浏览所有联系人的画像")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--year", type=int, help=f"报告年份（默认 {step1.CONFIG['TARGET_YEAR']}）")
+    parser.add_argument("--page-cache", type=parse_size, default=PAGE_CACHE_MB, metavar="SIZE",
+                        help=f"页面缓存上限（默认 {PAGE_CACHE_MB}M）")
+    parser.add_argument("--image-cache", type=parse_size, default=IMAGE_CACHE_MB, metavar="SIZE",
+                        help=f"图片缓存上限（默认 {IMAGE_CACHE_MB}M）")
+    parser.add_argument("--no-open", action="store_true", help="启动后不自动打开浏览器")
+    args = parser.parse_args(argv)
+
+    if args.year: step1.CONFIG["TARGET_YEAR"] = args.year
+    # 先把流水线跑到最新（已缓存的阶段直接跳过），拿到消息表、分词结果和总览数据包
+    pipe = step1.make_pipeline()
+    pipe.run()
+    step1.warm_up()
+
+    report = open_report(step1.CONFIG["REPORT_PATH"])
+    server = ReportServer(pipe, report, args.page_cache, args.image_cache)
+    httpd = ThreadingHTTPServer((HOST, args.port), make_handler(server))
+    url = f"http://{HOST}:{httpd.server_address[1]}/"
+    print(f"🌐 报告服务已启动：{url}（好友 {len(server.contacts['private'])} 个，"
+          f"群聊 {len(server.contacts['group'])} 个；Ctrl+C 退出）")
+    if not args.no_open: webbrowser.open(url)
+
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        report.close()
+        print("\n" + server.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import base64
+import hashlib
+import json
+import os
+import zipfile
+
+# ===================== 中间数据容器 =====================
+# step1 → step2 的交接文件：一个 zip 包
+#   manifest.json   —— 指标、序列、画像列表（图片只存引用，如 "img/3fa2....png"）
+#   img/*.png       —— 原始 PNG 字节，不做 base64，不再压缩（PNG 本身已压缩）
+#   data/*.json     —— 体积较大、只需原样嵌入页面的数据（如关键词索引），manifest 里只存引用
+# 写入端边画边落盘，读取端先读 manifest，图片按需随机读取。
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+# 固定条目时间戳，同样的内容写出同样的字节，方便流水线判断产物是否变化
+ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+
+
+def _entry(name, compress_type):
+    info = zipfile.ZipInfo(name, date_time=ZIP_DATE)
+    info.compress_type = compress_type
+    return info
+
+
+class ReportWriter:
+    def __init__(self, path):
+        self.path = path
+        self._tmp = path + ".tmp"
+        self._zf = zipfile.ZipFile(self._tmp, "w")
+        self._names = set()
+
+    def add_image(self, png):
+        """写入一张图片并返回引用；相同内容只存一份；空图表返回 None"""
+        if not png: return None
+        name = "img/" + hashlib.sha256(png).hexdigest()[:20] + ".png"
+        if name not in self._names:
+            self._zf.writestr(_entry(name, zipfile.ZIP_STORED), png)
+            self._names.add(name)
+        return name
+
+    def add_json(self, name, obj):
+        """写入一份 JSON 数据并返回引用"""
+        ref = f"data/{name}.json"
+        self._zf.writestr(_entry(ref, zipfile.ZIP_DEFLATED), json.dumps(obj, ensure_ascii=False, separators=(",", ":")))
+        self._names.add(ref)
+        return ref
+
+    def close(self, manifest):
+        """写入 manifest 并原子替换目标文件"""
+        manifest = dict(manifest, format_version=FORMAT_VERSION)
+        self._zf.writestr(_entry(MANIFEST_NAME, zipfile.ZIP_DEFLATED),
+                          json.dumps(manifest, ensure_ascii=False))
+        self._zf.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        self._zf.close()
+        os.remove(self._tmp)
+
+
+class ReportReader:
+    def __init__(self, path):
+        self.path = path
+        self._zf = zipfile.ZipFile(path, "r")
+        self.manifest = json.loads(self._zf.read(MANIFEST_NAME).decode("utf-8"))
+
+    def image(self, ref):
+        """按引用读取原始 PNG 字节"""
+        if not ref: return None
+        return self._zf.read(ref)
+
+    def text(self, ref):
+        """按引用读取 data/ 下的 JSON 原文"""
+        if not ref: return None
+        return self._zf.read(ref).decode("utf-8")
+
+    def close(self):
+        self._zf.close()
+
+
+class InlineReport:
+    """内存中的旧版数据包：图片字段本身就是 base64 字符串"""
+
+    def __init__(self, manifest):
+        self.manifest = manifest
+
+    def image(self, ref):
+        if not ref: return None
+        return base64.b64decode(ref)
+
+    def text(self, ref):
+        return None
+
+    def close(self):
+        pass
+
+
+class LegacyJsonReader(InlineReport):
+    """兼容旧版 report_data.json"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "r", encoding="utf-8") as f:
+            super().__init__(json.load(f))
+
+
+def open_report(path, legacy_path="report_data.json"):
+    """优先读取容器格式，找不到时回退到旧版 JSON"""
+    if os.path.exists(path):
+        return ReportReader(path)
+    if legacy_path and os.path.exists(legacy_path):
+        return LegacyJsonReader(legacy_path)
+    raise FileNotFoundError(path)
@@ -0,0 +1,58 @@
+import multiprocessing
+import os
+import shutil
+import sys
+
+from lazy_import import lazy
+
+pd = lazy("pandas")
+
+# ===================== 按聊天分片的 map-reduce =====================
+# 超大导出（几千万行、跨多年）时，读入与分词都只能用一个核。分片模式：
+#   partition —— 流式读一遍 messages.csv，按聊天（清洗后的 NickName，与之后所有分组用的键一致）哈希分到 N 个分片文件，
+#                并记下每行在原文件里的行号；同一个聊天的所有消息必然落在同一个分片里；
+#   map       —— fork 出的进程池并行处理各分片：解析时间、分类（规则只看本聊天的数据）、发言人汇总、非文本 / 表情计数，
+#                以及分词和逐年快照的部分结果（计数立方体、词频草图）；
+#   reduce    —— 小表与快照的部分结果直接合并（草图用 SpaceSaving.merge），消息表与分词按原行号拼回，
+#                与单进程的结果逐行一致，之后的阶段无需区分。
+# 只有 ingest 命中缓存、需要单独重新分词时，才把文本按段分给进程池。没有 fork 的平台（Windows / macOS）退回单进程。
+
+ROW_COLUMN = "__row"
+
+
+def can_fork():
+    return "fork" in multiprocessing.get_all_start_methods() and sys.platform != "darwin"
+
+
+def shard_ids(names, n):
+    """聊天名 → 分片编号（固定哈希，跨进程、跨运行稳定）"""
+    key = names.fillna("Unknown").str.strip().to_numpy(dtype=object)
+    return pd.util.hash_array(key) % n
+
+
+def partition_csv(path, out_dir, n, chunk_rows, encoding):
+    """流式切分 CSV，返回非空分片文件路径列表；分片统一以 UTF-8 写出"""
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    paths = [os.path.join(out_dir, f"shard_{i:03d}.csv") for i in range(n)]
+    written = set()
+    for chunk in pd.read_csv(path, encoding=encoding, on_bad_lines="skip", dtype=str, chunksize=chunk_rows):
+        chunk.insert(0, ROW_COLUMN, chunk.index)
+        for i, part in chunk.groupby(shard_ids(chunk["NickName"], n), sort=False):
+            part.to_csv(paths[i], mode="a", header=i not in written, index=False, encoding="utf-8")
+            written.add(i)
+    return [paths[i] for i in sorted(written)]
+
+
+def map_parallel(fn, items, workers):
+    """按顺序返回 fn(item) 的结果；workers > 1 且能 fork 时用进程池"""
+    if workers <= 1 or len(items) <= 1 or not can_fork():
+        return [fn(item) for item in items]
+    with multiprocessing.get_context("fork").Pool(min(workers, len(items))) as pool:
+        return pool.map(fn, items, chunksize=1)
+
+
+def split_ranges(total, parts):
+    """把 [0, total) 切成至多 parts 段连续区间"""
+    step = max(1, -(-total // max(1, parts)))
+    return [(start, min(start + step, total)) for start in range(0, total, step)]
@@ -1,16 +1,38 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import jieba
 import re
-from wordcloud import WordCloud
+from itertools import chain
 from io import BytesIO
-import base64
 import platform
 import warnings
-import json
-import matplotlib.colors as mcolors
-import numpy as np
+import os
+import pickle
+import shutil
+import sys
+from lazy_import import lazy, timed_import, import_summary
+from chart_cache import ChartCache
+from report_store import ReportWriter
+from pipeline import Pipeline, Stage
+import jieba_cache
+from instrument import TRACER
+from memory_budget import MemoryBudget, parse_size
+from token_spill import SpilledTokenCounts, KEY_COLUMNS as SPILL_KEYS
+from conversation import conversation_stats, contact_summary
+from heavy_hitters import SpaceSaving
+from keyword_index import build_keyword_index
+import media_stats
+from audio_text import VoiceTranscripts, DB_NAME as VOICE_DB_NAME
+import preview
+import shards
+import engines
+
+# 重型依赖按需导入：只跑部分阶段（或全部命中缓存）时不付这些导入成本
+pd = lazy("pandas")
+plt = lazy("matplotlib.pyplot")
+sns = lazy("seaborn")
+matplotlib = lazy("matplotlib")
+mcolors = lazy("matplotlib.colors")
+pseg = lazy("jieba.posseg")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
 
 warnings.filterwarnings("ignore")
 
@@ -18,14 +40,45 @@ warnings.filterwarnings("ignore")
 CONFIG = {
     "TARGET_YEAR": 2025,
     "CSV_PATH": "messages.csv",
+    "REPORT_PATH": "report_data.zip",
     "BG_COLOR": "#1a1a1a",
     "TEXT_COLOR": "#ffffff",
     "AXIS_COLOR": "#888888",
     "MAIN_COLOR": "#00aba5",     # 我 (青色)
     "ACCENT_COLOR": "#ff0050",   # 对方 (洋红)
     "HEATMAP_GRADIENT": ["#111111", "#0d330d", "#00ff41"], 
+    "CACHE_DIR": ".cache",
+    "CHART_CACHE_MB": 256,
+    "CSV_CHUNK_ROWS": 1_000_000,
+    "KEYWORD_SKETCH_SIZE": 5000, # 词频草图最多记多少个候选词（词云只用 Top 50，快照用 Top 200）
+    "KEYWORD_INDEX_MIN": 10,     # 全年出现至少这么多次的关键词才收进报告里的搜索索引
+    "SESSION_GAP_MIN": 60,       # 同一聊天里超过这么多分钟没有消息，就算新的一段会话
+    "PROFILE_RETRIES": 1,        # 画像失败后单独重试的次数；仍失败的跳过，下次运行再补
+    "USER_DICT": os.path.join(HERE, "MemoTrace", "app", "data", "new_words.txt"),
+    # MemoTrace 的语音转写库（文件不存在就跳过）；CSV 里用 AUDIO_ID_COLUMN 列与库里的 msgSvrId 关联
+    "AUDIO_TEXT_DB": os.path.join(HERE, "MemoTrace", "app", "data", VOICE_DB_NAME),
+    "AUDIO_ID_COLUMN": "MsgSvrID",
 }
 
+# 修改任何绘图代码后请 +1，让旧的图表缓存失效
+CHART_RENDERER_VERSION = 2
+CHART_CACHE = ChartCache(
+    os.path.join(CONFIG["CACHE_DIR"], "charts"),
+    CONFIG["CHART_CACHE_MB"] * 1024 * 1024,
+)
+
+# --memory-budget 时设置（见 set_memory_budget），None 表示不限制
+MEMORY_BUDGET = None
+PREVIEW = None  # 预览模式的抽样比例（enable_preview 设置）
+SHARDS = None   # 分片模式：(分片数, 并行进程数)（enable_shards 设置）
+SHARD_PARTIALS = {}  # 分片模式下 ingest 顺带算好的分词与逐年快照部分结果（load_data_sharded 填入）
+ENGINE = engines.PandasEngine()  # 读入与大表分组的计算后端（set_engine 切换）
+PIPELINE_DIR = os.path.join(CONFIG["CACHE_DIR"], "pipeline")
+TOKEN_DB = os.path.join(CONFIG["CACHE_DIR"], "tokens", "token_counts.sqlite")
+MEMBERS_PATH = os.path.join(CONFIG["CACHE_DIR"], "members", "members.pkl")
+MEDIA_PATH = os.path.join(CONFIG["CACHE_DIR"], "media", "media.pkl")
+SHARD_DIR = os.path.join(CONFIG["CACHE_DIR"], "shards")
+
 # ===================== 基础函数 =====================
 def set_style():
     plt.style.use('dark_background')
@@ -43,20 +96,27 @@ def clean_text(text):
     if not isinstance(text, str): return str(text)
     return re.sub(r'[\U00010000-\U0010ffff]', '', text).strip()
 
-def fig_to_base64(fig):
+def fig_to_png(fig):
     buf = BytesIO()
     fig.savefig(buf, format="png", dpi=120, bbox_inches="tight", facecolor=CONFIG["BG_COLOR"])
-    buf.seek(0)
-    img = base64.b64encode(buf.read()).decode()
     plt.close(fig)
-    return img
+    return buf.getvalue()
+
+def cached_chart(kind, payload, render, style_keys=()):
+    """payload 是该图表的全部输入聚合数据；键不变则直接复用磁盘上的 PNG，不再重绘"""
+    style = {k: CONFIG[k] for k in ("BG_COLOR", "TEXT_COLOR", *style_keys)}
+    style["platform"] = platform.system()  # 字体随系统变化
+    key = CHART_CACHE.key(kind, payload, style, (CHART_RENDERER_VERSION, matplotlib.__version__))
+    hits, misses = CHART_CACHE.hits, CHART_CACHE.misses
+    png = CHART_CACHE.fetch(key, render)
+    TRACER.count(cache_hits=CHART_CACHE.hits - hits, cache_misses=CHART_CACHE.misses - misses)
+    return png
 
 # ===================== 核心：绘图函数 =====================
 
+@TRACER.traced()
 def draw_donut_pair(df):
     """画两个并排的环形图：左边消息数，右边字数"""
-    set_style()
-    
     # 数据准备
     me = df[df["IsSender"]==1]
     other = df[df["IsSender"]==0]
@@ -68,7 +128,13 @@ def draw_donut_pair(df):
     
     if m_count + o_count == 0: m_count = 1
     if m_chars + o_chars == 0: m_chars = 1
-    
+
+    payload = [int(m_count), int(o_count), int(m_chars), int(o_chars)]
+    return cached_chart("donut_pair", payload, lambda: render_donut_pair(*payload),
+                        ("AXIS_COLOR", "MAIN_COLOR", "ACCENT_COLOR"))
+
+def render_donut_pair(m_count, o_count, m_chars, o_chars):
+    set_style()
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(10, 4))
     
     colors = [CONFIG["MAIN_COLOR"], CONFIG["ACCENT_COLOR"]] 
@@ -95,12 +161,18 @@ def draw_donut_pair(df):
     plot_donut(ax1, [m_count, o_count], m_count+o_count, "消息条数")
     plot_donut(ax2, [m_chars, o_chars], m_chars+o_chars, "总字符数")
     
-    return fig_to_base64(fig)
+    return fig_to_png(fig)
 
 
+@TRACER.traced()
 def draw_heatmap(df, label="活跃度"):
-    set_style()
     dates = df.groupby("Date").size()
+    payload = [dates, label, CONFIG["TARGET_YEAR"]]
+    return cached_chart("heatmap", payload, lambda: render_heatmap(dates, label),
+                        ("AXIS_COLOR", "HEATMAP_GRADIENT"))
+
+def render_heatmap(dates, label):
+    set_style()
     full_range = pd.date_range(f"{CONFIG['TARGET_YEAR']}-01-01", f"{CONFIG['TARGET_YEAR']}-12-31")
     
     chart_data = pd.DataFrame({"Timestamp": full_range})
@@ -150,11 +222,15 @@ def draw_heatmap(df, label="活跃度"):
     ax.set_ylabel("")
     ax.set_title(label, loc='right', fontsize=10, color=CONFIG["AXIS_COLOR"], pad=10)
     
-    return fig_to_base64(fig)
+    return fig_to_png(fig)
 
+@TRACER.traced()
 def draw_hourly_curve(df):
-    set_style()
     hourly = df.groupby("Hour").size().reindex(range(24), fill_value=0)
+    return cached_chart("hourly", hourly, lambda: render_hourly_curve(hourly), ("MAIN_COLOR",))
+
+def render_hourly_curve(hourly):
+    set_style()
     fig, ax = plt.subplots(figsize=(10, 2.5))
     ax.plot(hourly.index, hourly.values, color=CONFIG["MAIN_COLOR"], linewidth=2)
     ax.fill_between(hourly.index, hourly.values, color=CONFIG["MAIN_COLOR"], alpha=0.2)
@@ -165,51 +241,79 @@ def draw_hourly_curve(df):
     ax.spines['left'].set_visible(False)
     ax.set_yticks([])
     ax.set_title("24小时活跃分布", loc='right', fontsize=10, color="#666") # 汉化
-    return fig_to_base64(fig)
+    return fig_to_png(fig)
 
-import jieba.posseg as pseg
+@TRACER.traced()
+def draw_wordcloud(freqs, title="年度关键词"):
+    """freqs 为 {关键词: 次数}；只有 Top-K 会上图，所以只拿 Top-K 做缓存键"""
+    engine = get_wordcloud_engine()
+    TRACER.count(tokens=sum(freqs.values()))
+    top = engine.top_k(freqs)
+    if not top:
+        return None
+    return cached_chart("wordcloud", [top, title], lambda: engine.render(dict(top), title))
 
-def draw_wordcloud(df):
-    text = " ".join(df["StrContent"].astype(str).tolist())
+_wc_engine = None
 
-    # 1️⃣ 基础清洗
-    text = re.sub(r"[A-Za-z0-9\[\]]", "", text)
-    text = re.sub(r"\s+", "", text)
+def get_wordcloud_engine():
+    global _wc_engine
+    if _wc_engine is None:
+        font_path = "msyh.ttc"
+        if platform.system() == "Darwin":
+            font_path = "/System/Library/Fonts/PingFang.ttc"
+        engine_module = timed_import("wordcloud_engine")
+        _wc_engine = engine_module.WordCloudEngine(
+            font_path=font_path,
+            width=900,
+            height=350,
+            background_color=CONFIG["BG_COLOR"],
+            colormap="summer",
+            max_words=50,
+            cache_dir=os.path.join(CONFIG["CACHE_DIR"], "wordcloud_layouts"),
+        )
+    return _wc_engine
 
-    # 2️⃣ 硬停用词（你原来的，保留）
-    stopwords = set([
-        # —— 指代 / 功能词 —— #
-        "这个","那个","这种","那种","这样","那样",
-        "我们","你们","他们","大家","别人","个人",
+# ===================== 分词 =====================
+# 硬停用词（你原来的，保留）
+KEYWORD_STOPWORDS = set([
+    # —— 指代 / 功能词 —— #
+    "这个","那个","这种","那种","这样","那样",
+    "我们","你们","他们","大家","别人","个人",
 
-        # —— 逻辑 / 连词 —— #
-        "但是","不过","虽然","因为","所以","而且","或者","并且",
-        "确实","可能","应该","反正","毕竟",
+    # —— 逻辑 / 连词 —— #
+    "但是","不过","虽然","因为","所以","而且","或者","并且",
+    "确实","可能","应该","反正","毕竟",
 
-        # —— 口语 / 语气 —— #
-        "哈哈","哈哈哈","真的","感觉","觉得","好像","没事","哈哈哈哈",
-        "就是","就是说","比较","的话",
+    # —— 口语 / 语气 —— #
+    "哈哈","哈哈哈","真的","感觉","觉得","好像","没事","哈哈哈哈",
+    "就是","就是说","比较","的话",
 
-        # —— 否定 & 泛动词 —— #
-        "没有","不是","不会","不能","不行","不用","不要","还有","有点",
-        "知道","看看","开始","出来","直接","喜欢","一下","一个","一般",
+    # —— 否定 & 泛动词 —— #
+    "没有","不是","不会","不能","不行","不用","不要","还有","有点",
+    "知道","看看","开始","出来","直接","喜欢","一下","一个","一般",
 
-        # —— 时间 / 范围 —— #
-        "现在","今天","昨天","明天","之前","以后","已经","正在",
-        "一些","一点","很多","几个","每次","部分",
+    # —— 时间 / 范围 —— #
+    "现在","今天","昨天","明天","之前","以后","已经","正在",
+    "一些","一点","很多","几个","每次","部分",
 
-        # —— 泛名词 —— #
-        "事情","问题","情况","结果","过程","原因",
-        "方面","内容","东西",
+    # —— 泛名词 —— #
+    "事情","问题","情况","结果","过程","原因",
+    "方面","内容","东西",
 
-        # —— 媒体 —— #
-        "图片","视频"
-    ])
+    # —— 媒体 —— #
+    "图片","视频"
+])
 
-    # 3️⃣ 子串级 stop（兜底，非常关键）
-    soft_stop = [
-        "但是","确实","是不是","没有","直接","可能","应该","感觉","觉得"
-    ]
+# 子串级 stop（兜底，非常关键）
+KEYWORD_SOFT_STOP = [
+    "但是","确实","是不是","没有","直接","可能","应该","感觉","觉得"
+]
+
+def extract_keywords(text):
+    """分词并过滤停用词，返回关键词列表"""
+    # 1️⃣ 基础清洗
+    text = re.sub(r"[A-Za-z0-9\[\]]", "", text)
+    text = re.sub(r"\s+", "", text)
 
     words = []
     for w, flag in pseg.cut(text):
@@ -221,42 +325,122 @@ def draw_wordcloud(df):
         if flag.startswith(("u", "c", "d", "p", "r")):
             # u=助词 c=连词 d=副词 p=介词 r=代词
             continue
-        if w in stopwords:
+        if w in KEYWORD_STOPWORDS:
             continue
 
-        if any(s in w for s in soft_stop):
+        if any(s in w for s in KEYWORD_SOFT_STOP):
             continue
         if re.fullmatch(r"[这那什怎没不还已]*", w):
             continue
         words.append(w)
+    return words
 
-    if not words:
-        return None
+JIEBA_STATS = {}
+
+def warm_jieba():
+    """加载预构建的 jieba 词典（含 new_words.txt 自定义词），没有就构建一份"""
+    if JIEBA_STATS: return
+    hit, seconds = jieba_cache.warm_start(os.path.join(CONFIG["CACHE_DIR"], "jieba"), [CONFIG["USER_DICT"]])
+    JIEBA_STATS.update(hit=hit, seconds=seconds)
+
+# 监视模式下按消息文本记住分词结果：重新导出后只给新增 / 改动过的消息分词
+TOKEN_MEMO = None
+
+def enable_token_memo(df=None, tokens=None):
+    """开启分词记忆，可用已有的消息表与分词结果预先填充"""
+    global TOKEN_MEMO
+    TOKEN_MEMO = {}
+    if df is not None and isinstance(tokens, pd.Series):
+        TOKEN_MEMO.update(zip(df["StrContent"], tokens.loc[df.index]))
+
+def tokenize_with_memo(texts):
+    memo, words, fresh = TOKEN_MEMO, [], 0
+    for t in texts:
+        w = memo.get(t)
+        if w is None:
+            w = memo[t] = extract_keywords(t)
+            fresh += 1
+        words.append(w)
+    # 只记住当前这份数据里的文本，旧导出里已删除的消息随之淘汰
+    TOKEN_MEMO.clear()
+    TOKEN_MEMO.update(zip(texts, words))
+    TRACER.count(memo_hits=len(words) - fresh)
+    print(f"   复用已有分词 {len(words) - fresh:,} 条，新分词 {fresh:,} 条")
+    return words
+
+def tokenize_messages(df):
+    """每条消息只分词一次；全局、我的、每个画像的词云都从这里按行汇总"""
+    warm_jieba()
+    print(f"✂️ 分词中 ({len(df):,} 条消息) ...")
+    if MEMORY_BUDGET is not None: return tokenize_to_disk(df)
+    if TOKEN_MEMO is not None:
+        words = tokenize_with_memo(df["StrContent"].tolist())
+    elif SHARDS is not None:
+        words = tokenize_parallel(df["StrContent"].tolist(), SHARDS[1])
+    else:
+        words = [extract_keywords(t) for t in df["StrContent"]]
+    tokens = pd.Series(words, index=df.index, dtype=object)
+    TRACER.count(rows=len(df), tokens=int(tokens.str.len().sum()))
+    return tokens
+
+_texts_to_tokenize = None
+
+def _tokenize_range(bounds):
+    start, end = bounds
+    return [extract_keywords(t) for t in _texts_to_tokenize[start:end]]
+
+def tokenize_parallel(texts, workers):
+    """分片模式：文本切成若干段在进程池里分词；子进程 fork 时直接继承文本与已加载的词典，不必传输"""
+    global _texts_to_tokenize
+    _texts_to_tokenize = texts
+    try:
+        parts = shards.map_parallel(_tokenize_range, shards.split_ranges(len(texts), workers * 4), workers)
+    finally:
+        _texts_to_tokenize = None
+    return list(chain.from_iterable(parts))
 
-    font_path = "msyh.ttc"
-    if platform.system() == "Darwin":
-        font_path = "/System/Library/Fonts/PingFang.ttc"
+def tokenize_to_disk(df, chunk_rows=50_000):
+    """内存预算模式：分块分词，只按 (Year, ChatType, NickName, IsSender) 累加词频，攒够就写入 SQLite"""
+    counts = SpilledTokenCounts(TOKEN_DB, MEMORY_BUDGET.spill_entries())
+    for start in range(0, len(df), chunk_rows):
+        part = df.iloc[start:start + chunk_rows]
+        keys = part[list(SPILL_KEYS)].itertuples(index=False, name=None)
+        counts.add(keys, [extract_keywords(t) for t in part["StrContent"]])
+        if MEMORY_BUDGET.under_pressure():
+            counts.flush()
+            MEMORY_BUDGET.relieve("分词")
+    counts.flush()
+    TRACER.count(rows=len(df), tokens=counts.total_tokens)
+    print(f"   词频已落盘 {counts.spills} 次: {TOKEN_DB}")
+    return counts
 
-    wc = WordCloud(
-        font_path=font_path,
-        width=900,
-        height=350,
-        background_color=CONFIG["BG_COLOR"],
-        colormap="summer",
-        max_words=50,
-        collocations=False  # 🔥 防止“是不是 直接”这种连体词
-    ).generate(" ".join(words))
+SKETCH_CHUNK_ROWS = 50_000
 
-    fig, ax = plt.subplots(figsize=(10, 3.5))
-    ax.imshow(wc, interpolation="bilinear")
-    ax.axis("off")
-    ax.set_title("年度关键词", loc="right", fontsize=10, color="#666")
+def tokenized(sub_df, tokens):
+    """预览模式只对抽样的消息分词：取出 sub_df 里有分词结果的行"""
+    if PREVIEW is None or isinstance(tokens, SpilledTokenCounts): return sub_df
+    return sub_df[sub_df.index.isin(tokens.index)]
 
-    return fig_to_base64(fig)
+def keyword_sketch(tokens, sub_df):
+    """sub_df 的词频草图：只保留 KEYWORD_SKETCH_SIZE 个候选词，可与其他分片的草图合并"""
+    rows = tokens.loc[tokenized(sub_df, tokens).index].tolist()
+    sketch = SpaceSaving(CONFIG["KEYWORD_SKETCH_SIZE"])
+    for start in range(0, len(rows), SKETCH_CHUNK_ROWS):
+        sketch.update(chain.from_iterable(rows[start:start + SKETCH_CHUNK_ROWS]))
+    return sketch
 
+def keyword_counts(tokens, sub_df):
+    """sub_df 的高频词及次数：只保留 KEYWORD_SKETCH_SIZE 个候选词，不为整段语料建完整词表"""
+    if isinstance(tokens, SpilledTokenCounts): return tokens.counts(sub_df, limit=CONFIG["KEYWORD_SKETCH_SIZE"])
+    return keyword_sketch(tokens, sub_df).top()
+
+@TRACER.traced()
 def draw_rank_bar(df, title):
-    set_style()
     top = df.groupby("NickName").size().sort_values(ascending=False).head(10)
+    return cached_chart("rank_bar", [top, title], lambda: render_rank_bar(top, title), ("MAIN_COLOR",))
+
+def render_rank_bar(top, title):
+    set_style()
     names = [clean_text(n)[:12] for n in top.index]
     
     fig, ax = plt.subplots(figsize=(10, 6))
@@ -275,10 +459,65 @@ def draw_rank_bar(df, title):
                 f" {int(bar.get_width()):,}", va='center', fontsize=10, color="#888")
                 
     ax.set_title(title, loc='right', pad=10, color="white", fontsize=12)
-    return fig_to_base64(fig)
+    return fig_to_png(fig)
+
+# ===================== 发言人汇总 =====================
+# 读入时对整张表做一次 (年份, 聊天, 发言人, 是否我发) 的 groupby：
+# 分类规则（群里有几个人说话）、每个群的话痨榜、活跃人数、我的发言占比都从这张小表里取，
+# 群再多也不用再扫描消息表。
+
+def member_table(df):
+    """每个 (Year, NickName, Sender, IsSender) 的消息数"""
+    return ENGINE.group_sizes(df, ["Year", "NickName", "Sender", "IsSender"]).rename("msgs")
+
+# ingest 顺带算出的小表（发言人汇总、非文本消息与表情计数）作为该阶段的输出文件落盘
+def save_side_table(path, obj):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+_side_tables = {}
+
+def load_side_table(path):
+    """按文件修改时间缓存在内存里"""
+    mtime = os.path.getmtime(path)
+    cached = _side_tables.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, "rb") as f:
+            cached = _side_tables[path] = (mtime, pickle.load(f))
+    return cached[1]
+
+def load_members(year=None):
+    """读回 ingest 阶段保存的发言人汇总；给了 year 就只取这一年"""
+    members = load_side_table(MEMBERS_PATH)
+    if year is None: return members
+    if year not in members.index.get_level_values("Year"): return members.iloc[:0].droplevel("Year")
+    return members.xs(year, level="Year")
+
+def load_media(year):
+    """读回 ingest 阶段保存的某一年的 (非文本消息计数, 表情计数)"""
+    tables = load_side_table(MEDIA_PATH)
+    return media_stats.year_slice(tables["media"], year), media_stats.year_slice(tables["emoji"], year)
+
+def chat_members(members, name):
+    """某个群每位发言人的消息数（从发言人汇总里取，不扫描消息表）"""
+    if name not in members.index.get_level_values("NickName"):
+        return pd.Series(dtype="int64")
+    counts = members.xs(name, level="NickName").groupby(level="Sender").sum()
+    return counts[counts.index != ""]
+
+def member_stats(member_counts):
+    """群的活跃成员数与我的发言占比"""
+    total = int(member_counts.sum())
+    if not total: return None
+    mine = int(member_counts.get("Me", 0))
+    return {"active": int((member_counts > 0).sum()), "my_share_pct": round(mine / total * 100, 1)}
 
 # ===================== 严格分类逻辑 =====================
-def apply_strict_classification(df):
+def apply_strict_classification(df, members=None):
+    """members 为这部分消息的发言人汇总（不含 Year 层），不给就现算一份"""
     print("   🔍 执行严格分类 (ID + 人数 + 关键词)...")
     df["ChatType"] = "Private"
     
@@ -288,7 +527,9 @@ def apply_strict_classification(df):
         df.loc[df["StrTalker"].astype(str).str.contains("chatroom"), "ChatType"] = "Group"
     df.loc[df["NickName"].astype(str).str.contains(r"@chatroom", na=False), "ChatType"] = "Group"
 
-    senders_per_chat = df[df["IsSender"]==0].groupby("NickName")["Sender"].nunique()
+    if members is None: members = member_table(df).droplevel("Year")
+    others = members[members.index.get_level_values("IsSender") == 0]
+    senders_per_chat = others.groupby(level="NickName").size()
     group_names = senders_per_chat[senders_per_chat > 1].index
     df.loc[df["NickName"].isin(group_names), "ChatType"] = "Group"
     
@@ -298,20 +539,47 @@ def apply_strict_classification(df):
 
     return df
 
+def open_voice_transcripts():
+    path = CONFIG["AUDIO_TEXT_DB"]
+    if not path or not os.path.exists(path): return None
+    return VoiceTranscripts(path, CONFIG["AUDIO_ID_COLUMN"])
+
+def read_messages(path, chunk_rows, encoding):
+    """按当前引擎读入 CSV，返回 (消息表, 非文本计数, 表情计数)；语音转写在读入时一并关联"""
+    voice = open_voice_transcripts()
+    try:
+        result = ENGINE.read_messages(path, chunk_rows, encoding, voice, after_chunk=relieve_after_chunk)
+    finally:
+        if voice is not None: voice.close()
+    if voice is not None: print(f"   {voice.summary()}")
+    return result
+
+def relieve_after_chunk():
+    if MEMORY_BUDGET is not None and MEMORY_BUDGET.under_pressure():
+        MEMORY_BUDGET.relieve("读取 CSV")
+
 def load_data():
     print(f"🚀 [1/4] 读取数据: {CONFIG['CSV_PATH']} ...")
+    if SHARDS is not None: return load_data_sharded(*SHARDS)
+    chunk_rows = CONFIG["CSV_CHUNK_ROWS"]
+    if MEMORY_BUDGET is not None:
+        chunk_rows = MEMORY_BUDGET.csv_chunk_rows(CONFIG["CSV_PATH"], cap=chunk_rows)
+        print(f"   🧮 内存预算 {MEMORY_BUDGET.limit_mb:.0f}MB → 每块 {chunk_rows:,} 行")
     try:
-        df = pd.read_csv(CONFIG['CSV_PATH'], encoding="utf-8", on_bad_lines="skip", low_memory=False, dtype=str)
-    except:
-        df = pd.read_csv(CONFIG['CSV_PATH'], encoding="gbk", on_bad_lines="skip", low_memory=False, dtype=str)
-    
-    if "Type" in df.columns: df = df[df["Type"] == "1"].copy()
-    
-    df["dt"] = pd.to_datetime(df["StrTime"], errors="coerce")
-    df = df.dropna(subset=["dt"])
-    df = df[df["dt"].dt.year == CONFIG["TARGET_YEAR"]]
-    
+        df, media, emoji = read_messages(CONFIG['CSV_PATH'], chunk_rows, "utf-8")
+    except UnicodeDecodeError:
+        df, media, emoji = read_messages(CONFIG['CSV_PATH'], chunk_rows, "gbk")
+    save_side_table(MEDIA_PATH, {"media": media, "emoji": emoji})
+
+    df, members = prepare_messages(df)
+    save_side_table(MEMBERS_PATH, members)
+    print_classification(df)
+    return df
+
+def prepare_messages(df):
+    """清洗列并分类，返回 (df, 发言人汇总)"""
     df["IsSender"] = pd.to_numeric(df["IsSender"], errors='coerce').fillna(0).astype(int)
+    df["Year"] = df["dt"].dt.year
     df["Date"] = df["dt"].dt.date
     df["Hour"] = df["dt"].dt.hour
     df["StrContent"] = df["StrContent"].fillna("")
@@ -323,15 +591,86 @@ def load_data():
         df["Sender"] = df["Sender"].fillna("Unknown")
         df.loc[df["IsSender"] == 1, "Sender"] = "Me"
 
-    df = apply_strict_classification(df)
+    # 一次读入所有年份；分类规则（群里的发言人数等）按年分别统计，与只分析单一年份时一致
+    members = member_table(df)
+    if df.empty:
+        df = apply_strict_classification(df, members.droplevel("Year"))
+    else:
+        df = pd.concat(apply_strict_classification(g.copy(), members.xs(year, level="Year"))
+                       for year, g in df.groupby("Year")).sort_index()
+    return df, members
+
+def print_classification(df):
+    for year, g in df.groupby("Year"):
+        print(f"✅ {year} 年分类结果: 单聊 {len(g[g['ChatType']=='Private'])} | 群聊 {len(g[g['ChatType']=='Group'])}")
 
-    print(f"✅ 分类结果: 单聊 {len(df[df['ChatType']=='Private'])} | 群聊 {len(df[df['ChatType']=='Group'])}")
+# === 分片模式（见 shards.py） ===
+def ingest_shard(path):
+    """map：一个分片的读入、分类、小表、分词与逐年快照的部分结果；索引还原为原 CSV 的行号。
+    分词与快照都在子进程里按分片完成，父进程只合并，不再把文本分发出去第二次"""
+    df, media, emoji = read_messages(path, CONFIG["CSV_CHUNK_ROWS"], "utf-8")
+    df.index = pd.Index(df.pop(shards.ROW_COLUMN).astype("int64").to_numpy())
+    df, members = prepare_messages(df)
+    # 预览的分层键含聊天，分片内抽样与整表抽样选中的是同一批消息
+    words = preview.stratified_sample(df, PREVIEW) if PREVIEW is not None else df
+    tokens = pd.Series([extract_keywords(t) for t in words["StrContent"]], index=words.index, dtype=object)
+    return df, members, media, emoji, tokens, year_partials(df, tokens)
+
+def load_data_sharded(n, workers):
+    chunk_rows = CONFIG["CSV_CHUNK_ROWS"]
+    with TRACER.span("partition", cat="shard"):
+        try:
+            paths = shards.partition_csv(CONFIG["CSV_PATH"], SHARD_DIR, n, chunk_rows, "utf-8")
+        except UnicodeDecodeError:
+            paths = shards.partition_csv(CONFIG["CSV_PATH"], SHARD_DIR, n, chunk_rows, "gbk")
+    print(f"   🧩 按聊天切分为 {len(paths)} 个分片，{min(workers, len(paths))} 个进程并行处理")
+    warm_jieba()  # 子进程 fork 时直接继承已加载的词典
+    try:
+        with TRACER.span("map", cat="shard", shards=len(paths)):
+            parts = shards.map_parallel(ingest_shard, paths, workers)
+    finally:
+        shutil.rmtree(SHARD_DIR, ignore_errors=True)
+
+    # reduce：各分片的聊天互不重叠，小表、快照的部分结果直接合并；消息表与分词按原行号拼回
+    with TRACER.span("reduce", cat="shard"):
+        frames, member_parts, media_parts, emoji_parts, token_parts, year_parts = map(list, zip(*parts))
+        del parts
+        members = pd.concat(member_parts).groupby(level=["Year", "NickName", "Sender", "IsSender"]).sum()
+        media = media_stats.combine(media_parts, "Kind")
+        emoji = media_stats.combine(emoji_parts, "Emoji")
+        df = pd.concat(frames)
+        frames.clear()  # 分片的消息表拼好即释放，排序时内存里只有拼接结果和排好的那一份
+        df = df.sort_index()
+        tokens = pd.concat(token_parts).sort_index()
+        token_parts.clear()
+    # 交给紧随其后的 tokenize / years 阶段；它们命中缓存时这些结果直接丢弃
+    SHARD_PARTIALS.update(tokens=tokens, years=year_parts)
+    save_side_table(MEDIA_PATH, {"media": media, "emoji": emoji})
+    save_side_table(MEMBERS_PATH, members)
+    print_classification(df)
+    return df
+
+def year_frame(df, year=None):
+    """取出某一年（默认 TARGET_YEAR）的消息"""
+    return df[df["Year"] == (year or CONFIG["TARGET_YEAR"])]
+
+def target_year_frame(pipe):
+    df = year_frame(pipe.get("ingest"))
+    if df.empty:
+        years = ", ".join(str(y) for y in sorted(pipe.get("ingest")["Year"].unique()))
+        print(f"❌ {CONFIG['TARGET_YEAR']} 年没有聊天记录（数据包含的年份：{years}）")
+        sys.exit(1)
     return df
 
 # === 趋势图 ===
+@TRACER.traced()
 def draw_line_chart(df, title):
-    set_style()
     daily_counts = df.groupby("Date").size()
+    payload = [daily_counts, title, CONFIG["TARGET_YEAR"]]
+    return cached_chart("line", payload, lambda: render_line_chart(daily_counts, title), ("MAIN_COLOR",))
+
+def render_line_chart(daily_counts, title):
+    set_style()
     idx = pd.date_range(f"{CONFIG['TARGET_YEAR']}-01-01", f"{CONFIG['TARGET_YEAR']}-12-31")
     daily_counts = daily_counts.reindex(idx, fill_value=0)
     
@@ -340,14 +679,19 @@ def draw_line_chart(df, title):
     ax.fill_between(daily_counts.index, daily_counts.values, color=CONFIG["MAIN_COLOR"], alpha=0.1)
     ax.axis('off')
     ax.set_title(title, loc='left', fontsize=12, color="white", pad=10)
-    return fig_to_base64(fig)
+    return fig_to_png(fig)
 
 # === 群成员条形图 ===
-def draw_member_bar(sub_df):
-    set_style()
-    member_counts = sub_df[sub_df["Sender"] != ""].groupby("Sender").size().sort_values(ascending=False).head(10)
+@TRACER.traced()
+def draw_member_bar(member_counts):
+    """member_counts 为 chat_members() 得到的 {发言人: 消息数}"""
+    member_counts = member_counts.sort_values(ascending=False).head(10)
     if member_counts.empty: return None
-    
+    return cached_chart("member_bar", member_counts, lambda: render_member_bar(member_counts),
+                        ("MAIN_COLOR", "ACCENT_COLOR"))
+
+def render_member_bar(member_counts):
+    set_style()
     names = [clean_text(n)[:10] for n in member_counts.index]
     
     colors = []
@@ -371,38 +715,128 @@ def draw_member_bar(sub_df):
                 f"{int(bar.get_width())}", va='center', fontsize=9, color="#ccc")
                 
     ax.set_title("活跃成员 Top 10", loc='right', fontsize=10, color="#666") # 汉化
-    return fig_to_base64(fig)
+    return fig_to_png(fig)
 
 # === 分析循环 ===
-def analyze_subset(subset_df, limit=10, is_group=False):
+def profile_chart(store, key, draw, errors):
+    """画像里的一张图：画失败只跳过这一张（报告里该处留空），错误记进 errors，画像的其他部分照常生成"""
+    try:
+        return store.add_image(draw())
+    except Exception as e:
+        print(f"    ⚠️ {key} 绘制失败，已跳过: {type(e).__name__}: {e}")
+        errors.append(f"{key}: {type(e).__name__}: {e}")
+        return None
+
+def build_profile(rank, name, sub, store, tokens, is_group=False, conversation=None, members=None, media=None,
+                  errors=None):
+    """一个联系人 / 群聊的画像：图片画完即写入 store（只需有 add_image），返回引用；
+    members 为当年的发言人汇总，群聊的话痨榜与成员统计从这里取；media 为当年的非文本 / 表情计数；
+    单张图失败时该图为 None，错误追加到 errors"""
+    errors = [] if errors is None else errors
+    chart = lambda key, draw: profile_chart(store, key, draw, errors)
+    member_bar = group = None
+    if is_group and members is not None:
+        member_counts = chat_members(members, name)
+        member_bar = chart("member_bar", lambda: draw_member_bar(member_counts))
+        group = member_stats(member_counts)
+
+    # 图片画完即写入容器，内存里只保留引用
+    return {
+        "rank": rank,
+        "name": clean_text(name),
+        "count": len(sub),
+        "compare": chart("compare", lambda: draw_donut_pair(sub)),
+        "heatmap": chart("heatmap", lambda: draw_heatmap(sub, "活跃热力图")),
+        "hourly": chart("hourly", lambda: draw_hourly_curve(sub)),
+        "wordcloud": chart("wordcloud", lambda: draw_wordcloud(keyword_counts(tokens, sub))),
+        "member_bar": member_bar,
+        "members": group,
+        "conversation": conversation,
+        "media": media_stats.summarize(*media, name=name) if media is not None else None,
+    }
+
+def profile_conversation(conversations, is_group, name):
+    """从 compute_aggregates 的会话表里取出某个聊天的指标"""
+    key = ("Group" if is_group else "Private", name)
+    if conversations is None or key not in conversations.index: return None
+    return contact_summary(conversations.loc[key])
+
+def analyze_subset(subset_df, store, tokens, limit=10, is_group=False, conversations=None, members=None,
+                   media=None, checkpoints=None, failures=None):
+    """逐个生成画像；每个画像单独存档、失败单独重试，仍失败的记进 failures 并跳过，不影响其他画像；
+    画像里单张图失败只空出那一张（同样记进 failures）"""
     top_names = subset_df.groupby("NickName").size().sort_values(ascending=False).head(limit).index
-    results = []
+    results = {}
     
-    for rank, name in enumerate(top_names, 1):
-        sub = subset_df[subset_df["NickName"] == name]
-        print(f"    处理中 #{rank}: {name}") # 汉化
-        
-        member_bar = None
-        if is_group:
-            member_bar = draw_member_bar(sub)
-
-        item = {
-            "rank": rank,
-            "name": clean_text(name),
-            "count": len(sub),
-            "compare": draw_donut_pair(sub),
-            "heatmap": draw_heatmap(sub, "活跃热力图"),
-            "hourly": draw_hourly_curve(sub),
-            "wordcloud": draw_wordcloud(sub),
-            "member_bar": member_bar
-        }
-        results.append(item)
-    return results
+    kind = "group" if is_group else "private"
+    
+    pending, failed = list(enumerate(top_names, 1)), []
+    for attempt in range(CONFIG["PROFILE_RETRIES"] + 1):
+        failed = []
+        for rank, name in pending:
+            sub = subset_df[subset_df["NickName"] == name]
+            print(f"    处理中 #{rank}: {name}" + (f"（重试第 {attempt} 次）" if attempt else "")) # 汉化
 
-if __name__ == "__main__":
-    df = load_data()
-    if df.empty: exit()
+            conversation = profile_conversation(conversations, is_group, name)
+            errors = []
+            build = lambda s: build_profile(rank, name, sub, s, tokens, is_group, conversation, members, media, errors)
+            try:
+                with TRACER.span(f"{kind}#{rank}", cat="profile", contact=clean_text(name), rows=len(sub)):
+                    results[rank] = checkpointed(checkpoints, f"{kind}#{rank}:{name}", store, build, errors)
+            except Exception as e:
+                print(f"    ❌ #{rank} {name} 失败: {type(e).__name__}: {e}")
+                failed.append((rank, name, e))
+                continue
+            # 个别图表被跳过的画像照常收录，图表失败也记一笔（阶段标为未完成，下次重画）
+            if failures is not None:
+                failures.extend({"kind": kind, "rank": rank, "name": clean_text(name), "error": error}
+                                for error in errors)
+        pending = [(rank, name) for rank, name, _ in failed]
+        if not pending: break
+
+    if failures is not None:
+        failures.extend({"kind": kind, "rank": rank, "name": clean_text(name), "error": f"{type(e).__name__}: {e}"}
+                        for rank, name, e in failed)
+    return [results[rank] for rank in sorted(results)]
+
+# === 存档 ===
+# render-charts 是最耗时的阶段：每张全局图表、每个画像、关键词索引各自是一个存档单元，
+# 完成一个存一个（连同写进报告容器的图片）。中途崩溃或有画像失败时，下次运行（输入与代码没变）
+# 直接回放已完成的单元，只补做剩下的。
+
+class RecordingStore:
+    """包一层 ReportWriter：照常写入，同时记下写了什么，便于存档后原样回放"""
+
+    def __init__(self, store):
+        self.store = store
+        self.calls = []
 
+    def add_image(self, png):
+        self.calls.append(("add_image", (png,)))
+        return self.store.add_image(png)
+
+    def add_json(self, name, obj):
+        self.calls.append(("add_json", (name, obj)))
+        return self.store.add_json(name, obj)
+
+def checkpointed(checkpoints, name, store, build, errors=None):
+    """build(store) 的结果连同它写进 store 的内容一起存档；同一指纹下重跑时直接回放。
+    build 往 errors 里记了错误（有图表被跳过）的单元不存档，下次运行重新生成"""
+    if checkpoints is None: return build(store)
+    saved = checkpoints.get(name)
+    if saved is not None:
+        result, calls = saved
+        for method, args in calls: getattr(store, method)(*args)
+        return result
+    recorder = RecordingStore(store)
+    result = build(recorder)
+    if not errors: checkpoints.put(name, (result, recorder.calls))
+    return result
+
+# ===================== 全局统计 =====================
+def compute_aggregates(df, members=None, media=None):
+    """members 为当年的发言人汇总（load_members(year)），不给就从 df 现算；
+    media 为当年的 (非文本消息计数, 表情计数)（load_media(year)），不给就不统计"""
     print("🚀 [2/4] 计算全局统计...")
 
     start_date = df["dt"].min().date()
@@ -412,7 +846,7 @@ if __name__ == "__main__":
     total_msgs = len(df)
     daily_avg = total_msgs // days
 
-    daily_counts = df.groupby("Date").size()
+    daily_counts = ENGINE.group_sizes(df, ["Date"])
     craziest_day = daily_counts.idxmax()
     craziest_count = int(daily_counts.max())
 
@@ -421,11 +855,15 @@ if __name__ == "__main__":
     total_chars = sent_chars + recv_chars
 
     df_private = df[df["ChatType"] == "Private"]
-    top_contact_series = df_private.groupby("NickName").size().sort_values(ascending=False)
+    top_contact_series = ENGINE.group_sizes(df_private, ["NickName"]).sort_values(ascending=False)
     top_contact_name = clean_text(top_contact_series.index[0])
     top_contact_count = int(top_contact_series.iloc[0])
 
+    # 会话 / 回复速度：整表排序一次，所有聊天一起算
+    conversations, conv_overall = conversation_stats(df, CONFIG["SESSION_GAP_MIN"])
+
     metrics = {
+        "year": CONFIG["TARGET_YEAR"],
         "total": total_msgs,
         "daily_avg": daily_avg,
         "start": start_date.strftime("%Y.%m.%d"),
@@ -436,52 +874,413 @@ if __name__ == "__main__":
         "chars_sent": sent_chars,
         "chars_recv": recv_chars,
         "top_contact_name": top_contact_name,
-        "top_contact_count": top_contact_count
+        "top_contact_count": top_contact_count,
+        "conversation": summarize_conversations(conversations, conv_overall),
+        "media": media_stats.summarize(*media) if media is not None else None,
     }
 
-    df_p = df[df["ChatType"] == "Private"]
-    raw_df_g = df[df["ChatType"] == "Group"]
-    df_me = df[df["IsSender"] == 1]
+    group_names = df.loc[df["ChatType"] == "Group", "NickName"].unique()
+    if members is None: members = member_table(df).droplevel("Year")
+    mine = members[members.index.get_level_values("IsSender") == 1].groupby(level="NickName").sum()
+    my_sent_counts = mine[mine.index.isin(group_names)]
+    active_group_names = my_sent_counts[my_sent_counts >= 100].index
+
+    print(f"🧹 过滤潜水群聊: 原有 {len(group_names)} 个 -> 剩余 {len(active_group_names)} 个 (我发言>=100条)")
 
-    global_charts = {
-        "my_hourly": draw_hourly_curve(df_me),
-        "my_wordcloud": draw_wordcloud(df_me)
+    return {
+        "metrics": metrics,
+        "active_group_names": list(active_group_names),
+        "conversations": conversations,
     }
 
-    my_sent_counts = raw_df_g[raw_df_g["IsSender"] == 1].groupby("NickName").size()
-    active_group_names = my_sent_counts[my_sent_counts >= 100].index
-    df_g = raw_df_g[raw_df_g["NickName"].isin(active_group_names)]
-    
-    print(f"🧹 过滤潜水群聊: 原有 {len(raw_df_g['NickName'].unique())} 个 -> 剩余 {len(active_group_names)} 个 (我发言>=100条)")
+def summarize_conversations(conversations, overall):
+    """单聊整体的回复速度 / 谁先开口，加上连续聊天天数最长的好友"""
+    summary = dict(overall)
+    private = conversations.loc["Private"] if "Private" in conversations.index.get_level_values(0) else None
+    if private is not None and len(private) and private["longest_streak"].max() > 0:
+        name = private["longest_streak"].idxmax()
+        summary.update(longest_streak=int(private.loc[name, "longest_streak"]),
+                       longest_streak_name=clean_text(name),
+                       longest_streak_start=str(private.loc[name, "streak_start"])[:10])
+    return summary
 
-    print("📊 正在绘制年度趋势 & 全局词云...")
-    chart_me_trend = draw_line_chart(df[df["IsSender"]==1], "我的发言趋势（仅发送）") # 汉化
-    chart_global_wc = draw_wordcloud(df)
-
-    charts = {
-        "heatmap": draw_heatmap(df, "年度活跃热力图"),
-        "rank_p": draw_rank_bar(df_p, "好友 Top 10"),
-        "rank_g": draw_rank_bar(df_g, "群聊 Top 10"),
-        "trend_me": chart_me_trend,
-        "wordcloud_global": chart_global_wc
+# ===================== 逐年快照 =====================
+# ingest 一次读入所有年份、tokenize 一次分完所有年份的词；之后每一年留一份小而完整的聚合：
+#   计数立方体 (NickName × ChatType × IsSender × 月 × 小时 → 条数 / 字数)、分类结果、词频 Top N。
+# 快照不随 TARGET_YEAR 变化，换年份或做年度对比都不必重读 CSV。
+
+SNAPSHOT_TOP_WORDS = 200
+
+def year_partials(df, tokens):
+    """逐年快照里可以按分片分别计算、再合并的部分：计数立方体、分类、活跃日期、起止时间、词频草图"""
+    chars = df["StrContent"].str.len()
+    spilled = isinstance(tokens, SpilledTokenCounts)
+    partials = {}
+    for year, ydf in df.groupby("Year"):
+        partials[int(year)] = {
+            "rows": len(ydf),
+            "cube": ENGINE.group_cube(ydf.assign(Month=ydf["dt"].dt.month, Chars=chars.loc[ydf.index]),
+                                      ["NickName", "ChatType", "IsSender", "Month", "Hour"]),
+            "classification": ydf.groupby("NickName")["ChatType"].first().to_dict(),
+            "dates": set(ydf["Date"].unique()),
+            "start": ydf["dt"].min(),
+            "end": ydf["dt"].max(),
+            # 落盘的词频本身就是合并好的，只在单进程（内存预算模式）下出现
+            "words": keyword_counts(tokens, ydf) if spilled else None,
+            "sketch": None if spilled else keyword_sketch(tokens, ydf),
+        }
+    return partials
+
+def merge_year_partials(parts):
+    """各分片的 year_partials 合并成逐年快照；分片之间聊天互不重叠，立方体直接按键合计"""
+    snapshots = {}
+    for year in sorted({y for p in parts for y in p}):
+        ps = [p[year] for p in parts if year in p]
+        if len(ps) == 1:
+            cube = ps[0]["cube"]
+        else:
+            cube = pd.concat([p["cube"] for p in ps])
+            cube = cube.groupby(level=list(range(cube.index.nlevels))).sum()
+        if ps[0]["words"] is not None:
+            words = ps[0]["words"]
+        else:
+            sketch = ps[0]["sketch"]
+            for p in ps[1:]: sketch.merge(p["sketch"])
+            words = sketch.top()
+        snapshots[year] = {
+            "cube": cube,
+            "classification": {k: v for p in ps for k, v in p["classification"].items()},
+            "active_days": len(set().union(*(p["dates"] for p in ps))),
+            "start": min(p["start"] for p in ps).strftime("%Y.%m.%d"),
+            "end": max(p["end"] for p in ps).strftime("%Y.%m.%d"),
+            # 同频按词排序，逐行统计与落盘统计得到的顺序一致
+            "words": sorted(words.items(), key=lambda kv: (-kv[1], kv[0]))[:SNAPSHOT_TOP_WORDS],
+        }
+        print(f"   {year}: {sum(p['rows'] for p in ps):,} 条消息, 立方体 {len(cube):,} 格")
+    return snapshots
+
+def build_year_snapshots(df, tokens):
+    print("🗂️ 生成逐年快照 ...")
+    partials = SHARD_PARTIALS.pop("years", None)
+    if partials is not None:
+        print(f"   合并 {len(partials)} 个分片的部分结果")
+        return merge_year_partials(partials)
+    return merge_year_partials([year_partials(df, tokens)])
+
+def summarize_snapshot(year, snap):
+    """把一年的快照压成年度对比页需要的几个数字（可直接写进 manifest）"""
+    cube = snap["cube"].reset_index()
+    sent = cube[cube["IsSender"] == 1]
+    def top(chat_type):
+        counts = cube[cube["ChatType"] == chat_type].groupby("NickName")["msgs"].sum()
+        if counts.empty: return None
+        counts = counts.sort_values(ascending=False, kind="stable")
+        return [clean_text(counts.index[0]), int(counts.iloc[0])]
+    hourly = sent.groupby("Hour")["msgs"].sum()
+    monthly = cube.groupby("Month")["msgs"].sum().reindex(range(1, 13), fill_value=0)
+    return {
+        "year": int(year),
+        "total": int(cube["msgs"].sum()),
+        "sent": int(sent["msgs"].sum()),
+        "chars_sent": int(sent["chars"].sum()),
+        "chars_recv": int(cube.loc[cube["IsSender"] == 0, "chars"].sum()),
+        "friends": int(cube.loc[cube["ChatType"] == "Private", "NickName"].nunique()),
+        "groups": int(cube.loc[cube["ChatType"] == "Group", "NickName"].nunique()),
+        "active_days": snap["active_days"],
+        "start": snap["start"],
+        "end": snap["end"],
+        "monthly": [int(v) for v in monthly],
+        "busiest_hour": int(hourly.idxmax()) if not hourly.empty else None,
+        "top_contact": top("Private"),
+        "top_group": top("Group"),
+        "top_words": [w for w, _ in snap["words"][:8]],
     }
 
+# ===================== 绘图 & 打包 =====================
+def global_chart_units(df, df_p, df_g, df_me, tokens):
+    """全局图表：(所属区块, 键, 绘制函数)，每张图是一个存档单元，单独重试、单独跳过"""
+    return [
+        ("global_charts", "my_hourly", lambda: draw_hourly_curve(df_me)),
+        ("global_charts", "my_wordcloud", lambda: draw_wordcloud(keyword_counts(tokens, df_me))),
+        ("charts", "trend_me", lambda: draw_line_chart(df_me, "我的发言趋势（仅发送）")), # 汉化
+        ("charts", "wordcloud_global", lambda: draw_wordcloud(keyword_counts(tokens, df))),
+        ("charts", "heatmap", lambda: draw_heatmap(df, "年度活跃热力图")),
+        ("charts", "rank_p", lambda: draw_rank_bar(df_p, "好友 Top 10")),
+        ("charts", "rank_g", lambda: draw_rank_bar(df_g, "群聊 Top 10")),
+    ]
+
+def build_unit(checkpoints, name, store, build, failures, kind):
+    """全局单元（全局图表、关键词索引）：与画像一样失败后重试，仍失败的记进 failures，返回 None（报告里该处留空）"""
+    for attempt in range(CONFIG["PROFILE_RETRIES"] + 1):
+        try:
+            return checkpointed(checkpoints, name, store, build)
+        except Exception as e:
+            print(f"    ❌ {name} 失败: {type(e).__name__}: {e}" + (f"（重试第 {attempt} 次）" if attempt else ""))
+            error = e
+    failures.append({"kind": kind, "rank": None, "name": name, "error": f"{type(error).__name__}: {error}"})
+    return None
+
+def render_charts(df, aggregates, tokens, snapshots=None, checkpoints=None):
+    """写出 report_data.zip，返回失败的单元（画像 / 全局图表 / 索引）列表；checkpoints 为流水线的存档区（见上文）"""
+    store = ReportWriter(CONFIG["REPORT_PATH"])
+    try:
+        data_package, failures = build_package(df, aggregates, tokens, snapshots, checkpoints, store)
+    except BaseException:
+        store.abort()  # 不留下半截的 .tmp
+        raise
+
+    print(f"💾 保存数据到 {CONFIG['REPORT_PATH']} ...")
+    store.close(data_package)
+    if failures:
+        print(f"⚠️ {len(failures)} 个单元生成失败，报告中暂缺：")
+        for f in failures:
+            print(f"   {f['kind']}#{f['rank']} {f['name']}: {f['error']}" if f["rank"] else
+                  f"   {f['name']}: {f['error']}")
+    return failures
+
+def build_package(df, aggregates, tokens, snapshots, checkpoints, store):
+    """画图并写进 store，返回 (manifest, 失败的单元)"""
+    df_p = df[df["ChatType"] == "Private"]
+    raw_df_g = df[df["ChatType"] == "Group"]
+    df_g = raw_df_g[raw_df_g["NickName"].isin(aggregates["active_group_names"])]
+    df_me = df[df["IsSender"] == 1]
+    failures = []
+
+    print("📊 正在绘制年度趋势 & 全局词云...")
+    sections = {"global_charts": {}, "charts": {}}
+    for section, key, draw in global_chart_units(df, df_p, df_g, df_me, tokens):
+        sections[section][key] = build_unit(checkpoints, f"global:{key}", store,
+                                            lambda s, draw=draw: s.add_image(draw()), failures, "global")
+
+    # 内存预算模式：用完的子表立即释放
+    if MEMORY_BUDGET is not None:
+        del df_me, raw_df_g
+        if MEMORY_BUDGET.under_pressure(): MEMORY_BUDGET.relieve("全局图表")
+
     print("🚀 [3/4] 生成【单聊】深度画像...")
-    p_profiles = analyze_subset(df_p, 10, is_group=False)
+    conversations = aggregates.get("conversations")
+    media = load_media(CONFIG["TARGET_YEAR"])
+    p_profiles = analyze_subset(df_p, store, tokens, 10, is_group=False, conversations=conversations, media=media,
+                                checkpoints=checkpoints, failures=failures)
+    if MEMORY_BUDGET is not None:
+        del df_p
+        if MEMORY_BUDGET.under_pressure(): MEMORY_BUDGET.relieve("单聊画像")
     
     print("🚀 [4/4] 生成【群聊】深度画像...")
-    g_profiles = analyze_subset(df_g, 10, is_group=True)
+    g_profiles = analyze_subset(df_g, store, tokens, 10, is_group=True, conversations=conversations,
+                                members=load_members(CONFIG["TARGET_YEAR"]), media=media,
+                                checkpoints=checkpoints, failures=failures)
+
+    sampled = None
+    if PREVIEW is not None:
+        # 只有分词用的是样本：关键词次数按当年「全量 / 样本」放大，其余统计本来就是全量
+        sampled = len(preview.stratified_sample(df, PREVIEW))
+
+    keyword_index = None
+    if isinstance(tokens, SpilledTokenCounts):
+        print("ℹ️ 内存预算模式下不保留逐条分词结果，报告中不含关键词搜索")
+    else:
+        print("🔎 建立关键词索引 ...")
+        def add_index(s):
+            index = build_keyword_index(tokenized(df, tokens), tokens, CONFIG["TARGET_YEAR"],
+                                        CONFIG["KEYWORD_INDEX_MIN"], clean_text)
+            if not index: return None
+            if sampled: index = preview.scale_index(index, len(df) / sampled)
+            print(f"   收录 {len(index['words']):,} 个关键词（出现 ≥{CONFIG['KEYWORD_INDEX_MIN']} 次）")
+            return s.add_json("keyword_index", index)
+        keyword_index = build_unit(checkpoints, "keyword_index", store, add_index, failures, "index")
 
     data_package = {
-        "metrics": metrics,
-        "charts": charts,
-        "global_charts": global_charts,
+        "metrics": aggregates["metrics"],
+        "charts": sections["charts"],
+        "global_charts": sections["global_charts"],
         "private_profiles": p_profiles,
-        "group_profiles": g_profiles
+        "group_profiles": g_profiles,
+        "years": [summarize_snapshot(y, s) for y, s in sorted((snapshots or {}).items())],
+        "keyword_index": keyword_index,
+        "failed_profiles": failures,
     }
+    if sampled is not None:
+        data_package["preview"] = {"sample_pct": round(sampled / len(df) * 100, 1)}
+
+    return data_package, failures
 
-    print("💾 保存数据到 report_data.json ...")
-    with open("report_data.json", "w", encoding="utf-8") as f:
-        json.dump(data_package, f, ensure_ascii=False)
+# ===================== 流水线阶段 =====================
+# ingest → tokenize → years → aggregate → render-charts，每个阶段的产物缓存在 .cache/pipeline/
+# ingest / tokenize / years 覆盖所有年份；aggregate / render-charts 按 TARGET_YEAR 分变体记录
+
+STYLE_KEYS = ["BG_COLOR", "TEXT_COLOR", "AXIS_COLOR", "MAIN_COLOR", "ACCENT_COLOR", "HEATMAP_GRADIENT"]
+
+def run_render_charts(pipe):
+    checkpoints = pipe.checkpoints()
+    failures = render_charts(target_year_frame(pipe), pipe.get("aggregate"), pipe.get("tokenize"), pipe.get("years"),
+                             checkpoints)
+    if checkpoints.restored: print(f"♻️ 从上次的存档恢复了 {checkpoints.restored} 个单元（全局图表 / 画像 / 索引）")
+    if failures: pipe.mark_incomplete(f"{len(failures)} 个单元失败")
+
+def run_ingest(pipe):
+    df = load_data()
+    if df.empty:
+        print("❌ 没有符合条件的聊天记录")
+        sys.exit(1)
+    TRACER.count(rows=len(df))
+    return df
+
+def run_tokenize(pipe):
+    tokens = SHARD_PARTIALS.pop("tokens", None)
+    if tokens is not None:
+        print(f"✂️ 分词已在各分片中完成 ({len(tokens):,} 条消息)")
+        TRACER.count(rows=len(tokens), tokens=int(tokens.str.len().sum()))
+        return tokens
+    df = pipe.get("ingest")
+    if PREVIEW is not None:
+        full = len(df)
+        df = preview.stratified_sample(df, PREVIEW)
+        print(f"⚡ 预览模式: 只对按 (聊天, 月份) 分层抽样的 {len(df):,} / {full:,} 条（{len(df) / full:.1%}）分词")
+    return tokenize_messages(df)
+
+def build_stages():
+    target_year = lambda: CONFIG["TARGET_YEAR"]
+    return [
+        Stage("ingest", run_ingest,
+              files=lambda: [CONFIG["CSV_PATH"]] + ([CONFIG["AUDIO_TEXT_DB"]] if CONFIG["AUDIO_TEXT_DB"] else []),
+              params=lambda: {"audio_id": CONFIG["AUDIO_ID_COLUMN"]},
+              outputs=lambda: [MEMBERS_PATH, MEDIA_PATH],
+              code=[load_data, prepare_messages, read_messages, apply_strict_classification, member_table, run_ingest,
+                    sys.modules[engines.__name__],
+                    ingest_shard, load_data_sharded, sys.modules[shards.__name__],
+                    sys.modules[media_stats.__name__], sys.modules[VoiceTranscripts.__module__]]),
+        Stage("tokenize", run_tokenize,
+              deps=["ingest"],
+              files=lambda: [CONFIG["USER_DICT"]],
+              params=lambda: {"stop": sorted(KEYWORD_STOPWORDS), "soft": KEYWORD_SOFT_STOP,
+                              "spill": MEMORY_BUDGET is not None, "preview": PREVIEW},
+              outputs=lambda: [TOKEN_DB] if MEMORY_BUDGET is not None else [],
+              code=[run_tokenize, tokenize_messages, tokenize_with_memo, tokenize_parallel, tokenize_to_disk,
+                    extract_keywords, sys.modules[SpilledTokenCounts.__module__], sys.modules[preview.__name__]]),
+        Stage("years", lambda pipe: build_year_snapshots(pipe.get("ingest"), pipe.get("tokenize")),
+              deps=["ingest", "tokenize"],
+              params=lambda: {"top_words": SNAPSHOT_TOP_WORDS, "sketch": CONFIG["KEYWORD_SKETCH_SIZE"]},
+              code=[build_year_snapshots, year_partials, merge_year_partials, keyword_sketch, keyword_counts, tokenized,
+                    sys.modules[SpaceSaving.__module__], sys.modules[engines.__name__]]),
+        Stage("aggregate", lambda pipe: compute_aggregates(target_year_frame(pipe), load_members(target_year()),
+                                                           load_media(target_year())),
+              deps=["ingest"],
+              params=lambda: {"year": target_year(), "session_gap": CONFIG["SESSION_GAP_MIN"]},
+              code=[compute_aggregates, summarize_conversations, clean_text, load_members, load_media, sys.modules[conversation_stats.__module__],
+                    sys.modules[engines.__name__]],
+              variant=target_year),
+        Stage("render-charts", run_render_charts,
+              deps=["ingest", "aggregate", "tokenize", "years"],
+              params=lambda: {"year": target_year(), "sketch": CONFIG["KEYWORD_SKETCH_SIZE"],
+                              "index_min": CONFIG["KEYWORD_INDEX_MIN"],
+                              **{k: CONFIG[k] for k in STYLE_KEYS}},
+              outputs=lambda: [CONFIG["REPORT_PATH"]],
+              code=[sys.modules[__name__], sys.modules[ChartCache.__module__], sys.modules[ReportWriter.__module__],
+                    sys.modules[SpaceSaving.__module__], sys.modules[build_keyword_index.__module__],
+                    sys.modules[media_stats.__name__], os.path.join(HERE, "wordcloud_engine.py")],
+              variant=target_year),
+    ]
+
+TRACE_DIR = os.path.join(CONFIG["CACHE_DIR"], "trace")
+
+def print_run_summary():
+    """打印运行汇总，并写出 JSON 明细与 Chrome Trace"""
+    json_path = os.path.join(TRACE_DIR, "trace.json")
+    chrome_path = os.path.join(TRACE_DIR, "chrome_trace.json")
+    TRACER.write(json_path, chrome_path)
+    prof_path = TRACER.dump_profile()
+    if prof_path: print(f"🔬 cProfile 结果已保存: {prof_path}")
+
+    print("📈 阶段耗时:")
+    print(TRACER.summary("stage") or "   （所有阶段均已是最新）")
+    print(f"   明细: {json_path} | Chrome Trace: {chrome_path}")
+    print(CHART_CACHE.summary())
+    if MEMORY_BUDGET is not None: print(MEMORY_BUDGET.summary())
+    if JIEBA_STATS:
+        source = "预构建词典 (mmap)" if JIEBA_STATS["hit"] else "首次构建词典"
+        print(f"🔤 jieba: {source} {JIEBA_STATS['seconds']:.2f}s")
+    print(import_summary())
+
+def make_pipeline(extra_stages=(), state_dir=None):
+    state_dir = state_dir or PIPELINE_DIR
+    SHARD_PARTIALS.clear()  # 上一轮没被用掉的分片结果不能带进新的一轮
+    return Pipeline(build_stages() + list(extra_stages), state_dir, TRACER, keep_results=MEMORY_BUDGET is None)
+
+def use_account(csv_path, report_path, work_dir):
+    """批量模式：输入 / 产物指向该账号，账号专属的状态（词频落盘、剖析结果）放进 work_dir，语音转写库取 CSV 旁边的；
+    图表、词云排版、jieba 词典缓存按内容寻址，各账号共用"""
+    CONFIG["CSV_PATH"] = csv_path
+    CONFIG["REPORT_PATH"] = report_path
+    CONFIG["AUDIO_TEXT_DB"] = os.path.join(os.path.dirname(os.path.abspath(csv_path)), VOICE_DB_NAME)
+    use_work_dir(work_dir)
+
+def use_work_dir(work_dir):
+    """流水线状态、词频落盘、ingest 小表、分片临时文件、剖析结果改放到 work_dir 下"""
+    global PIPELINE_DIR, TOKEN_DB, MEMBERS_PATH, MEDIA_PATH, SHARD_DIR, TRACE_DIR
+    PIPELINE_DIR = os.path.join(work_dir, "pipeline")
+    SHARD_DIR = os.path.join(work_dir, "shards")
+    TOKEN_DB = os.path.join(work_dir, "tokens", "token_counts.sqlite")
+    MEMBERS_PATH = os.path.join(work_dir, "members", "members.pkl")
+    MEDIA_PATH = os.path.join(work_dir, "media", "media.pkl")
+    TRACE_DIR = os.path.join(work_dir, "trace")
+    if TRACER.profile_target: TRACER.profile_dir = TRACE_DIR
+
+def enable_preview(fraction, report_path):
+    """预览模式：只对分层抽样的消息分词（词云、关键词），状态放在 .cache/preview/，不影响全量运行的缓存与报告"""
+    global PREVIEW
+    PREVIEW = fraction
+    CONFIG["REPORT_PATH"] = report_path
+    use_work_dir(os.path.join(CONFIG["CACHE_DIR"], "preview"))
+
+def warm_up():
+    """预先加载 jieba 词典、绘图库、字体和词云引擎；批量模式在 fork 之前调用，子进程直接共享"""
+    warm_jieba()
+    set_style()
+    fig, ax = plt.subplots(figsize=(1, 1))
+    ax.set_title("预热")
+    fig_to_png(fig)  # 触发字体查找与缓存
+    get_wordcloud_engine().render({"预热": 1})
+
+def reset_run_stats():
+    """常驻进程（监视模式）每轮开始前清空耗时记录与图表缓存计数"""
+    TRACER.reset()
+    CHART_CACHE.hits = CHART_CACHE.misses = 0
+
+def enable_shards(n, workers=None):
+    """分片模式：读入与分词按聊天分片、多进程并行；结果与单进程完全一致，不影响阶段缓存"""
+    global SHARDS
+    SHARDS = (n, workers or min(n, os.cpu_count() or 1))
+
+def set_engine(name):
+    """切换读入与大表分组的计算后端（见 engines.py）；结果与 pandas 一致，不影响阶段缓存"""
+    global ENGINE
+    ENGINE = engines.get_engine(name)
+
+def set_memory_budget(limit_mb):
+    """开启内存预算模式：分块读取、词频落盘、阶段结果用完即释放"""
+    global MEMORY_BUDGET
+    MEMORY_BUDGET = MemoryBudget(limit_mb)
+
+def enable_profiling(span_name):
+    """对指定名字的阶段 / 函数 / 画像（如 tokenize、draw_wordcloud、group#1）开启 cProfile"""
+    TRACER.profile_target = span_name
+    TRACER.profile_dir = TRACE_DIR
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="分析 messages.csv，生成 report_data.zip")
+    parser.add_argument("--force", action="store_true", help="忽略阶段缓存，全部重跑")
+    parser.add_argument("--no-cache", action="store_true", help="不使用图表缓存")
+    parser.add_argument("--profile-stage", help="对指定阶段开启 cProfile")
+    parser.add_argument("--memory-budget", type=parse_size, metavar="SIZE", help="内存上限，如 2G / 1500M")
+    parser.add_argument("--year", type=int, help=f"报告年份（默认 {CONFIG['TARGET_YEAR']}）")
+    args = parser.parse_args()
+    CHART_CACHE.enabled = not args.no_cache
+    if args.year: CONFIG["TARGET_YEAR"] = args.year
+    if args.profile_stage: enable_profiling(args.profile_stage)
+    if args.memory_budget: set_memory_budget(args.memory_budget)
 
-    print("\n✅ 完成！请运行 step2_render.py")
\ No newline at end of file
+    make_pipeline().run(force=["all"] if args.force else [])
+    print_run_summary()
+    print("\n✅ 完成！请运行 step2_render.py")
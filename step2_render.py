@@ -1,125 +1,83 @@
-import json
 import os
-from datetime import datetime
-
-print("正在读取 report_data.json ...")
-try:
-    with open("report_data.json", "r", encoding="utf-8") as f:
-        data = json.load(f)
-except FileNotFoundError:
-    print("❌ 没找到数据！请先运行 step1_analyze.py")
-    exit()
-
-# ===================== 1. 数据准备 =====================
-metrics = data.get("metrics", {})
-charts = data.get("charts", {})
-p_profiles = data.get("private_profiles", [])
-g_profiles = data.get("group_profiles", [])
-global_charts = data.get("global_charts", {})
-
-try:
-    start_date = metrics.get("start", "2025.01.01")
-    end_date = metrics.get("end", "2025.12.31")
-except:
-    start_date = "2025.01.01"
-    end_date = "2025.12.31"
-
-# 基础数据
-total_msgs = metrics.get("total", 0)
-days_span = 365 
-metrics["daily_avg"] = int(total_msgs / days_span) if days_span > 0 else 0
-
-total_chars = metrics.get("chars", metrics.get("chars_total", 0))
-chars_sent = metrics.get("chars_sent", int(total_chars * 0.5))
-chars_recv = metrics.get("chars_recv", int(total_chars * 0.5))
-
-# 日期格式化 (1月16日)
-raw_day = metrics.get("craziest_day", "N/A")
-try:
-    if "-" in raw_day:
-        parts = raw_day.split("-")
-        craziest_day = f"{int(parts[-2])}月{int(parts[-1])}日"
-    else:
-        craziest_day = raw_day
-except:
-    craziest_day = raw_day
-
-craziest_count = metrics.get("craziest_count", 0)
-top_contact_name = metrics.get("top_contact_name", "N/A")
-top_contact_count = metrics.get("top_contact_count", 0)
-
-# 书本换算
-books_written = chars_sent / 253000
-books_read = chars_recv / 200000
-
-# ===================== 2. HTML 渲染函数 =====================
-
-def render_profile_list(profile_list):
-    if not profile_list: return "<p style='text-align:center; color:#666'>无数据</p>"
-    html = ""
-    for p in profile_list:
-        wc_img = f'<img src="data:image/png;base64,{p["wordcloud"]}">' if p.get("wordcloud") else ""
-        
-        # 群聊 Top10 发言人图表
-        member_bar_html = ""
-        if p.get("member_bar"):
-            member_bar_html = f"""
-            <div class="viz-row-full">
-                <div class="viz-label">🏆 群内话痨排行榜 (Top 10)</div>
-                <img src="data:image/png;base64,{p["member_bar"]}">
-            </div>
-            """
-        
-        html += f"""
-        <div class="detail-card">
-            <div class="d-header">
-                <span class="d-rank">#{p["rank"]}</span>
-                <span class="d-name">{p["name"]}</span>
-                <span class="d-count">{p["count"]:,} 条</span>
-            </div>
-            
-            <div class="viz-row-full">
-                <div class="viz-label">收发对比</div>
-                <img src="data:image/png;base64,{p["compare"]}">
-            </div>
-
-            {member_bar_html}
-
-            <div class="viz-row-full">
-                <div class="viz-label">全年活跃热力图</div>
-                <img src="data:image/png;base64,{p["heatmap"]}">
-            </div>
-
-            <div class="viz-row-split">
-                <div class="viz-half">
-                    <div class="viz-label">24小时作息</div>
-                    <img src="data:image/png;base64,{p["hourly"]}">
-                </div>
-                <div class="viz-half">
-                    <div class="viz-label">专属关键词</div>
-                    {wc_img}
-                </div>
-            </div>
-        </div>
-        """
-    return html
-
-# ===================== 3. HTML 主体 =====================
-
-html = f"""
-<!DOCTYPE html>
-<html>
-<head>
-<meta charset="utf-8">
-<meta name="viewport" content="width=device-width, initial-scale=1.0">
-<title>2025 微信年度报告</title>
-<style>
+import sys
+import html
+import base64
+import calendar
+import hashlib
+import struct
+import argparse
+import webbrowser
+from pathlib import Path
+from report_store import open_report, InlineReport
+
+# ===================== 输出配置 =====================
+RENDER_CONFIG = {
+    "DATA_PATH": "report_data.zip",
+    "OUTPUT_PATH": "Final_Report.html",
+    # inline: 图片以 base64 内嵌进单个 HTML；external: 图片写入 assets/，按内容哈希命名并懒加载
+    "ASSET_MODE": "inline",
+    "ASSET_DIR": "assets",
+}
+
+# ===================== 1. 图片输出 =====================
+
+def png_size(raw):
+    """从 PNG 文件头读取宽高，用于给懒加载图片预留位置"""
+    if raw[:8] != b"\x89PNG\r\n\x1a\n": return None
+    return struct.unpack(">II", raw[16:24])
+
+
+class ImageSink:
+    """把容器内的图片引用变成 <img> 标签：内嵌 base64，或按内容哈希写入 assets/"""
+
+    def __init__(self, report, mode="inline", asset_dir="assets", asset_url="assets"):
+        self.report = report
+        self.mode = mode
+        self.asset_dir = asset_dir
+        self.asset_url = asset_url
+        self.written = set()
+
+    def write_asset(self, raw):
+        """相同图片只落盘一次；先写临时文件再替换，中断时不会留下半截图片（大小不符的旧文件会重写）"""
+        name = hashlib.sha256(raw).hexdigest()[:20] + ".png"
+        if name not in self.written:
+            path = os.path.join(self.asset_dir, name)
+            if not os.path.exists(path) or os.path.getsize(path) != len(raw):
+                os.makedirs(self.asset_dir, exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(raw)
+                os.replace(tmp, path)
+            self.written.add(name)
+        return f"{self.asset_url}/{name}"
+
+    def img_tag(self, ref):
+        """图片在用到时才从容器读出"""
+        raw = self.report.image(ref)
+        if not raw: return ""
+        if self.mode != "external":
+            return f'<img src="data:image/png;base64,{base64.b64encode(raw).decode()}">'
+
+        size = png_size(raw)
+        dims = f' width="{size[0]}" height="{size[1]}"' if size else ""
+        return f'<img src="{self.write_asset(raw)}"{dims} loading="lazy" decoding="async">'
+
+    def prune(self):
+        """删除上一次生成遗留、本次未引用的图片"""
+        if self.mode != "external" or not os.path.isdir(self.asset_dir): return
+        for name in os.listdir(self.asset_dir):
+            if name.endswith(".png") and name not in self.written:
+                os.remove(os.path.join(self.asset_dir, name))
+
+# ===================== 2. HTML 片段 =====================
+
+REPORT_CSS = """
     /* 隐藏滚动条 */
-    ::-webkit-scrollbar {{
+    ::-webkit-scrollbar {
         display: none; 
-    }}
+    }
 
-    :root {{
+    :root {
         --bg: #000000;
         --text: #ffffff;
         --accent-blue: #00f2ff;
@@ -127,27 +85,27 @@ html = f"""
         --accent-red: #ff3366;
         --accent-gold: #ffd700;
         --accent-green: #00ff88;
-    }}
+    }
 
-    * {{ box-sizing: border-box; }}
+    * { box-sizing: border-box; }
     
-    body {{
+    body {
         margin: 0; padding: 0;
         font-family: 'PingFang SC', 'Microsoft YaHei', 'Segoe UI', sans-serif;
         background: var(--bg);
         color: var(--text);
         overflow: hidden; 
-    }}
+    }
 
-    .snap-container {{
+    .snap-container {
         height: 100vh; width: 100vw;
         overflow-y: scroll;
         overflow-x: hidden; /* 关键：防止横向溢出 */
         scroll-snap-type: y mandatory;
         scroll-behavior: smooth;
-    }}
+    }
 
-    .section {{
+    .section {
         height: 100vh; width: 100%;
         scroll-snap-align: start;
         position: relative;
@@ -156,80 +114,80 @@ html = f"""
         padding: 20px;
         border-bottom: 1px solid #1a1a1a;
         overflow: hidden;
-    }}
+    }
 
     /* === 动画系统 === */
-    .anim-fade {{ opacity: 0; transform: translateY(40px); transition: all 0.8s ease-out; }}
-    .anim-scale {{ opacity: 0; transform: scale(0.9); transition: all 0.8s cubic-bezier(0.175, 0.885, 0.32, 1.275); }}
+    .anim-fade { opacity: 0; transform: translateY(40px); transition: all 0.8s ease-out; }
+    .anim-scale { opacity: 0; transform: scale(0.9); transition: all 0.8s cubic-bezier(0.175, 0.885, 0.32, 1.275); }
     
-    .section.active .anim-fade {{ opacity: 1; transform: translateY(0); }}
-    .section.active .anim-scale {{ opacity: 1; transform: scale(1); }}
+    .section.active .anim-fade { opacity: 1; transform: translateY(0); }
+    .section.active .anim-scale { opacity: 1; transform: scale(1); }
 
     /* === UI 样式 === */
     
-    .intro-title {{
+    .intro-title {
         font-size: 5rem; font-weight: 900; line-height: 1.1; text-align: center;
         background: linear-gradient(135deg, #ff3366 0%, #ffffff 50%, #00f2ff 100%);
         -webkit-background-clip: text; -webkit-text-fill-color: transparent;
         margin-bottom: 20px;
-    }}
+    }
 
-    .floating-stat {{
+    .floating-stat {
         text-align: center;
         width: 100%;
         max-width: 800px;
         padding: 0 20px;
-    }}
+    }
     
-    .stat-label {{
+    .stat-label {
         font-size: 1.8rem; color: #fff; font-weight: bold; margin-bottom: 10px;
         opacity: 0.9;
         letter-spacing: 2px;
-    }}
+    }
     
-    .stat-val {{
+    .stat-val {
         font-family: 'Segoe UI', sans-serif;
         font-size: 6rem;
         font-weight: 800; 
         line-height: 1; 
         margin: 20px 0;
         letter-spacing: -2px;
-    }}
+    }
 
-    .stat-desc {{ font-size: 1.2rem; color: #888; letter-spacing: 1px; margin-top: 10px; }}
-    .unit {{ font-size: 2rem; font-weight: normal; margin-left: 10px; color: #bbb; }}
+    .stat-desc { font-size: 1.2rem; color: #888; letter-spacing: 1px; margin-top: 10px; }
+    .unit { font-size: 2rem; font-weight: normal; margin-left: 10px; color: #bbb; }
 
-    .c-blue .stat-val {{ color: var(--accent-blue); text-shadow: 0 0 40px rgba(0,242,255,0.4); }}
-    .c-green .stat-val {{ color: var(--accent-green); text-shadow: 0 0 40px rgba(0,255,136,0.4); }}
-    .c-gold .stat-val {{ color: var(--accent-gold); text-shadow: 0 0 40px rgba(255,215,0,0.4); }}
-    .c-fire .stat-val {{ 
+    .c-blue .stat-val { color: var(--accent-blue); text-shadow: 0 0 40px rgba(0,242,255,0.4); }
+    .c-green .stat-val { color: var(--accent-green); text-shadow: 0 0 40px rgba(0,255,136,0.4); }
+    .c-gold .stat-val { color: var(--accent-gold); text-shadow: 0 0 40px rgba(255,215,0,0.4); }
+    .c-fire .stat-val { 
         background: linear-gradient(to top, #ff0000, #ff8800);
         -webkit-background-clip: text; -webkit-text-fill-color: transparent;
         filter: drop-shadow(0 0 20px rgba(255,50,50,0.5));
-    }}
+    }
 
-    .text-split-container {{
+    .text-split-container {
         display: flex; justify-content: center; align-items: center;
         width: 100%; max-width: 900px; gap: 60px;
-    }}
-    .text-col {{ flex: 1; text-align: left; }}
-    .text-col.right {{ text-align: right; }}
-    .divider-line {{ width: 1px; height: 150px; background: linear-gradient(to bottom, transparent, #333, transparent); }}
-    .col-label {{ font-size: 1.5rem; font-weight: bold; margin-bottom: 15px; color: #fff; }}
-    .col-num {{ font-size: 4rem; font-weight: 800; line-height: 1; margin-bottom: 15px; font-family: 'Segoe UI', sans-serif; }}
-    .col-desc {{ font-size: 1rem; color: #888; line-height: 1.5; }}
-    .col-highlight {{ color: #fff; font-weight: bold; font-size: 1.1em; }}
-
-    .chart-box {{
+    }
+    .text-col { flex: 1; text-align: left; }
+    .text-col.right { text-align: right; }
+    .divider-line { width: 1px; height: 150px; background: linear-gradient(to bottom, transparent, #333, transparent); }
+    .col-label { font-size: 1.5rem; font-weight: bold; margin-bottom: 15px; color: #fff; }
+    .col-num { font-size: 4rem; font-weight: 800; line-height: 1; margin-bottom: 15px; font-family: 'Segoe UI', sans-serif; }
+    .col-desc { font-size: 1rem; color: #888; line-height: 1.5; }
+    .col-highlight { color: #fff; font-weight: bold; font-size: 1.1em; }
+
+    .chart-box {
         width: 100%; max-width: 1000px;
         background: #111; padding: 20px; border-radius: 16px; border: 1px solid #222;
         box-shadow: 0 10px 40px rgba(0,0,0,0.5);
-    }}
-    .page-title {{ font-size: 2rem; margin-bottom: 30px; font-weight: bold; color: #fff; text-align: center; }}
-    img {{ width: 100%; height: auto; border-radius: 8px; display: block; }}
+    }
+    .page-title { font-size: 2rem; margin-bottom: 30px; font-weight: bold; color: #fff; text-align: center; }
+    img { width: 100%; height: auto; border-radius: 8px; display: block; }
 
 /* === 修复长列表页黑屏/显示不全的核心代码 === */
-    .section.scrollable {{
+    .section.scrollable {
     /* 仍然是一整页 */
     height: 100vh !important;
     min-height: 100vh;
@@ -247,51 +205,261 @@ html = f"""
     padding-top: 80px;
     padding-bottom: 120px;
     background: var(--bg);
-    }}
-        .detail-card {{ 
+    }
+        .detail-card { 
         background: #161616; border: 1px solid #222; padding: 25px; 
         border-radius: 16px; margin: 0 auto 40px; max-width: 900px; 
-    }}
-    .d-header {{ display: flex; align-items: center; border-bottom: 1px solid #333; padding-bottom: 15px; margin-bottom: 20px; }}
-    .d-rank {{ background: #333; padding: 4px 10px; border-radius: 6px; margin-right: 15px; font-weight: bold; }}
-    .d-name {{ font-weight: bold; font-size: 1.4rem; flex: 1; color: #fff; }}
-    .d-count {{ color: var(--accent-blue); font-weight: bold; font-size: 1.2rem; }}
+    }
+    .d-header { display: flex; align-items: center; border-bottom: 1px solid #333; padding-bottom: 15px; margin-bottom: 20px; }
+    .d-rank { background: #333; padding: 4px 10px; border-radius: 6px; margin-right: 15px; font-weight: bold; }
+    .d-name { font-weight: bold; font-size: 1.4rem; flex: 1; color: #fff; }
+    .d-count { color: var(--accent-blue); font-weight: bold; font-size: 1.2rem; }
+    .d-stats { color: #888; font-size: 0.95rem; margin: -8px 0 20px; line-height: 1.8; }
+    .d-stats b { color: #fff; }
+    .media-grid { display: flex; justify-content: center; gap: 20px; flex-wrap: wrap; max-width: 1000px; }
+    .media-tile { background: #161616; border: 1px solid #222; border-radius: 16px; padding: 20px 25px; min-width: 140px; }
+    .media-tile .col-num { font-size: 2.5rem; margin: 10px 0; }
+    .emoji-grid { display: flex; justify-content: center; gap: 12px; flex-wrap: wrap; max-width: 900px; margin-top: 50px; }
+    .emoji-chip { background: #111; border: 1px solid #222; border-radius: 20px; padding: 6px 14px; color: #ccc; }
+    .emoji-chip b { color: #fff; margin-left: 6px; }
+    .preview-banner {
+        position: fixed; top: 0; left: 0; right: 0; z-index: 100; padding: 8px 16px; text-align: center;
+        background: rgba(255,215,0,0.92); color: #111; font-size: 0.95rem; font-weight: bold;
+    }
+    /* 未实例化的卡片先占位，避免滚动条跳动 */
+    .lazy-card:not(.hydrated) .d-body { min-height: 900px; }
     
-    .viz-label {{ color: #666; font-size: 0.9rem; margin-bottom: 8px; text-align: center; }}
-    .viz-row-full {{ margin-bottom: 25px; background: #0b0b0b; padding: 15px; border-radius: 10px; }}
-    .viz-row-split {{ display: flex; gap: 20px; }}
-    .viz-half {{ flex: 1; background: #0b0b0b; padding: 15px; border-radius: 10px; }}
+    .viz-label { color: #666; font-size: 0.9rem; margin-bottom: 8px; text-align: center; }
+    .viz-row-full { margin-bottom: 25px; background: #0b0b0b; padding: 15px; border-radius: 10px; }
+    .viz-row-split { display: flex; gap: 20px; }
+    .viz-half { flex: 1; background: #0b0b0b; padding: 15px; border-radius: 10px; }
 
-    .arrow {{ position: absolute; bottom: 30px; left: 50%; transform: translateX(-50%); font-size: 1.5rem; color: #444; animation: float 2s infinite; }}
-    @keyframes float {{ 0%,100%{{transform:translate(-50%,0)}} 50%{{transform:translate(-50%,10px)}} }}
+    .arrow { position: absolute; bottom: 30px; left: 50%; transform: translateX(-50%); font-size: 1.5rem; color: #444; animation: float 2s infinite; }
+    @keyframes float { 0%,100%{transform:translate(-50%,0)} 50%{transform:translate(-50%,10px)} }
 
     /* GitHub 按钮和免责声明 */
-    .github-btn {{
+    .github-btn {
         display: inline-block; margin: 40px 0; padding: 15px 30px;
         background: #222; border: 1px solid #444; color: #fff;
         text-decoration: none; border-radius: 30px; font-weight: bold;
         transition: all 0.3s;
-    }}
-    .github-btn:hover {{
+    }
+    .github-btn:hover {
         background: #fff; color: #000;
         transform: translateY(-3px); box-shadow: 0 10px 20px rgba(255,255,255,0.2);
-    }}
-    .disclaimer-box {{
+    }
+    .disclaimer-box {
         font-size: 0.85rem; color: #444; line-height: 1.6; text-align: center; max-width: 600px;
-    }}
+    }
+
+    /* 逐年对比 */
+    .yoy-bars { display: flex; align-items: flex-end; justify-content: center; gap: 24px; height: 260px; margin-bottom: 30px; }
+    .yoy-col { display: flex; flex-direction: column; align-items: center; width: 90px; height: 100%; justify-content: flex-end; }
+    .yoy-bar { width: 48px; border-radius: 8px 8px 0 0; background: #333; min-height: 4px; }
+    .yoy-col.current .yoy-bar { background: linear-gradient(to top, var(--accent-blue), var(--accent-purple)); }
+    .yoy-year { margin-top: 10px; font-weight: bold; color: #fff; }
+    .yoy-col .stat-desc { margin-top: 4px; font-size: 0.9rem; }
+    .yoy-up { color: var(--accent-green); }
+    .yoy-down { color: var(--accent-red); }
+    .yoy-table-wrap { max-width: 1000px; width: 100%; overflow-x: auto; }
+    .yoy-table { border-collapse: collapse; margin: 0 auto; font-size: 0.95rem; }
+    .yoy-table th, .yoy-table td { padding: 8px 16px; border-bottom: 1px solid #222; text-align: center; white-space: nowrap; }
+    .yoy-table th { color: #888; font-weight: normal; text-align: right; }
+    .yoy-table td.current { color: var(--accent-blue); font-weight: bold; }
+
+    /* 关键词搜索 */
+    .kw-box { width: 100%; max-width: 800px; text-align: center; }
+    .kw-input {
+        width: 100%; max-width: 500px; padding: 14px 22px; border-radius: 30px;
+        border: 1px solid #333; background: #111; color: #fff; font-size: 1.2rem; text-align: center;
+    }
+    .kw-input:focus { outline: none; border-color: var(--accent-blue); }
+    .kw-result { min-height: 3em; margin: 24px 0 16px; line-height: 1.6; }
+    .kw-curve { width: 100%; height: 200px; }
+    .kw-curve rect { fill: var(--accent-blue); opacity: 0.85; }
+    .kw-months { display: flex; justify-content: space-between; color: #555; font-size: 0.8rem; margin-top: 6px; }
+    .kw-suggest { margin-top: 24px; display: flex; flex-wrap: wrap; justify-content: center; gap: 10px; }
+    .kw-chip { padding: 6px 14px; border-radius: 16px; background: #222; color: #ccc; cursor: pointer; font-size: 0.9rem; }
+    .kw-chip:hover { background: #fff; color: #000; }
+
+"""
+
+REPORT_SCRIPT = """
+    const observer = new IntersectionObserver((entries) => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                entry.target.classList.add('active');
+            }
+        });
+    }, { threshold: 0.5 });
 
-</style>
+    document.querySelectorAll('.section').forEach(section => {
+        observer.observe(section);
+    });
+
+    // === 深度画像按需实例化 ===
+    // 接近视口（上下约 1.5 屏）时从 <template> 克隆出卡片内容；
+    // 远离视口（约 4 屏之外）时释放 DOM，并锁定高度保证滚动位置不变
+    const deepDive = document.querySelector('.section.scrollable');
+    if (deepDive) {
+        const hydrate = (card) => {
+            if (card.classList.contains('hydrated')) return;
+            const body = card.querySelector('.d-body');
+            body.appendChild(card.querySelector('template').content.cloneNode(true));
+            body.style.minHeight = '';
+            card.classList.add('hydrated');
+        };
+        const release = (card) => {
+            if (!card.classList.contains('hydrated')) return;
+            const body = card.querySelector('.d-body');
+            body.style.minHeight = body.offsetHeight + 'px';
+            body.replaceChildren();
+            card.classList.remove('hydrated');
+        };
+
+        const nearObserver = new IntersectionObserver((entries) => {
+            entries.forEach(entry => {
+                if (entry.isIntersecting) hydrate(entry.target);
+            });
+        }, { root: deepDive, rootMargin: '150% 0px' });
+
+        const farObserver = new IntersectionObserver((entries) => {
+            entries.forEach(entry => {
+                if (!entry.isIntersecting) release(entry.target);
+            });
+        }, { root: deepDive, rootMargin: '400% 0px' });
+
+        deepDive.querySelectorAll('.lazy-card').forEach(card => {
+            nearObserver.observe(card);
+            farObserver.observe(card);
+        });
+    }
+
+    // === 关键词搜索 ===
+    // 倒排索引以差分整数数组嵌在页面里，第一次搜索时才解析
+    const kwInput = document.querySelector('.kw-input');
+    if (kwInput) {
+        const box = kwInput.closest('.kw-box');
+        const result = box.querySelector('.kw-result');
+        const curve = box.querySelector('.kw-curve');
+        const suggest = box.querySelector('.kw-suggest');
+        let kwIndex = null;
+        const loadIndex = () => kwIndex || (kwIndex = JSON.parse(document.getElementById('kw-index').textContent));
+        const undelta = (arr) => { let acc = 0; return arr.map(d => acc += d); };
+
+        // 按周汇总成柱状曲线
+        const drawCurve = (days, counts, yearDays) => {
+            const weeks = new Array(Math.ceil(yearDays / 7)).fill(0);
+            days.forEach((d, i) => { weeks[Math.floor(d / 7)] += counts[i]; });
+            const peak = Math.max(...weeks, 1);
+            const w = 730 / weeks.length;
+            curve.innerHTML = weeks.map((v, i) => {
+                const h = v / peak * 195;
+                return `<rect x="${(i * w).toFixed(1)}" y="${(200 - h).toFixed(1)}" width="${Math.max(w - 2, 1).toFixed(1)}" height="${h.toFixed(1)}" rx="2"></rect>`;
+            }).join('');
+        };
+
+        const search = (q) => {
+            const index = loadIndex();
+            const entry = q ? index.words[q] : null;
+            curve.innerHTML = '';
+            if (!q) {
+                result.textContent = '试试这些今年的高频词：';
+            } else if (entry) {
+                const [total, dayDeltas, dayCounts, contactDeltas, contactCounts] = entry;
+                const days = undelta(dayDeltas);
+                const top = undelta(contactDeltas).map((c, i) => [index.contacts[c], contactCounts[i]])
+                    .sort((a, b) => b[1] - a[1]).slice(0, 5);
+                result.textContent = `「${q}」今年出现 ${total.toLocaleString()} 次，分布在 ${days.length} 天；` +
+                    `说得最多的聊天：${top.map(([name, n]) => `${name}（${n}）`).join('、')}`;
+                drawCurve(days, dayCounts, index.days);
+            } else {
+                result.textContent = `没有找到「${q}」（只收录全年出现 ≥${index.min_count} 次的关键词）`;
+            }
+
+            // 包含输入内容的其他关键词，按次数排序
+            suggest.replaceChildren();
+            Object.keys(index.words).filter(w => w !== q && w.includes(q))
+                .sort((a, b) => index.words[b][0] - index.words[a][0]).slice(0, 10)
+                .forEach(w => {
+                    const chip = document.createElement('span');
+                    chip.className = 'kw-chip';
+                    chip.textContent = w;
+                    chip.onclick = () => { kwInput.value = w; search(w); };
+                    suggest.appendChild(chip);
+                });
+        };
+        kwInput.addEventListener('input', () => search(kwInput.value.trim()));
+        kwInput.addEventListener('focus', () => { if (!kwInput.value) search(''); }, { once: true });
+    }
+"""
+
+def report_year(metrics):
+    """报告年份：新数据写在 metrics["year"]，旧数据从起始日期推断"""
+    if metrics.get("year"): return int(metrics["year"])
+    try:
+        return int(str(metrics.get("start", ""))[:4])
+    except ValueError:
+        return 2025
+
+def render_head(year, extra_css=""):
+    return f"""
+<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>{year} 微信年度报告</title>
+<style>{REPORT_CSS}{extra_css}</style>
 </head>
 <body>
 
 <div class="snap-container">
+"""
+
+def iter_summary_sections(metrics, charts, global_charts, img_tag):
+    """总览部分，每次产出一页 section"""
+    year = report_year(metrics)
+    start_date = metrics.get("start", f"{year}.01.01")
+    end_date = metrics.get("end", f"{year}.12.31")
+
+    # 基础数据
+    total_msgs = metrics.get("total", 0)
+    days_span = 366 if calendar.isleap(year) else 365
+    daily_avg = int(total_msgs / days_span) if days_span > 0 else 0
+
+    total_chars = metrics.get("chars", metrics.get("chars_total", 0))
+    chars_sent = metrics.get("chars_sent", int(total_chars * 0.5))
+    chars_recv = metrics.get("chars_recv", int(total_chars * 0.5))
+
+    # 日期格式化 (1月16日)
+    raw_day = metrics.get("craziest_day", "N/A")
+    try:
+        if "-" in raw_day:
+            parts = raw_day.split("-")
+            craziest_day = f"{int(parts[-2])}月{int(parts[-1])}日"
+        else:
+            craziest_day = raw_day
+    except:
+        craziest_day = raw_day
+
+    craziest_count = metrics.get("craziest_count", 0)
+    top_contact_name = metrics.get("top_contact_name", "N/A")
+    top_contact_count = metrics.get("top_contact_count", 0)
+
+    # 书本换算
+    books_written = chars_sent / 253000
+    books_read = chars_recv / 200000
 
+    yield f"""
     <section class="section">
-        <div class="intro-title anim-scale">2025<br>微信年度报告</div>
+        <div class="intro-title anim-scale">{year}<br>微信年度报告</div>
         <div class="stat-desc anim-fade" style="transition-delay:0.2s">{start_date} - {end_date}</div>
         <div class="arrow">﹀</div>
     </section>
+"""
 
+    yield f"""
     <section class="section">
         <div class="floating-stat c-blue anim-scale">
             <div class="stat-label">年度总消息</div>
@@ -300,16 +468,20 @@ html = f"""
         </div>
         <div class="arrow">﹀</div>
     </section>
+"""
 
+    yield f"""
     <section class="section">
         <div class="floating-stat c-green anim-scale">
             <div class="stat-label">平均每天发送</div>
-            <div class="stat-val">{metrics["daily_avg"]:,}<span class="unit">条</span></div>
+            <div class="stat-val">{daily_avg:,}<span class="unit">条</span></div>
             <div class="stat-desc">这就是你生活的节奏</div>
         </div>
         <div class="arrow">﹀</div>
     </section>
+"""
 
+    yield f"""
     <section class="section">
         <div class="page-title anim-fade" style="margin-bottom: 60px;">文字产出量</div>
         <div class="text-split-container">
@@ -327,7 +499,9 @@ html = f"""
         </div>
         <div class="arrow">﹀</div>
     </section>
+"""
 
+    yield f"""
     <section class="section">
         <div class="floating-stat c-fire anim-scale">
             <div class="stat-label">🔥 消息最爆炸的一天</div>
@@ -337,7 +511,9 @@ html = f"""
         </div>
         <div class="arrow">﹀</div>
     </section>
+"""
 
+    yield f"""
     <section class="section">
         <div class="floating-stat c-gold anim-scale">
             <div class="stat-label">❤️ 年度最亲密</div>
@@ -346,47 +522,296 @@ html = f"""
         </div>
         <div class="arrow">﹀</div>
     </section>
+"""
 
+    yield f"""
     <section class="section">
         <div class="page-title anim-fade">全年活跃热力图</div>
         <div class="chart-box anim-scale" style="transition-delay:0.1s">
-            <img src="data:image/png;base64,{charts.get("heatmap","")}">
+            {img_tag(charts.get("heatmap"))}
         </div>
         <div class="arrow">﹀</div>
     </section>
+"""
 
+    yield f"""
     <section class="section">
         <div class="page-title anim-fade">你的作息规律</div>
         <div class="chart-box anim-scale" style="transition-delay:0.1s">
-            <img src="data:image/png;base64,{global_charts.get("my_hourly","")}">
+            {img_tag(global_charts.get("my_hourly"))}
         </div>
         <div class="arrow">﹀</div>
     </section>
+"""
 
+    yield f"""
     <section class="section">
         <div class="page-title anim-fade">你的年度关键词</div>
         <div class="chart-box anim-scale" style="transition-delay:0.1s">
-            <img src="data:image/png;base64,{global_charts.get("my_wordcloud","")}">
+            {img_tag(global_charts.get("my_wordcloud"))}
         </div>
         <div class="arrow">﹀</div>
     </section>
+"""
 
+    yield f"""
     <section class="section">
         <div class="page-title anim-fade">Top 10 好友排行</div>
         <div class="chart-box anim-scale" style="transition-delay:0.1s">
-            <img src="data:image/png;base64,{charts.get("rank_p","")}">
+            {img_tag(charts.get("rank_p"))}
         </div>
         <div class="arrow">﹀</div>
     </section>
+"""
 
+    yield f"""
     <section class="section">
         <div class="page-title anim-fade">Top 10 群聊排行</div>
         <div class="chart-box anim-scale" style="transition-delay:0.1s">
-            <img src="data:image/png;base64,{charts.get("rank_g","")}">
+            {img_tag(charts.get("rank_g"))}
         </div>
         <div class="arrow">﹀</div>
     </section>
+"""
 
+def iter_year_over_year(years, current):
+    """逐年对比页：数据里有两个及以上年份时才出现"""
+    if len(years) < 2: return
+    peak = max(y["total"] for y in years) or 1
+
+    cols = []
+    prev = None
+    for y in years:
+        delta = ""
+        if prev and prev["total"]:
+            change = y["total"] / prev["total"] - 1
+            delta = f'<span class="{"yoy-up" if change >= 0 else "yoy-down"}">{change:+.0%}</span>'
+        cols.append(f"""
+            <div class="yoy-col{' current' if y['year'] == current else ''}">
+                <div class="yoy-bar" style="height:{y['total'] / peak * 100:.1f}%"></div>
+                <div class="yoy-year">{y['year']}</div>
+                <div class="stat-desc">{y['total']:,} 条 {delta}</div>
+            </div>""")
+        prev = y
+
+    def who(pair):
+        return f"{html.escape(pair[0])}（{pair[1]:,}）" if pair else "—"
+
+    rows = [
+        ("消息总数", lambda y: f"{y['total']:,}"),
+        ("我发出的消息", lambda y: f"{y['sent']:,}"),
+        ("我写下的字", lambda y: f"{y['chars_sent']:,}"),
+        ("活跃天数", lambda y: f"{y['active_days']}"),
+        ("聊过的好友", lambda y: f"{y['friends']}"),
+        ("聊过的群", lambda y: f"{y['groups']}"),
+        ("最常聊的人", lambda y: who(y["top_contact"])),
+        ("最热闹的群", lambda y: who(y["top_group"])),
+        ("最活跃时段", lambda y: f"{y['busiest_hour']}:00" if y["busiest_hour"] is not None else "—"),
+        ("年度关键词", lambda y: " · ".join(html.escape(w) for w in y["top_words"][:3]) or "—"),
+    ]
+    header = "".join(f'<td class="{"current" if y["year"] == current else ""}">{y["year"]}</td>' for y in years)
+    body = "".join(
+        f"<tr><th>{label}</th>" + "".join(
+            f'<td class="{"current" if y["year"] == current else ""}">{fmt(y)}</td>' for y in years) + "</tr>"
+        for label, fmt in rows)
+
+    yield f"""
+    <section class="section">
+        <div class="page-title anim-fade">📅 逐年对比</div>
+        <div class="yoy-bars anim-scale">{"".join(cols)}
+        </div>
+        <div class="yoy-table-wrap anim-fade" style="transition-delay:0.2s">
+            <table class="yoy-table"><tr><th></th>{header}</tr>{body}</table>
+        </div>
+        <div class="arrow">﹀</div>
+    </section>
+"""
+
+def fmt_duration(seconds):
+    """回复时间的中位数 → 「45 秒」「3 分钟」「1.5 小时」"""
+    if seconds is None: return "—"
+    if seconds < 60: return f"{seconds:.0f} 秒"
+    if seconds < 3600: return f"{seconds / 60:.0f} 分钟"
+    return f"{seconds / 3600:.1f} 小时"
+
+def iter_conversation(conv):
+    """聊天节奏页：回复速度、谁先开口、连续聊天最久的好友（旧数据没有时跳过）"""
+    if not conv or not conv.get("sessions"): return
+    streak = ""
+    if conv.get("longest_streak"):
+        streak = f"""
+        <div class="stat-desc anim-fade" style="transition-delay:0.3s">
+            连续聊天最久的是 <span style="color:#fff; font-weight:bold;">{html.escape(conv["longest_streak_name"])}</span>：
+            从 {conv["longest_streak_start"]} 起连续 <span style="color:#fff; font-weight:bold;">{conv["longest_streak"]}</span> 天
+        </div>"""
+    started = conv.get("started_by_me_pct")
+    yield f"""
+    <section class="section">
+        <div class="page-title anim-fade" style="margin-bottom: 60px;">💬 聊天节奏</div>
+        <div class="text-split-container">
+            <div class="text-col right anim-fade" style="transition-delay: 0s;">
+                <div class="col-label">⚡ 我回复别人</div>
+                <div class="col-num" style="color:var(--accent-purple)">{fmt_duration(conv.get("my_reply_median"))}</div>
+                <div class="col-desc">回复时间的中位数</div>
+            </div>
+            <div class="divider-line anim-scale"></div>
+            <div class="text-col anim-fade" style="transition-delay: 0.1s;">
+                <div class="col-label">⏳ 别人回复我</div>
+                <div class="col-num" style="color:var(--accent-blue)">{fmt_duration(conv.get("their_reply_median"))}</div>
+                <div class="col-desc">回复时间的中位数</div>
+            </div>
+        </div>
+        <div class="stat-desc anim-fade" style="margin-top:60px; transition-delay:0.2s">
+            一年里的 <span style="color:#fff; font-weight:bold;">{conv["sessions"]:,}</span> 段单聊对话中，
+            <span style="color:#fff; font-weight:bold;">{started if started is not None else 0:.0f}%</span> 是你先开的口
+        </div>{streak}
+        <div class="arrow">﹀</div>
+    </section>
+"""
+
+# 非文本消息类型 → (图标, 名称)
+MEDIA_LABELS = {
+    "image": ("🖼️", "图片"), "voice": ("🎙️", "语音"), "video": ("🎬", "视频"),
+    "sticker": ("😺", "表情包"), "link": ("🔗", "链接 / 文件"),
+}
+
+def iter_media(media):
+    """不止文字页：各类非文本消息条数与最常用的表情（旧数据没有时跳过）"""
+    if not media or not (sum(media["types"].values()) or media.get("emoji_total")): return
+    tiles = "".join(f"""
+            <div class="media-tile anim-fade" style="transition-delay: {i * 0.1:.1f}s;">
+                <div class="col-label">{MEDIA_LABELS[kind][0]} {MEDIA_LABELS[kind][1]}</div>
+                <div class="col-num" style="color:var(--accent-blue)">{n:,}</div>
+                <div class="col-desc">我发出 {media["sent"].get(kind, 0):,}</div>
+            </div>""" for i, (kind, n) in enumerate(media["types"].items()) if kind in MEDIA_LABELS)
+    chips = "".join(f'<span class="emoji-chip">{html.escape(e)}<b>{n:,}</b></span>' for e, n in media["top_emoji"])
+    emoji = ""
+    if chips:
+        emoji = f"""
+        <div class="stat-desc anim-fade" style="margin-top:60px; transition-delay:0.5s">
+            文字里一共用了 <span style="color:#fff; font-weight:bold;">{media["emoji_total"]:,}</span> 个表情，最常用的是：
+        </div>
+        <div class="emoji-grid anim-fade" style="transition-delay:0.6s">{chips}</div>"""
+    yield f"""
+    <section class="section">
+        <div class="page-title anim-fade" style="margin-bottom: 60px;">📎 不止文字</div>
+        <div class="media-grid">{tiles}
+        </div>{emoji}
+        <div class="arrow">﹀</div>
+    </section>
+"""
+
+def render_preview_banner(info):
+    """预览模式的提示条：词云与关键词来自抽样"""
+    return f"""
+    <div class="preview-banner">⚡ 预览版：词云与关键词只基于约 {info["sample_pct"]:g}% 的抽样消息，
+        关键词次数为按比例放大的估计值；其余统计与图表均为全量数据</div>
+"""
+
+def render_profile_stats(p):
+    """画像卡片头部的一行指标：群成员情况、会话指标、非文本消息与常用表情"""
+    parts = []
+    group = p.get("members")
+    if group:
+        parts.append(f"👥 活跃成员 <b>{group['active']:,}</b> 人")
+        parts.append(f"我的发言占 <b>{group['my_share_pct']:.1f}%</b>")
+    conv = p.get("conversation")
+    if conv:
+        parts.append(f"💬 <b>{conv['sessions']:,}</b> 段对话")
+        if conv.get("started_by_me_pct") is not None:
+            parts.append(f"我先开口 <b>{conv['started_by_me_pct']:.0f}%</b>")
+        parts.append(f"我回复 <b>{fmt_duration(conv.get('my_reply_median'))}</b>")
+        parts.append(f"对方回复 <b>{fmt_duration(conv.get('their_reply_median'))}</b>")
+        if conv.get("longest_streak"):
+            parts.append(f"最长连聊 <b>{conv['longest_streak']}</b> 天")
+    media = p.get("media")
+    if media:
+        parts.extend(f"{MEDIA_LABELS[kind][0]} <b>{n:,}</b>" for kind, n in media["types"].items()
+                     if n and kind in MEDIA_LABELS)
+        if media["top_emoji"]:
+            parts.append("常用表情 " + " ".join(f"<b>{html.escape(e)}</b>" for e, _ in media["top_emoji"][:3]))
+    return f'<div class="d-stats">{" · ".join(parts)}</div>' if parts else ""
+
+def iter_keyword_search(index_json):
+    """关键词搜索页：索引原样嵌入页面，由页面脚本在浏览器里查询"""
+    if not index_json: return
+    months = "".join(f"<span>{m}月</span>" for m in range(1, 13))
+    data = index_json.replace("</", "<\\/")  # 防止词里的 </script> 提前结束脚本块
+    yield f"""
+    <section class="section">
+        <div class="page-title anim-fade">🔎 今年说过多少次？</div>
+        <div class="kw-box anim-fade" style="transition-delay:0.1s">
+            <input class="kw-input" placeholder="输入一个关键词，比如「吃饭」" autocomplete="off">
+            <div class="kw-result stat-desc">输入关键词，看看它在这一年里出现了多少次、都在什么时候</div>
+            <svg class="kw-curve" viewBox="0 0 730 200" preserveAspectRatio="none"></svg>
+            <div class="kw-months">{months}</div>
+            <div class="kw-suggest"></div>
+        </div>
+        <script type="application/json" id="kw-index">{data}</script>
+        <div class="arrow">﹀</div>
+    </section>
+"""
+
+def render_profile_card(p, img_tag):
+    wc_img = img_tag(p.get("wordcloud"))
+
+    # 群聊 Top10 发言人图表
+    member_bar_html = ""
+    if p.get("member_bar"):
+        member_bar_html = f"""
+            <div class="viz-row-full">
+                <div class="viz-label">🏆 群内话痨排行榜 (Top 10)</div>
+                {img_tag(p["member_bar"])}
+            </div>
+            """
+
+    # 卡片主体放进 <template>，由页面脚本在接近视口时才实例化，远离后再释放
+    return f"""
+        <div class="detail-card lazy-card">
+            <div class="d-header">
+                <span class="d-rank">#{p["rank"]}</span>
+                <span class="d-name">{html.escape(p["name"])}</span>
+                <span class="d-count">{p["count"]:,} 条</span>
+            </div>
+            {render_profile_stats(p)}
+            <div class="d-body"></div>
+            <template>
+            <div class="viz-row-full">
+                <div class="viz-label">收发对比</div>
+                {img_tag(p["compare"])}
+            </div>
+
+            {member_bar_html}
+
+            <div class="viz-row-full">
+                <div class="viz-label">全年活跃热力图</div>
+                {img_tag(p["heatmap"])}
+            </div>
+
+            <div class="viz-row-split">
+                <div class="viz-half">
+                    <div class="viz-label">24小时作息</div>
+                    {img_tag(p["hourly"])}
+                </div>
+                <div class="viz-half">
+                    <div class="viz-label">专属关键词</div>
+                    {wc_img}
+                </div>
+            </div>
+            </template>
+        </div>
+        """
+
+def iter_profile_list(profile_list, img_tag):
+    if not profile_list:
+        yield "<p style='text-align:center; color:#666'>无数据</p>"
+        return
+    for p in profile_list:
+        yield render_profile_card(p, img_tag)
+
+def iter_deep_dive(p_profiles, g_profiles, img_tag):
+    """深度画像页：逐张卡片产出，避免把所有卡片拼成一个大字符串"""
+    yield """
     <section class="section scrollable">
         <div style="text-align:center; margin-bottom:40px;">
             <div class="page-title anim-fade">📋 深度分析报告</div>
@@ -395,14 +820,19 @@ html = f"""
 
         <div class="anim-fade" style="transition-delay:0.2s">
             <h3 style="text-align:center; color:var(--accent-blue)">👤 好友详情</h3>
-            {render_profile_list(p_profiles)}
-            
+"""
+    yield from iter_profile_list(p_profiles, img_tag)
+    yield """
             <h3 style="text-align:center; color:var(--accent-green); margin-top:80px;">👥 群聊详情</h3>
-            {render_profile_list(g_profiles)}
+"""
+    yield from iter_profile_list(g_profiles, img_tag)
+    yield """
         </div>
         <div class="arrow">﹀</div>
     </section>
+"""
 
+ABOUT_SECTION = """
 <section class="section">
     <div class="intro-title" style="font-size: 3rem;">关于本项目</div>
 
@@ -432,30 +862,99 @@ html = f"""
         </p>
     </div>
 </section>
+"""
 
+def render_tail():
+    return f"""
 </div>
 
-<script>
-    const observer = new IntersectionObserver((entries) => {{
-        entries.forEach(entry => {{
-            if (entry.isIntersecting) {{
-                entry.target.classList.add('active');
-            }}
-        }});
-    }}, {{ threshold: 0.5 }});
-
-    document.querySelectorAll('.section').forEach(section => {{
-        observer.observe(section);
-    }});
-</script>
+<script>{REPORT_SCRIPT}</script>
 
 </body>
 </html>
 """
-with open("Final_Report.html", "w", encoding="utf-8") as f:
-    f.write(html)
 
-print(f"✅ Step 2 完成！")
-print(f"报告已生成：Final_Report.html")
-# 打开报告
-os.startfile("Final_Report.html")
\ No newline at end of file
+# ===================== 3. 渲染入口 =====================
+
+def iter_report(manifest, img_tag, read_text=None):
+    """read_text(ref) 读取容器里的 JSON 原文（关键词索引），不给就不生成搜索页"""
+    metrics = manifest.get("metrics", {})
+    charts = manifest.get("charts", {})
+    global_charts = manifest.get("global_charts", {})
+    p_profiles = manifest.get("private_profiles", [])
+    g_profiles = manifest.get("group_profiles", [])
+
+    year = report_year(metrics)
+    yield render_head(year)
+    if manifest.get("preview"): yield render_preview_banner(manifest["preview"])
+    yield from iter_summary_sections(metrics, charts, global_charts, img_tag)
+    yield from iter_conversation(metrics.get("conversation"))
+    yield from iter_media(metrics.get("media"))
+    yield from iter_year_over_year(manifest.get("years", []), year)
+    if read_text: yield from iter_keyword_search(read_text(manifest.get("keyword_index")))
+    yield from iter_deep_dive(p_profiles, g_profiles, img_tag)
+    yield ABOUT_SECTION
+    yield render_tail()
+
+def render_report(data, out_stream, asset_mode="inline", asset_dir="assets", asset_url="assets"):
+    """把报告逐段写入 out_stream（任意带 write() 的文本流），内存只占用当前这一段。
+
+    data 为 report_store 的读取器（manifest + 按需读图），也可以直接传旧版 dict。
+    返回 ImageSink，可从中得到本次写出的图片。
+    """
+    if isinstance(data, dict): data = InlineReport(data)
+    images = ImageSink(data, asset_mode, asset_dir, asset_url)
+    for chunk in iter_report(data.manifest, images.img_tag, data.text):
+        out_stream.write(chunk)
+    return images
+
+def write_report(data, output_path, asset_mode="inline"):
+    """渲染到文件：先写临时文件再原子替换，外置图片放在报告同级的 assets/ 目录"""
+    out_dir = os.path.dirname(os.path.abspath(output_path))
+    asset_dir = os.path.join(out_dir, RENDER_CONFIG["ASSET_DIR"])
+    tmp = output_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        images = render_report(data, f, asset_mode, asset_dir, RENDER_CONFIG["ASSET_DIR"])
+    os.replace(tmp, output_path)
+    images.prune()
+    return images
+
+def open_in_browser(path):
+    if hasattr(os, "startfile"):
+        os.startfile(path)
+    else:
+        webbrowser.open(Path(path).resolve().as_uri())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把 report_data.zip 渲染成 Final_Report.html")
+    parser.add_argument("--data", default=RENDER_CONFIG["DATA_PATH"])
+    parser.add_argument("--output", default=RENDER_CONFIG["OUTPUT_PATH"])
+    parser.add_argument("--assets", action="store_true", help="图片输出到 assets/ 并懒加载，而不是内嵌")
+    parser.add_argument("--no-open", action="store_true", help="生成后不自动打开浏览器")
+    args = parser.parse_args(argv)
+
+    print(f"正在读取 {args.data} ...")
+    try:
+        report = open_report(args.data)
+    except FileNotFoundError:
+        print("❌ 没找到数据！请先运行 step1_analyze.py")
+        return 1
+
+    asset_mode = "external" if args.assets else RENDER_CONFIG["ASSET_MODE"]
+    try:
+        images = write_report(report, args.output, asset_mode)
+    finally:
+        report.close()
+
+    if asset_mode == "external":
+        print(f"🖼️ 图片已输出到 {RENDER_CONFIG['ASSET_DIR']}/ ({len(images.written)} 张，已去重)")
+
+    print(f"✅ Step 2 完成！")
+    print(f"报告已生成：{args.output}")
+    # 打开报告
+    if not args.no_open:
+        open_in_browser(args.output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# ===================== 合成聊天记录 =====================
+# 按 MemoTrace 导出的 messages.csv 列结构生成可复现的假数据，用于基准测试与调试：
+#   * 联系人 / 群聊的消息量服从 Zipf 分布（少数人占大多数消息）
+#   * 群成员发言量同样是长尾；群名有的带"群"字，有的只能靠发言人数识别
+#   * 消息按"会话"成串出现：晚间高峰、周末更活跃、会话内间隔几秒到几分钟
+#   * 文本由常见聊天短语拼成，夹带 [微笑] 之类的表情码和 emoji；混有图片/语音/表情包/链接等非文本消息
+# 同样的 (rows, seed, years) 一定生成逐字节相同的文件。
+
+COLUMNS = ["localId", "TalkerId", "Type", "SubType", "IsSender", "CreateTime", "Status",
+           "StrContent", "StrTime", "Remark", "NickName", "Sender"]
+
+PHRASES = (
+    "哈哈哈 哈哈 好的 好滴 收到 嗯嗯 对 是的 没问题 可以 行 OK 谢谢 辛苦了 晚安 早上好 "
+    "在吗 在干嘛 吃饭了吗 吃了 还没吃 一起吃饭吧 今天好累 明天见 周末有空吗 去图书馆 "
+    "开会 开完会了 论文还没写完 代码跑通了 又报错了 老师说 作业交了吗 考试加油 复习得怎么样 "
+    "火锅 奶茶 烧烤 外卖到了 点个外卖 楼下新开了一家店 排队好久 好吃 太贵了 "
+    "看电影 看完了 剧透警告 这部剧 打游戏 上分 开黑 等我一下 马上到 堵车了 地铁上 "
+    "下雨了 带伞 好冷 好热 空调 快递到了 帮我拿一下 周五 下周一 deadline 项目 需求 "
+    "面试 实习 offer 简历 投了 通过了 挂了 没消息 申请 学校 签证 机票 酒店 旅游 "
+    "生日快乐 新年快乐 恭喜 太强了 厉害 笑死 离谱 真的假的 我也是 确实 有道理 "
+    "你说呢 怎么办 算了 随便 都行 听你的 我觉得 不太行 再看看 等会说 先这样"
+).split()
+
+BRACKET_EMOJI = ["[微笑]", "[捂脸]", "[呲牙]", "[破涕为笑]", "[旺柴]", "[OK]", "[抱拳]", "[强]", "[叹气]", "[裂开]"]
+UNICODE_EMOJI = ["😂", "😀", "👍", "🙏", "😭", "🤣", "❤️", "🎉", "😅", "🥺"]
+
+SURNAMES = list("王李张刘陈杨黄赵吴周徐孙马朱胡郭何林罗高郑梁谢宋唐许韩冯邓曹彭曾萧田董潘袁蔡蒋余于杜叶程苏魏吕丁任沈姚卢")
+GIVEN = list("伟芳娜敏静丽强磊洋艳勇军杰娟涛明超秀霞平刚桂英华玉萍红娥玲芬燕彬鹏辉晨宇轩涵欣怡子然浩博")
+GROUP_STEMS = ["研究生", "实验室", "宿舍", "篮球", "羽毛球", "读书会", "家人", "同学会", "租房", "户外",
+               "摄影", "跑步", "项目组", "课题组", "老乡", "相亲相爱一家人", "周末饭局", "考研互助"]
+GROUP_SUFFIXES = ["群", "交流群", "小分队", "", "", "2025", "Team", "二手"]
+
+# (类型, 权重, 内容)；非文本消息的 StrContent 在 MemoTrace 里是占位文本
+MESSAGE_TYPES = [
+    ("1", 78, None),
+    ("3", 7, "<img/>"),
+    ("34", 4, "<voicemsg/>"),
+    ("43", 1, "<videomsg/>"),
+    ("47", 6, "<emoji/>"),
+    ("49", 3, "<appmsg/>"),
+    ("10000", 1, "你撤回了一条消息"),
+]
+
+# 一天 24 小时的相对活跃度：凌晨低谷、午饭和晚间高峰
+HOUR_WEIGHTS = np.array([3, 2, 1, .5, .3, .3, .8, 2, 4, 5, 6, 7, 8, 6, 5, 5, 6, 7, 8, 9, 10, 10, 8, 5])
+WEEKDAY_WEIGHTS = np.array([1.0, 1.0, 1.0, 1.0, 1.1, 1.3, 1.25])
+
+
+def _zipf_weights(n, s):
+    w = 1.0 / np.arange(1, n + 1) ** s
+    return w / w.sum()
+
+
+def build_contacts(rng, n_friends, n_groups):
+    """生成好友与群聊；群聊各自带一份成员列表"""
+    def person():
+        return SURNAMES[rng.integers(len(SURNAMES))] + "".join(rng.choice(GIVEN, rng.integers(1, 3)))
+
+    # 好友按昵称区分，必须唯一；群成员之间允许重名
+    friends = []
+    while len(friends) < n_friends:
+        name = person()
+        if len(friends) >= 2000: name += str(len(friends))
+        if name not in friends: friends.append(name)
+
+    contacts = [{"name": name, "talker": f"wxid_{rng.integers(10**9, 10**10)}", "group": False} for name in friends]
+    for i in range(n_groups):
+        name = GROUP_STEMS[i % len(GROUP_STEMS)] + GROUP_SUFFIXES[rng.integers(len(GROUP_SUFFIXES))]
+        if i >= len(GROUP_STEMS): name += str(i // len(GROUP_STEMS))
+        size = int(min(500, 3 + rng.pareto(1.2) * 8))
+        contacts.append({"name": name, "talker": f"{rng.integers(10**10, 10**11)}@chatroom", "group": True,
+                         "members": [person() for _ in range(size)]})
+
+    # 消息量：所有会话统一按 Zipf 分配，再打乱顺序（避免排在前面的总是最活跃）
+    order = rng.permutation(len(contacts))
+    weights = np.empty(len(contacts))
+    weights[order] = _zipf_weights(len(contacts), 1.05)
+    return contacts, weights
+
+
+def _day_weights(years):
+    days = pd.date_range(f"{min(years)}-01-01", f"{max(years)}-12-31", freq="D")
+    days = days[days.year.isin(years)]
+    # 周末略高、春节 / 暑假略有起伏
+    season = 1 + 0.25 * np.sin((days.dayofyear.values / 365.0) * 2 * np.pi * 2)
+    w = WEEKDAY_WEIGHTS[days.dayofweek.values] * season
+    return days.values.astype("datetime64[s]").astype(np.int64), w / w.sum()
+
+
+def _texts(rng, n):
+    """拼接 1~5 个短语；约 12% 带表情码、8% 带 emoji，偶尔一条长消息"""
+    n_parts = rng.choice([1, 1, 2, 2, 2, 3, 3, 4, 5], n)
+    long_msgs = rng.random(n) < 0.02
+    n_parts[long_msgs] = rng.integers(8, 20, long_msgs.sum())
+    phrase_ids = rng.integers(len(PHRASES), size=int(n_parts.sum()))
+    bracket = np.where(rng.random(n) < 0.12, rng.integers(len(BRACKET_EMOJI), size=n), -1)
+    unicode_ = np.where(rng.random(n) < 0.08, rng.integers(len(UNICODE_EMOJI), size=n), -1)
+
+    out = []
+    pos = 0
+    for k, b, u in zip(n_parts.tolist(), bracket.tolist(), unicode_.tolist()):
+        text = "".join(PHRASES[i] for i in phrase_ids[pos:pos + k])
+        pos += k
+        if b >= 0: text += BRACKET_EMOJI[b]
+        if u >= 0: text += UNICODE_EMOJI[u]
+        out.append(text)
+    return out
+
+
+def _batch(rng, contacts, weights, day_secs, day_w, n):
+    """生成约 n 条消息（按会话成串），返回 DataFrame（未排序）"""
+    mean_len = 6
+    n_sessions = max(1, n // mean_len)
+    sess_contact = rng.choice(len(contacts), n_sessions, p=weights)
+    sess_start = (rng.choice(day_secs, n_sessions, p=day_w)
+                  + rng.choice(24, n_sessions, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum()) * 3600
+                  + rng.integers(3600, size=n_sessions))
+    sess_len = rng.geometric(1 / mean_len, n_sessions)
+    total = int(sess_len.sum())
+
+    contact_idx = np.repeat(sess_contact, sess_len)
+    # 会话内间隔：大多几秒到一分钟，偶尔几分钟
+    gaps = rng.exponential(40, total).astype(np.int64) + 1
+    first = np.cumsum(sess_len) - sess_len
+    elapsed = np.cumsum(gaps)
+    ts = np.repeat(sess_start, sess_len) + elapsed - np.repeat(elapsed[first] - gaps[first], sess_len)
+
+    is_group = np.array([c["group"] for c in contacts])[contact_idx]
+    is_sender = (rng.random(total) < np.where(is_group, 0.12, 0.48)).astype(np.int8)
+
+    type_codes = [t for t, _, _ in MESSAGE_TYPES]
+    type_w = np.array([w for _, w, _ in MESSAGE_TYPES], dtype=float)
+    type_idx = rng.choice(len(MESSAGE_TYPES), total, p=type_w / type_w.sum())
+    is_text = type_idx == 0
+
+    content = np.empty(total, dtype=object)
+    content[is_text] = _texts(rng, int(is_text.sum()))
+    for i, (_, _, placeholder) in enumerate(MESSAGE_TYPES):
+        if placeholder is not None: content[type_idx == i] = placeholder
+
+    # 群消息的发言人：成员内部也是长尾分布
+    sender = np.full(total, "", dtype=object)
+    for ci in np.unique(contact_idx[is_group & (is_sender == 0)]):
+        members = contacts[ci]["members"]
+        rows = np.flatnonzero((contact_idx == ci) & (is_sender == 0))
+        picks = rng.choice(len(members), rows.size, p=_zipf_weights(len(members), 1.1))
+        sender[rows] = np.array(members, dtype=object)[picks]
+
+    names = np.array([c["name"] for c in contacts], dtype=object)
+    talkers = np.array([c["talker"] for c in contacts], dtype=object)
+    return pd.DataFrame({
+        "TalkerId": talkers[contact_idx],
+        "Type": np.array(type_codes, dtype=object)[type_idx],
+        "SubType": 0,
+        "IsSender": is_sender,
+        "CreateTime": ts,
+        "Status": 2,
+        "StrContent": content,
+        "NickName": names[contact_idx],
+        "Sender": sender,
+    })
+
+
+def generate(path, rows, seed=2025, years=(2025,), n_friends=None, n_groups=None, batch_rows=500_000, verbose=True):
+    """流式写出约 rows 条消息到 path（先写临时文件再原子替换），返回实际行数"""
+    rng = np.random.default_rng(seed)
+    years = sorted(set(years))
+    # 联系人数量随规模缓慢增长：10 万条约 250 个好友，1000 万条约 530 个
+    if n_friends is None: n_friends = int(40 * max(rows, 10_000) ** 0.16)
+    if n_groups is None: n_groups = max(8, n_friends // 6)
+    contacts, weights = build_contacts(rng, n_friends, n_groups)
+    day_secs, day_w = _day_weights(years)
+
+    t0 = time.perf_counter()
+    tmp = path + ".tmp"
+    written = 0
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        f.write(",".join(COLUMNS) + "\n")
+        while written < rows:
+            df = _batch(rng, contacts, weights, day_secs, day_w, min(batch_rows, rows - written))
+            df = df.iloc[:rows - written].sort_values("CreateTime", kind="stable")
+            df.insert(0, "localId", np.arange(written + 1, written + len(df) + 1))
+            # MemoTrace 的 StrTime 是北京时间
+            df["StrTime"] = pd.to_datetime(df["CreateTime"], unit="s").dt.strftime("%Y-%m-%d %H:%M:%S")
+            df["CreateTime"] = df["CreateTime"] - 8 * 3600
+            df["Remark"] = ""
+            df[COLUMNS].to_csv(f, header=False, index=False)
+            written += len(df)
+            if verbose: print(f"   已生成 {written:,} / {rows:,} 行 ...", end="\r")
+
+    os.replace(tmp, path)
+    if verbose:
+        print(f"✅ 已生成 {path}: {written:,} 行, {n_friends} 个好友 + {n_groups} 个群, 用时 {time.perf_counter() - t0:.1f}s")
+    return written
+
+
+def parse_rows(text):
+    """支持 100k / 1M / 10M 这样的写法"""
+    text = text.strip().lower().replace("_", "").replace(",", "")
+    units = {"k": 1_000, "m": 1_000_000}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成 MemoTrace 格式的合成 messages.csv")
+    parser.add_argument("--rows", default="100k", help="消息条数，如 100k / 1M / 10M")
+    parser.add_argument("--out", default="messages.csv")
+    parser.add_argument("--seed", type=int, default=2025)
+    parser.add_argument("--years", default="2025", help="年份，逗号分隔，如 2024,2025")
+    args = parser.parse_args()
+    generate(args.out, parse_rows(args.rows), args.seed, [int(y) for y in args.years.split(",")])
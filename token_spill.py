@@ -0,0 +1,88 @@
+import os
+import sqlite3
+from collections import Counter
+
+# ===================== 词频落盘 =====================
+# 内存预算模式下不再保留「每条消息一个词列表」，而是按 (Year, ChatType, NickName, IsSender) 分组累加词频：
+# 内存里攒到上限就合并写入 SQLite，词云需要哪部分消息，就按这几个键把对应分组的词频加起来。
+# 全局 / 我的 / 每个画像的词云都正好是若干分组之和，结果与逐行统计完全一致。
+
+KEY_COLUMNS = ("Year", "ChatType", "NickName", "IsSender")
+
+
+class SpilledTokenCounts:
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self.spills = 0
+        self.total_tokens = 0
+        self._pending = Counter()
+        self._conn = None
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if os.path.exists(path): os.remove(path)
+        self._db().execute("""
+            CREATE TABLE counts (
+                year INTEGER, chat_type TEXT, nick TEXT, is_sender INTEGER, word TEXT, n INTEGER,
+                PRIMARY KEY (year, chat_type, nick, is_sender, word)
+            ) WITHOUT ROWID""")
+
+    def _db(self):
+        if self._conn is None:
+            # 本地报告服务会在不同线程里查询（由服务端加锁串行），不限定创建连接的线程
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=OFF")
+            self._conn.execute("PRAGMA synchronous=OFF")
+        return self._conn
+
+    # ---------- 写入 ----------
+    def add(self, keys, token_lists):
+        """keys 与 token_lists 一一对应；keys 为 KEY_COLUMNS 顺序的元组"""
+        pending = self._pending
+        for (year, chat_type, nick, is_sender), words in zip(keys, token_lists):
+            for w in words:
+                pending[(int(year), chat_type, nick, int(is_sender), w)] += 1
+            self.total_tokens += len(words)
+        if len(pending) > self.max_entries: self.flush()
+
+    def flush(self):
+        if not self._pending: return
+        with self._db() as db:
+            db.executemany(
+                "INSERT INTO counts VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (year, chat_type, nick, is_sender, word) DO UPDATE SET n = n + excluded.n",
+                ((*k, n) for k, n in self._pending.items()))
+        self._pending.clear()
+        self.spills += 1
+
+    # ---------- 读取 ----------
+    def counts(self, sub_df, limit=None):
+        """sub_df 覆盖的所有分组的词频之和；给了 limit 就只取最高频的 limit 个词（在 SQLite 里排序截断）"""
+        self.flush()
+        keys = sub_df[list(KEY_COLUMNS)].drop_duplicates()
+        db = self._db()
+        db.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (year INTEGER, chat_type TEXT, nick TEXT, is_sender INTEGER)")
+        db.execute("DELETE FROM wanted")
+        db.executemany("INSERT INTO wanted VALUES (?, ?, ?, ?)",
+                       ((int(y), c, n, int(s)) for y, c, n, s in keys.itertuples(index=False)))
+        rows = db.execute("""
+            SELECT c.word, SUM(c.n) FROM counts c
+            JOIN wanted w ON c.year = w.year AND c.chat_type = w.chat_type
+                         AND c.nick = w.nick AND c.is_sender = w.is_sender
+            GROUP BY c.word
+            ORDER BY 2 DESC, 1
+            LIMIT ?""", (-1 if limit is None else int(limit),))
+        return Counter(dict(rows))
+
+    def close(self):
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # 流水线会把阶段结果 pickle 下来：只保存路径，词频本身留在 SQLite 里
+    def __getstate__(self):
+        self.flush()
+        state = self.__dict__.copy()
+        state["_conn"] = None
+        return state
@@ -0,0 +1,124 @@
+import argparse
+import os
+import sys
+import time
+import traceback
+
+import step1_analyze as step1
+import step2_render as step2
+from memory_budget import parse_size
+from wechat_analysis import render_html_stage
+
+# ===================== 监视模式 =====================
+# 重新从 MemoTrace 导出后自动更新报告：轮询 messages.csv（或导出目录里的 messages.csv）、自定义词典与语音转写库，
+# 文件停止变化一段时间（防抖，避免读到写了一半的导出）后重跑流水线。
+# 进程常驻：jieba 词典、字体只加载一次；分词按消息文本记忆，只给新增消息分词；
+# 图表与词云按内容寻址缓存，只有数据变了的图才重绘；报告先写临时文件再原子替换。
+
+DEFAULT_INTERVAL = 1.0
+DEFAULT_DEBOUNCE = 2.0
+
+
+def resolve_csv(path):
+    """可以直接给 CSV，也可以给 MemoTrace 的导出目录"""
+    if os.path.isdir(path): return os.path.join(path, "messages.csv")
+    return path
+
+
+def file_state(paths):
+    """(修改时间, 大小)，文件不存在时为 None"""
+    state = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            state.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            state.append(None)
+    return tuple(state)
+
+
+def wait_for_change(paths, last, interval, debounce):
+    """阻塞到文件发生变化、并且连续 debounce 秒不再变化为止，返回新的状态"""
+    while True:
+        time.sleep(interval)
+        state = file_state(paths)
+        if state == last: continue
+
+        print(f"👀 检测到变化，等待写入完成（{debounce:g}s 内无新变化）...")
+        stable_since = time.monotonic()
+        while time.monotonic() - stable_since < debounce:
+            time.sleep(interval)
+            current = file_state(paths)
+            if current != state:
+                state, stable_since = current, time.monotonic()
+        if None not in state: return state
+        last = state  # 文件被删除（导出工具可能先删后写），继续等
+
+
+def rebuild(asset_mode):
+    """跑一遍流水线；出错时保留旧报告，返回是否成功"""
+    step1.reset_run_stats()
+    t0 = time.perf_counter()
+    try:
+        pipe = step1.make_pipeline([render_html_stage(asset_mode)])
+        pipe.run()
+    except (Exception, SystemExit):  # run_ingest 遇到空数据会 sys.exit
+        traceback.print_exc()
+        print("❌ 本次更新失败，保留上一份报告，继续监视")
+        return None
+    print("📈 阶段耗时:")
+    print(step1.TRACER.summary("stage") or "   （所有阶段均已是最新）")
+    print(step1.CHART_CACHE.summary())
+    print(f"✅ 报告已更新（{time.perf_counter() - t0:.1f}s）: {step2.RENDER_CONFIG['OUTPUT_PATH']}")
+    return pipe
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="监视聊天记录导出，变化后自动增量更新年度报告")
+    parser.add_argument("path", nargs="?", default=step1.CONFIG["CSV_PATH"], help="messages.csv 或其所在的导出目录")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="轮询间隔（秒）")
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE, help="文件连续多少秒不变才开始更新")
+    parser.add_argument("--assets", action="store_true", help="图片输出到 assets/ 并懒加载，而不是内嵌")
+    parser.add_argument("--year", type=int, help=f"报告年份（默认 {step1.CONFIG['TARGET_YEAR']}）")
+    parser.add_argument("--memory-budget", type=parse_size, metavar="SIZE",
+                        help="内存上限（此时分词结果落盘，不做按文本记忆）")
+    parser.add_argument("--no-open", action="store_true", help="首次生成后不自动打开浏览器")
+    parser.add_argument("--no-cache", action="store_true", help="不使用图表缓存，全部重绘")
+    args = parser.parse_args(argv)
+    step1.CHART_CACHE.enabled = not args.no_cache
+
+    step1.CONFIG["CSV_PATH"] = resolve_csv(args.path)
+    if args.year: step1.CONFIG["TARGET_YEAR"] = args.year
+    if args.memory_budget: step1.set_memory_budget(args.memory_budget)
+    asset_mode = "external" if args.assets else step2.RENDER_CONFIG["ASSET_MODE"]
+    watched = [step1.CONFIG["CSV_PATH"], step1.CONFIG["USER_DICT"]]
+    if step1.CONFIG["AUDIO_TEXT_DB"] and os.path.exists(step1.CONFIG["AUDIO_TEXT_DB"]):
+        watched.append(step1.CONFIG["AUDIO_TEXT_DB"])
+
+    print("🔥 预热：加载 jieba 词典、绘图库与字体 ...")
+    step1.warm_up()
+    state = file_state(watched)
+    pipe = rebuild(asset_mode) if state[0] is not None else None
+    if pipe is not None and step1.MEMORY_BUDGET is None:
+        # 用已缓存的消息表与分词结果填充记忆，之后的更新只需给新消息分词
+        step1.enable_token_memo(pipe.get("ingest"), pipe.get("tokenize"))
+    elif step1.MEMORY_BUDGET is None:
+        step1.enable_token_memo()
+    if pipe is not None and not args.no_open:
+        step2.open_in_browser(step2.RENDER_CONFIG["OUTPUT_PATH"])
+    del pipe
+
+    print(f"\n👀 正在监视 {step1.CONFIG['CSV_PATH']}（Ctrl+C 退出）")
+    try:
+        while True:
+            state = wait_for_change(watched, state, args.interval, args.debounce)
+            print(f"\n🔄 {time.strftime('%H:%M:%S')} 开始更新")
+            rebuild(asset_mode)
+            print(f"\n👀 继续监视 {step1.CONFIG['CSV_PATH']}")
+    except KeyboardInterrupt:
+        print("\n👋 已停止监视")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,124 @@
-import subprocess
-import sys
-
-def run(cmd):
-    print(f"\n🚀 正在运行: {cmd}")
-    result = subprocess.run(
-        cmd,
-        shell=True,
-        text=True
-    )
-    if result.returncode != 0:
-        print("❌ 出错了，流程中断")
-        sys.exit(result.returncode)
+import argparse
+import os
+
+import step1_analyze as step1
+import step2_render as step2
+from pipeline import Stage
+from report_store import open_report
+from memory_budget import parse_size
+from preview import DEFAULT_FRACTION
+
+STAGE_NAMES = ["ingest", "tokenize", "years", "aggregate", "render-charts", "render-html"]
+# 随报告年份变化的阶段；其余阶段覆盖所有年份，只跑一次
+YEAR_STAGES = ["aggregate", "render-charts", "render-html"]
+
+def render_html_stage(asset_mode):
+    def run(pipe):
+        report = open_report(step1.CONFIG["REPORT_PATH"])
+        try:
+            step2.write_report(report, step2.RENDER_CONFIG["OUTPUT_PATH"], asset_mode)
+        finally:
+            report.close()
+    return Stage("render-html", run,
+                 deps=["render-charts"],
+                 params=lambda: {"asset_mode": asset_mode, "asset_dir": step2.RENDER_CONFIG["ASSET_DIR"]},
+                 outputs=lambda: [step2.RENDER_CONFIG["OUTPUT_PATH"]],
+                 code=[step2],
+                 variant=lambda: step1.CONFIG["TARGET_YEAR"])
+
+def year_path(path, year):
+    """report_data.zip → report_data_2024.zip（也用于预览：report_data_preview.zip；assets → assets_2024）"""
+    root, ext = os.path.splitext(path)
+    return f"{root}_{year}{ext}"
+
+def parse_fraction(text):
+    """--preview 的抽样比例：0.05 或 5%"""
+    try:
+        value = float(text[:-1]) / 100 if text.endswith("%") else float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无法解析抽样比例: {text}")
+    if not 0 < value <= 1: raise argparse.ArgumentTypeError("抽样比例应在 (0, 1] 之间")
+    return value
+
+def run_all_years(asset_mode, force):
+    """先跑一遍覆盖所有年份的阶段拿到年份列表，再逐年生成报告（CSV 只读一次）"""
+    pipe = step1.make_pipeline()
+    pipe.run(force=force, until="years")
+    years = sorted(pipe.get("years"))
+    print(f"📅 数据包含 {len(years)} 个年份: {', '.join(map(str, years))}")
+
+    year_force = YEAR_STAGES if "all" in force else [f for f in force if f in YEAR_STAGES]
+    report_path, output_path = step1.CONFIG["REPORT_PATH"], step2.RENDER_CONFIG["OUTPUT_PATH"]
+    # 每一年的外置图片各放一个目录：生成某年时清理未引用的图片，不会删掉别的年份在用的
+    asset_dir = step2.RENDER_CONFIG["ASSET_DIR"]
+    outputs = []
+    for year in years:
+        print(f"\n===== {year} =====")
+        step1.CONFIG["TARGET_YEAR"] = year
+        step1.CONFIG["REPORT_PATH"] = year_path(report_path, year)
+        step2.RENDER_CONFIG["OUTPUT_PATH"] = year_path(output_path, year)
+        step2.RENDER_CONFIG["ASSET_DIR"] = year_path(asset_dir, year)
+        step1.make_pipeline([render_html_stage(asset_mode)]).run(force=year_force)
+        outputs.append(step2.RENDER_CONFIG["OUTPUT_PATH"])
+    return outputs
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="微信年度报告生成器")
+    parser.add_argument("--force", action="append", default=[], choices=STAGE_NAMES + ["all"],
+                        help="强制重跑某个阶段（可重复；all 表示全部重跑）")
+    parser.add_argument("--assets", action="store_true", help="图片输出到 assets/ 并懒加载，而不是内嵌")
+    parser.add_argument("--no-open", action="store_true", help="生成后不自动打开浏览器")
+    parser.add_argument("--no-cache", action="store_true", help="不使用图表缓存，全部重绘")
+    parser.add_argument("--profile-stage", metavar="NAME",
+                        help="对指定阶段（或 draw_wordcloud、group#1 等任意 span）开启 cProfile")
+    scale = parser.add_mutually_exclusive_group()
+    scale.add_argument("--memory-budget", type=parse_size, metavar="SIZE",
+                       help="内存上限（如 2G / 1500M）：分块读取、词频落盘、用完即释放")
+    scale.add_argument("--shards", type=int, metavar="N",
+                       help="分片模式：按聊天把 CSV 切成 N 片，读入与分词多进程并行（适合超大导出）")
+    parser.add_argument("--jobs", "-j", type=int, help="分片模式的并行进程数（默认 min(N, CPU 核数)）")
+    parser.add_argument("--engine", choices=list(step1.engines.ENGINES), default="pandas",
+                        help="读入与分组统计的计算后端（polars 需 pip install polars pyarrow，多线程惰性扫描）")
+    parser.add_argument("--preview", type=parse_fraction, nargs="?", const=DEFAULT_FRACTION, metavar="FRACTION",
+                        help=f"预览模式：只对按聊天与月份分层抽样的消息（默认 {DEFAULT_FRACTION:.0%}）分词，统计仍为全量，"
+                             "输出 Final_Report_preview.html")
+    years = parser.add_mutually_exclusive_group()
+    years.add_argument("--year", type=int, help=f"报告年份（默认 {step1.CONFIG['TARGET_YEAR']}）")
+    years.add_argument("--all-years", action="store_true",
+                       help="为数据中的每一年各生成一份报告（Final_Report_<年份>.html）")
+    args = parser.parse_args(argv)
+    if args.engine != "pandas" and (args.memory_budget or args.shards):
+        # polars 自己就是多线程整表扫描：既不分块，也不能在 fork 出的进程里用
+        parser.error(f"--engine {args.engine} 不能与 --memory-budget / --shards 同时使用")
+    try:
+        if args.engine != "pandas": step1.set_engine(args.engine)
+    except RuntimeError as e:
+        parser.error(str(e))
+    return args
 
 if __name__ == "__main__":
+    args = parse_args()
     print("=== 微信年度报告生成器 ===")
 
-    run("python step1_analyze.py")
-    run("python step2_render.py")
+    step1.CHART_CACHE.enabled = not args.no_cache
+    if args.profile_stage: step1.enable_profiling(args.profile_stage)
+    if args.memory_budget: step1.set_memory_budget(args.memory_budget)
+    if args.shards and args.shards > 1: step1.enable_shards(args.shards, args.jobs)
+    if args.year: step1.CONFIG["TARGET_YEAR"] = args.year
+    if args.preview:
+        step1.enable_preview(args.preview, year_path(step1.CONFIG["REPORT_PATH"], "preview"))
+        step2.RENDER_CONFIG["OUTPUT_PATH"] = year_path(step2.RENDER_CONFIG["OUTPUT_PATH"], "preview")
+        step2.RENDER_CONFIG["ASSET_DIR"] = year_path(step2.RENDER_CONFIG["ASSET_DIR"], "preview")
+
+    asset_mode = "external" if args.assets else step2.RENDER_CONFIG["ASSET_MODE"]
+    if args.all_years:
+        outputs = run_all_years(asset_mode, args.force)
+    else:
+        pipe = step1.make_pipeline([render_html_stage(asset_mode)])
+        pipe.run(force=args.force)
+        outputs = [step2.RENDER_CONFIG["OUTPUT_PATH"]]
+    step1.print_run_summary()
 
-    print("\n✅ 全部完成！报告已生成")
+    print("\n✅ 全部完成！报告已生成: " + ", ".join(outputs))
+    if not args.no_open:
+        step2.open_in_browser(outputs[-1])
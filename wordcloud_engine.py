@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+from io import BytesIO
+
+import wordcloud
+from PIL import Image, ImageDraw, ImageFont
+from wordcloud import WordCloud
+
+# ===================== 词云引擎 =====================
+# 1. 在缩小 LAYOUT_SCALE 倍的画布上做排版搜索，再按原分辨率绘制
+# 2. 以 Top-K 词频向量为键缓存排版结果（内存 + 磁盘），词频不变就不再排版
+# 3. 直接用 PIL 绘制标题并编码 PNG，不再经过 matplotlib
+
+LAYOUT_SCALE = 2
+LAYOUT_VERSION = 1
+
+
+class WordCloudEngine:
+    def __init__(self, font_path, width=900, height=350, background_color="#1a1a1a",
+                 colormap="summer", max_words=50, cache_dir=None, layout_scale=LAYOUT_SCALE):
+        self.font_path = font_path
+        self.width = width
+        self.height = height
+        self.background_color = background_color
+        self.colormap = colormap
+        self.max_words = max_words
+        self.cache_dir = cache_dir
+        self.layout_scale = layout_scale
+        self._layouts = {}
+
+    def _new_cloud(self):
+        s = self.layout_scale
+        return WordCloud(
+            font_path=self.font_path,
+            width=self.width // s,
+            height=self.height // s,
+            scale=s,
+            background_color=self.background_color,
+            colormap=self.colormap,
+            max_words=self.max_words,
+            random_state=42,
+            collocations=False,
+        )
+
+    def _layout_key(self, top):
+        # 背景色不影响排版，不进键；换背景色时可以直接复用
+        h = hashlib.sha256()
+        meta = [LAYOUT_VERSION, wordcloud.__version__, self.font_path, self.width,
+                self.height, self.layout_scale, self.colormap, self.max_words]
+        h.update(json.dumps([meta, top], ensure_ascii=False).encode("utf-8"))
+        return h.hexdigest()
+
+    def _load_layout(self, key):
+        if key in self._layouts: return self._layouts[key]
+        if not self.cache_dir: return None
+        try:
+            with open(os.path.join(self.cache_dir, key + ".json"), encoding="utf-8") as f:
+                raw = json.load(f)
+        except (OSError, ValueError):
+            return None
+        layout = [((w, c), size, tuple(pos), orient, color) for (w, c), size, pos, orient, color in raw]
+        self._layouts[key] = layout
+        return layout
+
+    def _save_layout(self, key, layout):
+        self._layouts[key] = layout
+        if not self.cache_dir: return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, key + ".json")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(layout, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def top_k(self, freqs):
+        """真正会上图的 Top-K 词频向量（次数降序，同频按词排序，保证稳定）"""
+        top = sorted(freqs.items(), key=lambda kv: (-kv[1], kv[0]))[:self.max_words]
+        return [[w, int(c)] for w, c in top]
+
+    def layout(self, freqs):
+        """返回 (词云对象, 排版)；freqs 为 {词: 次数}"""
+        top = self.top_k(freqs)
+        key = self._layout_key(top)
+
+        wc = self._new_cloud()
+        layout = self._load_layout(key)
+        if layout is None:
+            wc.generate_from_frequencies(dict(top))
+            layout = [((w, float(c)), int(size), tuple(int(v) for v in pos), orient, color)
+                      for (w, c), size, pos, orient, color in wc.layout_]
+            self._save_layout(key, layout)
+        wc.layout_ = layout
+        return wc, layout
+
+    def render(self, freqs, title=None):
+        """按词频绘制词云并直接编码为 PNG 字节；没有词时返回 None"""
+        if not freqs: return None
+        wc, _ = self.layout(freqs)
+        img = wc.to_image()
+        if title: img = self._add_title(img, title)
+
+        buf = BytesIO()
+        img.save(buf, format="PNG")
+        return buf.getvalue()
+
+    def _add_title(self, img, title, color="#666666"):
+        """在图片上方加一条标题栏，右对齐，与其他图表的标题风格一致"""
+        font = ImageFont.truetype(self.font_path, 20)
+        bar = 40
+        canvas = Image.new(img.mode, (img.width, img.height + bar), self.background_color)
+        canvas.paste(img, (0, bar))
+        draw = ImageDraw.Draw(canvas)
+        text_w = draw.textlength(title, font=font)
+        draw.text((img.width - text_w - 10, 10), title, fill=color, font=font)
+        return canvas